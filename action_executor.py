@@ -0,0 +1,245 @@
+import inspect
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+DROPPED = 'dropped'
+
+
+def accepts_keyword(action: Callable, name: str) -> bool:
+    """Check whether an action takes a given keyword argument (e.g. cancel_event)."""
+    try:
+        return name in inspect.signature(action).parameters
+    except (TypeError, ValueError):
+        return False
+
+
+class ActionJob:
+    """One queued call of a trigger action."""
+
+    def __init__(self, action: Callable, key: Any, args: tuple, kwargs: Dict[str, Any],
+                 cancellable: bool):
+        self.action = action
+        self.key = key
+        self.args = args
+        self.kwargs = kwargs
+        self.cancellable = cancellable
+
+        self.status = PENDING
+        self.result = None
+        self.error = None
+        self.coalesced = 0  # Later triggers folded into this job
+        self.submitted_at = time.monotonic()
+        self.started_at = None
+        self.finished_at = None
+
+        self.cancel_event = threading.Event()
+        self._done = threading.Event()
+
+    def cancel(self) -> None:
+        """Ask the job to stop. Pending jobs never start; running cancellable jobs see cancel_event."""
+        self.cancel_event.set()
+
+    def wait(self, timeout: float = None) -> bool:
+        """
+        Wait for the job to finish (or be cancelled/dropped).
+
+        Returns:
+            True if the job finished within the timeout
+        """
+        return self._done.wait(timeout)
+
+    def _finish(self, status: str) -> None:
+        self.status = status
+        self.finished_at = time.monotonic()
+        self._done.set()
+
+
+class ActionExecutor:
+    """
+    Runs trigger actions (LLM call, speech) on background worker threads.
+
+    submit() only queues the job and returns, so ingestion never waits on the
+    network or the speaker. The queue is bounded: when it is full the oldest
+    pending job is dropped. Triggers that fire again while a job with the
+    same key is still waiting are coalesced into that job instead of queuing
+    another round-trip, and jobs sharing a key never run at the same time.
+    """
+
+    def __init__(self, workers: int = 1, max_pending: int = 8):
+        """
+        Args:
+            workers: Number of worker threads (keep 1 so questions are asked one at a time)
+            max_pending: Jobs allowed to wait before the oldest is dropped
+        """
+        self.max_pending = max_pending
+
+        self.submitted = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.cancelled = 0
+        self.completed = 0
+        self.failed = 0
+
+        self._pending = deque()
+        self._pending_by_key = {}
+        self._running = {}
+        self._condition = threading.Condition()
+        self._shutdown = False
+
+        self._threads = [
+            threading.Thread(target=self._work, name=f'action-worker-{i}', daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, action: Callable, *args, key: Any = None, cancellable: bool = False,
+               **kwargs) -> ActionJob:
+        """
+        Queue an action without waiting for it.
+
+        Args:
+            action: Callable to run on a worker thread
+            *args: Positional arguments for the action
+            key: Coalescing key; a pending job with the same key absorbs this call (defaults to the action)
+            cancellable: Pass the job's cancel_event to the action as cancel_event=
+            **kwargs: Keyword arguments for the action
+
+        Returns:
+            The job that will run this call (possibly an existing, coalesced one)
+        """
+        key = action if key is None else key
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError("ActionExecutor has been shut down")
+            self.submitted += 1
+
+            pending = self._pending_by_key.get(key)
+            if pending is not None:
+                # Fold the new trigger into the waiting job; it runs once, with the latest arguments
+                pending.args = args
+                pending.kwargs = kwargs
+                pending.coalesced += 1
+                self.coalesced += 1
+                return pending
+
+            if len(self._pending) >= self.max_pending:
+                oldest = self._pending.popleft()
+                del self._pending_by_key[oldest.key]
+                oldest._finish(DROPPED)
+                self.dropped += 1
+
+            job = ActionJob(action, key, args, kwargs, cancellable)
+            self._pending.append(job)
+            self._pending_by_key[key] = job
+            self._condition.notify()
+            return job
+
+    def cancel(self, key: Any = None) -> int:
+        """
+        Cancel pending jobs and signal running ones.
+
+        Args:
+            key: Only cancel jobs with this key (all jobs when None)
+
+        Returns:
+            Number of jobs cancelled or signalled
+        """
+        count = 0
+        with self._condition:
+            for job in list(self._pending):
+                if key is None or job.key == key:
+                    self._pending.remove(job)
+                    del self._pending_by_key[job.key]
+                    job.cancel()
+                    job._finish(CANCELLED)
+                    self.cancelled += 1
+                    count += 1
+            for job in self._running.values():
+                if key is None or job.key == key:
+                    job.cancel()
+                    count += 1
+        return count
+
+    def _next_job(self) -> Optional[ActionJob]:
+        """Take the oldest pending job whose key isn't already running (caller holds the lock)."""
+        for job in self._pending:
+            if job.key not in self._running:
+                self._pending.remove(job)
+                del self._pending_by_key[job.key]
+                return job
+        return None
+
+    def _work(self) -> None:
+        while True:
+            with self._condition:
+                job = self._next_job()
+                while job is None:
+                    if self._shutdown:
+                        return
+                    self._condition.wait()
+                    job = self._next_job()
+                self._running[job.key] = job
+
+            job.status = RUNNING
+            job.started_at = time.monotonic()
+            try:
+                kwargs = dict(job.kwargs)
+                if job.cancellable:
+                    kwargs['cancel_event'] = job.cancel_event
+                job.result = job.action(*job.args, **kwargs)
+                status = CANCELLED if job.cancel_event.is_set() else DONE
+            except Exception as e:
+                job.error = e
+                status = FAILED
+                print(f"Error running action {getattr(job.action, '__name__', job.action)}: {e}")
+
+            with self._condition:
+                del self._running[job.key]
+                if status == DONE:
+                    self.completed += 1
+                elif status == CANCELLED:
+                    self.cancelled += 1
+                else:
+                    self.failed += 1
+                job._finish(status)
+                # A job with this key may have been waiting for this one to finish
+                self._condition.notify_all()
+
+    def stats(self) -> Dict[str, int]:
+        """Counters describing what the executor has done so far."""
+        with self._condition:
+            return {
+                "submitted": self.submitted,
+                "coalesced": self.coalesced,
+                "dropped": self.dropped,
+                "cancelled": self.cancelled,
+                "completed": self.completed,
+                "failed": self.failed,
+                "pending": len(self._pending),
+                "running": len(self._running),
+            }
+
+    def shutdown(self, wait: bool = True, cancel_pending: bool = False) -> None:
+        """
+        Stop the workers once the queue is drained.
+
+        Args:
+            wait: Block until the workers have exited
+            cancel_pending: Cancel queued and running jobs instead of finishing them
+        """
+        if cancel_pending:
+            self.cancel()
+        with self._condition:
+            self._shutdown = True
+            self._condition.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
@@ -0,0 +1,214 @@
+import glob
+import json
+import os
+import re
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from fast_json import iter_json_array
+from segment_model import Segment
+
+MANIFEST_FILE = 'manifest.json'
+
+_ARCHIVE_NAME = re.compile(r'convo_(\d+)\.json$')
+
+
+def conversation_summary(segments: Iterable[Segment]) -> Dict[str, Any]:
+    """
+    Segment count, duration and speakers of a conversation, as kept in the manifest.
+
+    Args:
+        segments: The conversation's segments
+
+    Returns:
+        Dictionary with segments, duration (seconds) and speakers (sorted labels)
+    """
+    count = 0
+    first = None
+    last = None
+    speakers = set()
+    for segment in segments:
+        count += 1
+        speakers.add(segment.speaker)
+        finish = segment.end if segment.end is not None else segment.start
+        first = segment.start if first is None else min(first, segment.start)
+        last = finish if last is None else max(last, finish)
+    return {
+        "segments": count,
+        "duration": round(last - first, 3) if count else 0.0,
+        "speakers": sorted(speakers),
+    }
+
+
+class ArchiveManager:
+    """
+    Numbers, stores and describes archived conversations.
+
+    The manifest (previous_conversations/manifest.json) holds the next
+    conversation number and, per conversation, its archive path, segment
+    count, duration and speakers, so nothing has to probe for free file
+    names or open the archives to describe them. Archives are sharded into
+    one directory per day (previous_conversations/2026-10-16/convo_12.json).
+
+    Rotation is crash safe: the number is reserved in the manifest before
+    the transcription is moved with os.replace, and a reservation whose file
+    already moved is completed the next time the manifest is loaded. The
+    manifest itself is rewritten with a temporary file + os.replace.
+
+    When the conversation came from a segment log, the manifest commit that
+    completes the archive also records how many bytes of the log it holds
+    (archived_log), until the owner reports the log cleared. A crash before
+    that leaves the record in place, so the owner can drop exactly those
+    bytes on restart instead of archiving the same conversation again.
+    """
+
+    def __init__(self, conversations_dir: str = 'previous_conversations', shard_by_date: bool = True):
+        """
+        Args:
+            conversations_dir: Archive directory
+            shard_by_date: Put each archive in a YYYY-MM-DD subdirectory
+        """
+        self.conversations_dir = conversations_dir
+        self.shard_by_date = shard_by_date
+        self.manifest_file = os.path.join(conversations_dir, MANIFEST_FILE)
+        self.next_id = 1
+        self.conversations: Dict[int, Dict[str, Any]] = {}
+        self.pending: Optional[Dict[str, Any]] = None
+        self.archived_log: Optional[Dict[str, int]] = None  # {"id", "size"}: log bytes archived but not cleared
+
+        os.makedirs(conversations_dir, exist_ok=True)
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            self.next_id = int(manifest.get('next_id', 1))
+            self.conversations = {int(number): entry for number, entry in manifest.get('conversations', {}).items()}
+            self.pending = manifest.get('pending')
+            self.archived_log = manifest.get('archived_log')
+        except FileNotFoundError:
+            self.rebuild()
+        except (json.JSONDecodeError, ValueError, TypeError, AttributeError) as e:
+            print(f"Rebuilding unreadable archive manifest {self.manifest_file}: {e}")
+            self.rebuild()
+
+        if self.pending is not None:
+            self._recover()
+
+    def __len__(self) -> int:
+        return len(self.conversations)
+
+    def path(self, number: int) -> str:
+        """Full path of an archived conversation."""
+        return os.path.join(self.conversations_dir, self.conversations[number]['path'])
+
+    def paths(self) -> List[str]:
+        """Full paths of all archived conversations, oldest first."""
+        return [self.path(number) for number in sorted(self.conversations)]
+
+    def _read_segments(self, path: str) -> List[Segment]:
+        with open(path, 'r', encoding='utf-8') as f:
+            return [Segment.from_dict(data) for data in iter_json_array(f) if isinstance(data, dict)]
+
+    def _describe(self, path: str, segments: List[Segment] = None) -> Dict[str, Any]:
+        if segments is None:
+            segments = self._read_segments(path)
+        entry = {"path": os.path.relpath(path, self.conversations_dir)}
+        entry.update(conversation_summary(segments))
+        entry["archived_at"] = datetime.fromtimestamp(os.path.getmtime(path)).isoformat(timespec='seconds')
+        return entry
+
+    def rebuild(self) -> None:
+        """
+        Build the manifest from the archives on disk (once, when there is none yet).
+        Archives that can't be read are still numbered, with empty metadata.
+        """
+        self.conversations = {}
+        self.pending = None
+        for path in glob.glob(os.path.join(self.conversations_dir, '**', 'convo_*.json'), recursive=True):
+            match = _ARCHIVE_NAME.search(os.path.basename(path))
+            if match is None:
+                continue
+            try:
+                entry = self._describe(path)
+            except (OSError, ValueError) as e:
+                print(f"Error reading {path}: {e}")
+                entry = {"path": os.path.relpath(path, self.conversations_dir),
+                         "segments": 0, "duration": 0.0, "speakers": []}
+            self.conversations[int(match.group(1))] = entry
+        self.next_id = max(self.conversations, default=0) + 1
+        self.save()
+        if self.conversations:
+            print(f"🗂️ Built archive manifest for {len(self.conversations)} conversation(s)")
+
+    def _recover(self) -> None:
+        # Finish (or drop) a rotation that was interrupted after its number was reserved
+        number = int(self.pending['id'])
+        path = os.path.join(self.conversations_dir, self.pending['path'])
+        log_size = self.pending.get('log_size')
+        self.pending = None
+        if os.path.exists(path):
+            try:
+                self.conversations[number] = self._describe(path)
+                print(f"Recovered interrupted archive {path}")
+            except (OSError, ValueError) as e:
+                print(f"Error reading {path}: {e}")
+            if log_size is not None:
+                self.archived_log = {"id": number, "size": log_size}
+        self.save()
+
+    def save(self) -> None:
+        """Write the manifest (temporary file + fsync + os.replace)."""
+        tmp_file = f"{self.manifest_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({
+                "next_id": self.next_id,
+                "pending": self.pending,
+                "archived_log": self.archived_log,
+                "conversations": {str(number): entry for number, entry in sorted(self.conversations.items())},
+            }, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.manifest_file)
+
+    def archive(self, source_file: str, segments: List[Segment] = None, log_size: int = None) -> int:
+        """
+        Move a finished conversation into the archive under the next number.
+
+        Args:
+            source_file: The conversation's processed transcription (JSON array)
+            segments: Its segments, if already in memory (read from the file otherwise)
+            log_size: Bytes of the segment log the conversation was compacted from; kept as
+                archived_log until log_cleared() is called
+
+        Returns:
+            Number the conversation was archived under
+        """
+        if segments is None:
+            segments = self._read_segments(source_file)
+        number = self.next_id
+        shard = time.strftime('%Y-%m-%d') if self.shard_by_date else ''
+        relative_path = os.path.join(shard, f'convo_{number}.json')
+        archive_path = os.path.join(self.conversations_dir, relative_path)
+        os.makedirs(os.path.dirname(archive_path), exist_ok=True)
+
+        # Reserve the number first, so a crash after the move is recovered instead of reusing it
+        self.next_id = number + 1
+        self.pending = {"id": number, "path": relative_path}
+        if log_size is not None:
+            self.pending["log_size"] = log_size
+        self.save()
+
+        os.replace(source_file, archive_path)
+
+        self.conversations[number] = self._describe(archive_path, segments)
+        self.pending = None
+        if log_size is not None:
+            self.archived_log = {"id": number, "size": log_size}
+        self.save()
+        return number
+
+    def log_cleared(self) -> None:
+        """Record that the archived bytes have been removed from the segment log."""
+        if self.archived_log is not None:
+            self.archived_log = None
+            self.save()
@@ -0,0 +1,217 @@
+import argparse
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List
+
+from fast_json import iter_json_array
+from archive_manager import MANIFEST_FILE
+from segment_merge import merge_segments
+from segment_model import Segment
+from trigger_engine import TriggerEngine
+
+STATE_FILE = 'batch_state.json'
+
+_engines = {}  # Trigger engines compiled in each worker process, keyed by phrase list
+
+
+def write_json_atomic(path: str, data: Any, indent: int = None) -> None:
+    """
+    Write JSON to a temporary file, fsync it and swap it in with os.replace,
+    so an interrupted run never leaves a half-written file behind.
+
+    Args:
+        path: Destination path
+        data: JSON-serializable data
+        indent: Indentation passed to json.dump
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_file = f"{path}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=indent, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, path)
+
+
+def find_archives(input_dir: str) -> List[str]:
+    """
+    List the conversation archives under a directory (including date subdirectories).
+
+    Args:
+        input_dir: Archive directory, e.g. previous_conversations
+
+    Returns:
+        Archive paths relative to input_dir, sorted
+    """
+    paths = glob.glob(os.path.join(input_dir, '**', '*.json'), recursive=True)
+    return sorted(os.path.relpath(path, input_dir) for path in paths
+                  if os.path.basename(path) not in (STATE_FILE, MANIFEST_FILE) and not path.endswith('.tmp'))
+
+
+def reprocess_file(input_path: str, output_path: str, phrases: List[str]) -> Dict[str, Any]:
+    """
+    Reprocess one archived conversation (runs in a worker process).
+
+    The archive is read element by element, duplicates and superseded
+    partial segments are merged away, trigger phrases are matched again on
+    the merged conversation, and the result is written atomically.
+
+    Args:
+        input_path: Archived conversation (JSON array of processed segments)
+        output_path: Where to write the merged conversation
+        phrases: Trigger phrases to look for
+
+    Returns:
+        Per-file statistics and trigger hits
+    """
+    started = time.perf_counter()
+    engine = _engines.get(tuple(phrases))
+    if engine is None:
+        engine = _engines[tuple(phrases)] = TriggerEngine({phrase: None for phrase in phrases})
+
+    segments_in = 0
+
+    def counted(segments):
+        nonlocal segments_in
+        for segment in segments:
+            segments_in += 1
+            yield segment
+
+    with open(input_path, 'r', encoding='utf-8') as f:
+        merged = merge_segments(counted(segment for segment in iter_json_array(f) if isinstance(segment, dict)))
+
+    triggers = []
+    speakers = set()
+    for index, data in enumerate(merged):
+        speakers.add(data.get('speaker', 'UNKNOWN'))
+        for match in engine.match(data.get('text', '')):
+            triggers.append({"phrase": match.phrase, "segment": index,
+                             "timestamp": Segment.from_dict(data).timestamp, "text": data.get('text', '')})
+
+    write_json_atomic(output_path, merged, indent=2)
+    seconds = time.perf_counter() - started
+    return {
+        "segments_in": segments_in,
+        "segments_out": len(merged),
+        "speakers": sorted(speakers),
+        "triggers": triggers,
+        "bytes": os.path.getsize(input_path),
+        "seconds": seconds,
+    }
+
+
+class BatchReprocessor:
+    """
+    Reprocesses every archived conversation in a directory on a process pool.
+
+    Progress is kept in a state file in the output directory, written
+    atomically after every finished file. A file that was already done and
+    hasn't changed since (same size and modification time) is skipped, so
+    an interrupted run picks up where it stopped.
+    """
+
+    def __init__(self, input_dir: str = 'previous_conversations', output_dir: str = 'reprocessed_conversations',
+                 phrases: List[str] = None, workers: int = None):
+        """
+        Args:
+            input_dir: Directory holding the archived conversations
+            output_dir: Directory the merged conversations and the state file are written to
+            phrases: Trigger phrases to match (defaults to the phrases in webhook.TRIGGERS)
+            workers: Worker processes (defaults to the number of CPUs)
+        """
+        self.input_dir = input_dir
+        self.output_dir = output_dir
+        if phrases is None:
+            from webhook import TRIGGERS
+            phrases = list(TRIGGERS)
+        self.phrases = phrases
+        self.workers = workers
+        self.state_file = os.path.join(output_dir, STATE_FILE)
+        self.state = self._load_state()
+
+    def _load_state(self) -> Dict[str, Any]:
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"files": {}}
+        except json.JSONDecodeError as e:
+            print(f"Ignoring unreadable state file {self.state_file}: {e}")
+            return {"files": {}}
+
+    def _is_done(self, relative_path: str) -> bool:
+        entry = self.state["files"].get(relative_path)
+        if entry is None or entry.get("phrases") != self.phrases:
+            return False
+        stat = os.stat(os.path.join(self.input_dir, relative_path))
+        return (entry.get("size") == stat.st_size and entry.get("mtime") == stat.st_mtime and
+                os.path.exists(os.path.join(self.output_dir, relative_path)))
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Reprocess every archive that isn't done yet.
+
+        Returns:
+            Summary with file/segment counts, trigger hits, elapsed seconds and throughput
+        """
+        archives = find_archives(self.input_dir)
+        pending = [path for path in archives if not self._is_done(path)]
+        print(f"📦 {len(archives)} archive(s) in {self.input_dir}, {len(archives) - len(pending)} already done, "
+              f"{len(pending)} to process")
+
+        summary = {"files": 0, "failed": 0, "segments_in": 0, "segments_out": 0, "triggers": 0}
+        started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            futures = {
+                pool.submit(reprocess_file, os.path.join(self.input_dir, path),
+                            os.path.join(self.output_dir, path), self.phrases): path
+                for path in pending
+            }
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    summary["failed"] += 1
+                    print(f"❌ {path}: {e}")
+                    continue
+
+                stat = os.stat(os.path.join(self.input_dir, path))
+                self.state["files"][path] = dict(result, size=stat.st_size, mtime=stat.st_mtime,
+                                                 phrases=self.phrases)
+                write_json_atomic(self.state_file, self.state)
+
+                summary["files"] += 1
+                summary["segments_in"] += result["segments_in"]
+                summary["segments_out"] += result["segments_out"]
+                summary["triggers"] += len(result["triggers"])
+                rate = result["segments_in"] / result["seconds"] if result["seconds"] else 0.0
+                print(f"✅ {path}: {result['segments_in']} -> {result['segments_out']} segments, "
+                      f"{len(result['triggers'])} trigger(s), {result['seconds'] * 1000:.1f} ms "
+                      f"({rate:,.0f} segments/s, {result['bytes'] / 1024 / result['seconds']:,.0f} KB/s)")
+
+        summary["seconds"] = time.perf_counter() - started
+        summary["segments_per_second"] = summary["segments_in"] / summary["seconds"] if summary["seconds"] else 0.0
+        return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reprocess archived conversations in parallel (resumable)")
+    parser.add_argument('--input', default='previous_conversations', help="Archive directory")
+    parser.add_argument('--output', default='reprocessed_conversations', help="Directory for the merged archives")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('--phrase', action='append', dest='phrases',
+                        help="Trigger phrase to look for (repeatable; default: the phrases in webhook.py)")
+    args = parser.parse_args()
+
+    summary = BatchReprocessor(args.input, args.output, args.phrases, args.workers).run()
+    print(f"\nProcessed {summary['files']} file(s) ({summary['failed']} failed) in {summary['seconds']:.2f}s: "
+          f"{summary['segments_in']} -> {summary['segments_out']} segments, {summary['triggers']} trigger hit(s), "
+          f"{summary['segments_per_second']:,.0f} segments/s")
+
+
+if __name__ == "__main__":
+    main()
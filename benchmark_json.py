@@ -0,0 +1,62 @@
+import json
+import time
+from typing import Callable, List
+
+import fast_json
+from payload_archive import iter_payloads
+from segment_model import format_timestamp
+
+
+def stdlib_previous(bodies: List[bytes]) -> int:
+    """The previous path: response.json() on the request, json.loads on content, one dict per segment."""
+    count = 0
+    for body in bodies:
+        payload = json.loads(body)
+        content = json.loads(payload['content'])
+        for segment in content.get('segments', []):
+            processed = {
+                "speaker": segment.get('speaker', 'UNKNOWN'),
+                "text": segment.get('text', '').strip(),
+                "timestamp": format_timestamp(segment.get('start', 0)),
+            }
+            if segment.get('id'):
+                processed["id"] = segment['id']
+            count += 1
+    return count
+
+
+def fast_path(bodies: List[bytes]) -> int:
+    """fast_json: the request and its content decoded with the fastest backend, content straight into Segments."""
+    count = 0
+    for body in bodies:
+        payload = fast_json.loads(body)
+        _session_id, segments = fast_json.decode_content(payload['content'])
+        count += len(segments)
+    return count
+
+
+def best_of(function: Callable, bodies: List[bytes], rounds: int = 5) -> float:
+    best = float('inf')
+    for _ in range(rounds):
+        started = time.perf_counter()
+        function(bodies)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    payloads = list(iter_payloads('live_transcript.json'))
+    # Each payload as webhook.site returns it over HTTP, repeated so timings are well above timer resolution
+    bodies = [json.dumps(payload).encode('utf-8') for payload in payloads] * max(1, 20000 // len(payloads))
+    segments = stdlib_previous(bodies)
+    print(f"Decoding {len(bodies)} payloads ({segments} segments), fast_json backend: {fast_json.BACKEND}\n")
+    print(f"{'path':<22} {'total ms':>10} {'us/payload':>11} {'speedup':>8}")
+
+    baseline = best_of(stdlib_previous, bodies)
+    for name, function in (("stdlib (previous)", stdlib_previous), ("fast_json", fast_path)):
+        seconds = best_of(function, bodies)
+        print(f"{name:<22} {seconds * 1000:>10.1f} {seconds / len(bodies) * 1e6:>11.1f} {baseline / seconds:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
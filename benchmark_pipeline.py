@@ -0,0 +1,430 @@
+import argparse
+import bisect
+import contextlib
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit, parse_qs
+
+from payload_archive import iter_payloads
+from segment_model import parse_timestamp
+
+TOKEN = "benchmark-token"
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+RESULTS_DIR = 'benchmark_results'
+
+
+class PayloadSource:
+    """
+    Webhook.site payloads for one workload, built on demand by index.
+
+    Segments are kept as compact tuples and only turned into payloads (Omi
+    JSON content in a webhook.site envelope) when the mock server serves
+    them, so a million-segment workload doesn't sit in memory as JSON.
+    Each payload repeats the last segment of the one before, like Omi does,
+    so deduplication is exercised too.
+    """
+
+    def __init__(self, segments: List[tuple], per_payload: int = 4, created_at: List[str] = None):
+        """
+        Args:
+            segments: (id, speaker, text, start, end) tuples in arrival order
+            per_payload: New segments per payload
+            created_at: webhook.site created_at of each payload (derived from segment start times if not given)
+        """
+        self.segments = segments
+        self.per_payload = per_payload
+        self.count = (len(segments) + per_payload - 1) // per_payload
+        if created_at is None:
+            base = datetime(2025, 6, 21, 3, 0, 0)
+            created_at = [(base + timedelta(seconds=segments[min(len(segments) - 1, (i + 1) * per_payload - 1)][4]))
+                          .strftime(TIME_FORMAT) for i in range(self.count)]
+        self.created_at = created_at
+
+    def __len__(self) -> int:
+        return self.count
+
+    def offset(self, index: int) -> float:
+        """Seconds between the first payload and this one in the recording."""
+        first = datetime.strptime(self.created_at[0], TIME_FORMAT)
+        return (datetime.strptime(self.created_at[index], TIME_FORMAT) - first).total_seconds()
+
+    def payload(self, index: int) -> Dict[str, Any]:
+        begin = index * self.per_payload
+        rows = self.segments[max(0, begin - 1):begin + self.per_payload]
+        content = {"session_id": "benchmark", "segments": [
+            {"id": segment_id, "text": text, "speaker": speaker, "speaker_id": int(speaker.rsplit('_', 1)[-1]),
+             "is_user": False, "start": start, "end": end}
+            for segment_id, speaker, text, start, end in rows
+        ]}
+        return {"uuid": f"payload-{index}", "sorting": index + 1, "created_at": self.created_at[index],
+                "content": json.dumps(content)}
+
+    def segment_count(self) -> int:
+        return len(self.segments)
+
+
+class RecordedPayloads(PayloadSource):
+    """Recorded webhook.site payloads (live_transcript.json), replayed as they were received."""
+
+    def __init__(self, path: str = 'live_transcript.json'):
+        self.payloads = list(iter_payloads(path))
+        self.count = len(self.payloads)
+        self.created_at = [payload['created_at'] for payload in self.payloads]
+
+    def payload(self, index: int) -> Dict[str, Any]:
+        return dict(self.payloads[index], sorting=index + 1)
+
+    def segment_count(self) -> int:
+        return sum(len(json.loads(payload['content']).get('segments', [])) for payload in self.payloads)
+
+
+def archive_segments(conversations_dir: str = 'previous_conversations') -> List[tuple]:
+    """Every archived segment, as arriving segments (repeats of a segment keep its id)."""
+    segments = []
+    offset = 0.0
+    for path in sorted(glob.glob(os.path.join(conversations_dir, '**', 'convo_*.json'), recursive=True)):
+        with open(path, 'r', encoding='utf-8') as f:
+            try:
+                stored = json.load(f)
+            except json.JSONDecodeError:
+                continue
+        last = 0.0
+        for data in stored:
+            start = data.get('start')
+            start = float(start) if start is not None else parse_timestamp(data.get('timestamp'))
+            speaker = data.get('speaker') or 'SPEAKER_0'
+            text = data.get('text', '')
+            segment_id = data.get('id') or hashlib.blake2b(
+                f"{path}|{speaker}|{text}|{start}".encode('utf-8'), digest_size=8).hexdigest()
+            segments.append((segment_id, speaker, text, offset + start, offset + start + 3.0))
+            last = max(last, start + 3.0)
+        offset += last + 60.0
+    return segments
+
+
+def synthetic_segments(count: int, corpus: List[tuple], trigger_every: int = 1000) -> List[tuple]:
+    """Scale the recorded texts up to count segments, 3 seconds apart, with a trigger phrase every so often."""
+    texts = [text for _id, _speaker, text, _start, _end in corpus if text] or ["so what do you think about it"]
+    segments = []
+    for i in range(count):
+        text = texts[i % len(texts)]
+        if i % trigger_every == trigger_every // 2:
+            text = "I like your " + text
+        segments.append((f"syn-{i}", f"SPEAKER_{i % 3}", text, i * 3.0, i * 3.0 + 2.5))
+    return segments
+
+
+class MockWebhookSite:
+    """
+    Local stand-in for webhook.site's /token/{uuid}/requests API serving a PayloadSource.
+
+    Payloads become visible as the replay clock passes their recorded time
+    (scaled by speed), or all at once at max speed.
+    """
+
+    def __init__(self, source: PayloadSource, realtime: bool = False, speed: float = 1.0):
+        self.source = source
+        self.realtime = realtime
+        self.speed = speed
+        self.started = None
+        self.requests = 0
+        self._offsets = [source.offset(i) / speed for i in range(len(source))] if realtime else None
+
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                mock.requests += 1
+                parts = urlsplit(self.path)
+                body = json.dumps(mock.page(parse_qs(parts.query))).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self) -> None:
+        self.started = time.perf_counter()
+
+    def released(self) -> int:
+        """Number of payloads that have 'arrived' so far."""
+        if not self.realtime:
+            return len(self.source)
+        return bisect.bisect_right(self._offsets, time.perf_counter() - self.started)
+
+    def arrival(self, index: int) -> float:
+        """perf_counter time a payload arrived at."""
+        return self.started + (self._offsets[index] if self.realtime else 0.0)
+
+    def page(self, query: Dict[str, List[str]]) -> Dict[str, Any]:
+        per_page = int(query.get('per_page', ['50'])[0])
+        page = int(query.get('page', ['1'])[0])
+        date_from = query.get('date_from', [None])[0]
+        first = bisect.bisect_left(self.source.created_at, date_from) if date_from else 0
+        released = self.released()
+        start = first + (page - 1) * per_page
+        data = [self.source.payload(i) for i in range(start, min(released, start + per_page))]
+        return {"data": data, "per_page": per_page, "current_page": page,
+                "is_last_page": start + per_page >= released}
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class MockLLM:
+    """Local OpenAI-compatible endpoint that streams a fixed question after a delay."""
+
+    def __init__(self, latency: float = 0.05):
+        self.calls = 0
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                mock.calls += 1
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                time.sleep(latency)
+                events = [{"choices": [{"delta": {"content": part}}]}
+                          for part in ("What did you ", "like most about it? ", "Where did you get it?")]
+                body = "".join(f"data: {json.dumps(event)}\n\n" for event in events) + "data: [DONE]\n\n"
+                body = body.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/v1/chat/completions"
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process (ru_maxrss is KiB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def percentile(ordered: List[float], quantile: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, int(round(quantile * len(ordered))) - 1))]
+
+
+def build_source(workload: str) -> PayloadSource:
+    if workload == 'live':
+        return RecordedPayloads()
+    corpus = archive_segments()
+    if workload == 'archives':
+        return PayloadSource(corpus)
+    return PayloadSource(synthetic_segments(int(workload), corpus))
+
+
+def run_workload(workload: str, mode: str, speed: float = 1.0, llm_latency: float = 0.05,
+                 tts_seconds: float = 0.01) -> Dict[str, Any]:
+    """
+    Replay one workload through a fresh TranscriptionProcessor (runs in its own process).
+
+    Payloads are fetched from the mock webhook.site with the real
+    WebhookSiteFetcher and handled with handle_payload; trigger actions call
+    the mock LLM and a TTS stand-in that only sleeps.
+
+    Args:
+        workload: 'live', 'archives' or a synthetic segment count
+        mode: 'max' (everything available at once, no waiting) or 'realtime'
+        speed: Realtime speed-up factor
+        llm_latency: Seconds the mock LLM waits before answering
+        tts_seconds: Seconds each spoken sentence takes
+
+    Returns:
+        Throughput, latency, memory and per-stage figures
+    """
+    import openai
+    from metrics import metrics
+    from poll_scheduler import PollScheduler
+    from tts_worker import TTSWorker
+    from webhook import TranscriptionProcessor
+    from webhook_fetcher import WebhookSiteFetcher
+
+    baseline_rss = peak_rss_mb()
+    source = build_source(workload)
+    llm = MockLLM(llm_latency)
+    openai.OPENAI_API_URL = llm.url
+    openai.USE_RESPONSE_CACHE = False
+    openai.tts_worker = TTSWorker('null', seconds_per_utterance=tts_seconds)
+
+    server = MockWebhookSite(source, realtime=(mode == 'realtime'), speed=speed)
+    with tempfile.TemporaryDirectory() as data_dir:
+        processor = TranscriptionProcessor(data_dir=data_dir)
+        fetcher = WebhookSiteFetcher(TOKEN, base_url=server.base_url, per_page=100, cursor_file=None)
+        fetcher.cursor = {"sorting": 0, "created_at": "", "uuids": []}  # Start from the first payload
+        scheduler = PollScheduler()
+        metrics.reset()
+
+        latencies = []
+        handled = 0
+        server.start()
+        started = time.perf_counter()
+        while handled < len(source):
+            batch = fetcher.fetch_new_requests()
+            for payload in batch:
+                index = payload['sorting'] - 1
+                payload_started = time.perf_counter()
+                processor.handle_payload(payload)
+                done = time.perf_counter()
+                # Max speed: processing time; real time: from the payload's arrival to done
+                latencies.append(done - (payload_started if mode == 'max' else server.arrival(index)))
+            handled += len(batch)
+            if mode == 'realtime':
+                scheduler.wait(scheduler.record_poll(len(batch)))
+        ingest_seconds = time.perf_counter() - started
+
+        processor.action_executor.shutdown(wait=True)
+        total_seconds = time.perf_counter() - started
+        segments_stored = sum(segment_log.segment_count for segment_log in processor.segment_logs.values())
+        processor.close()
+        fetcher.close()
+    openai.close_speech(wait=True)
+    server.close()
+    llm.close()
+
+    latencies.sort()
+    snapshot = metrics.snapshot()
+    segments_in = snapshot["counters"].get("segments_parsed", 0)
+    return {
+        "workload": workload,
+        "mode": mode,
+        "speed": speed if mode == 'realtime' else None,
+        "payloads": handled,
+        "segments_in": segments_in,
+        "segments_stored": segments_stored,
+        "seconds": round(ingest_seconds, 3),
+        "seconds_with_actions": round(total_seconds, 3),
+        "payloads_per_second": round(handled / ingest_seconds, 1) if ingest_seconds else 0.0,
+        "segments_per_second": round(segments_in / ingest_seconds, 1) if ingest_seconds else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 0.5) * 1000, 3),
+            "p99": round(percentile(latencies, 0.99) * 1000, 3),
+            "max": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        },
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "baseline_rss_mb": round(baseline_rss, 1),
+        "webhook_requests": server.requests,
+        "llm_calls": llm.calls,
+        "tts_calls": snapshot["latency"].get("tts", {}).get("count", 0),
+        "stages_ms": {name: {"p50": round(stage["p50"] * 1000, 3), "p99": round(stage["p99"] * 1000, 3),
+                             "count": stage["count"]}
+                      for name, stage in snapshot["latency"].items()},
+    }
+
+
+def run_quietly(*args) -> Dict[str, Any]:
+    """run_workload without the pipeline's console output."""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        return run_workload(*args)
+
+
+def run_isolated(*args, verbose: bool = False) -> Dict[str, Any]:
+    """Run a workload in a fresh process, so peak RSS belongs to that workload alone."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+        return executor.submit(run_workload if verbose else run_quietly, *args).result()
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: Dict[str, Any], baseline_file: str) -> None:
+    """Print how each workload changed against an earlier results file."""
+    with open(baseline_file, 'r', encoding='utf-8') as f:
+        baseline = {(run["workload"], run["mode"]): run for run in json.load(f)["runs"]}
+    print(f"\nCompared with {baseline_file}:")
+    for run in results["runs"]:
+        before = baseline.get((run["workload"], run["mode"]))
+        if before is None:
+            continue
+        print(f"  {run['workload']:>9} {run['mode']:<8} "
+              f"throughput {run['segments_per_second'] / max(before['segments_per_second'], 1e-9):5.2f}x  "
+              f"p99 {run['latency_ms']['p99'] / max(before['latency_ms']['p99'], 1e-9):5.2f}x  "
+              f"peak RSS {run['peak_rss_mb'] - before['peak_rss_mb']:+.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded and synthetic payloads through the whole pipeline")
+    parser.add_argument('--workloads', nargs='+', default=['live', 'archives', '10000', '100000'],
+                        help="live, archives and/or synthetic segment counts (e.g. 1000000)")
+    parser.add_argument('--realtime', nargs='*', default=['live'],
+                        help="Workloads to also replay in real time (default: live)")
+    parser.add_argument('--speed', type=float, default=1.0, help="Real-time replay speed-up")
+    parser.add_argument('--llm-latency', type=float, default=0.05, help="Mock LLM response delay in seconds")
+    parser.add_argument('--tts-seconds', type=float, default=0.01, help="Mock TTS time per sentence")
+    parser.add_argument('--output', help=f"Results file (default: {RESULTS_DIR}/pipeline-<time>.json)")
+    parser.add_argument('--compare', help="Earlier results file to compare with")
+    parser.add_argument('--verbose', action='store_true', help="Show the pipeline's own output")
+    args = parser.parse_args()
+
+    runs = [(workload, 'max') for workload in args.workloads]
+    runs += [(workload, 'realtime') for workload in args.realtime]
+
+    results = {
+        "timestamp": datetime.now().isoformat(timespec='seconds'),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "runs": [],
+    }
+    print(f"{'workload':>9} {'mode':<8} {'segments':>9} {'seg/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'RSS MB':>7}")
+    for workload, mode in runs:
+        run = run_isolated(workload, mode, args.speed, args.llm_latency, args.tts_seconds, verbose=args.verbose)
+        results["runs"].append(run)
+        print(f"{workload:>9} {mode:<8} {run['segments_in']:>9} {run['segments_per_second']:>10,.0f} "
+              f"{run['latency_ms']['p50']:>8.2f} {run['latency_ms']['p99']:>8.2f} {run['peak_rss_mb']:>7.1f}")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"pipeline-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
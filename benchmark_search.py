@@ -0,0 +1,103 @@
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from typing import Callable, List
+
+from conversation_index import ConversationIndex
+from trigger_engine import normalize_tokens
+
+WORDS = ("so", "what", "do", "you", "think", "about", "the", "new", "project", "we", "should",
+         "probably", "meet", "again", "tomorrow", "yeah", "that", "sounds", "good", "really",
+         "basketball", "coffee", "weekend", "class", "homework", "music", "game", "dinner")
+
+
+def write_conversations(conversations_dir: str, count: int, segments_per_conversation: int, seed: int = 5) -> int:
+    """Write synthetic archived conversations; every 50th one mentions "I like your shoes". Returns segments written."""
+    rng = random.Random(seed)
+    os.makedirs(conversations_dir, exist_ok=True)
+    total = 0
+    for number in range(1, count + 1):
+        segments = []
+        for i in range(segments_per_conversation):
+            words = [rng.choice(WORDS) for _ in range(rng.randint(4, 14))]
+            if number % 50 == 0 and i == segments_per_conversation // 2:
+                words[1:1] = ["i", "like", "your", "shoes"]
+            seconds = i * 3
+            segments.append({
+                "speaker": f"SPEAKER_{rng.randint(0, 3)}",
+                "text": " ".join(words),
+                "timestamp": f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}",
+            })
+        with open(os.path.join(conversations_dir, f'convo_{number}.json'), 'w', encoding='utf-8') as f:
+            json.dump(segments, f)
+        total += len(segments)
+    return total
+
+
+def scan_files(conversations_dir: str, phrase: str) -> int:
+    """The previous way: load every archive and look for the phrase."""
+    needle = " ".join(normalize_tokens(phrase))
+    hits = 0
+    for name in os.listdir(conversations_dir):
+        with open(os.path.join(conversations_dir, name), 'r', encoding='utf-8') as f:
+            for segment in json.load(f):
+                if needle in " ".join(normalize_tokens(segment.get('text', ''))):
+                    hits += 1
+    return hits
+
+
+def latencies(function: Callable, rounds: int) -> List[float]:
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - started) * 1000)
+    return sorted(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark indexing throughput and query latency of the conversation index")
+    parser.add_argument('--conversations', type=int, default=2000, help="Synthetic archived conversations")
+    parser.add_argument('--segments', type=int, default=100, help="Segments per conversation")
+    parser.add_argument('--rounds', type=int, default=200, help="Runs of each query")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conversations_dir = os.path.join(tmp, 'previous_conversations')
+        total = write_conversations(conversations_dir, args.conversations, args.segments)
+        print(f"{args.conversations} conversations, {total} segments\n")
+
+        index = ConversationIndex(os.path.join(tmp, 'conversation_index.sqlite3'))
+        started = time.perf_counter()
+        index.update(conversations_dir)
+        seconds = time.perf_counter() - started
+        print(f"Indexing: {seconds:.2f}s ({total / seconds:,.0f} segments/s, "
+              f"{args.conversations / seconds:,.0f} conversations/s)")
+
+        started = time.perf_counter()
+        index.update(conversations_dir)
+        print(f"Incremental update with nothing new: {(time.perf_counter() - started) * 1000:.1f} ms\n")
+
+        queries = {
+            "phrase": lambda: index.search("I like your"),
+            "speaker + time range": lambda: index.search(speaker="SPEAKER_2", start=60, end=120),
+            "phrase + speaker": lambda: index.search("basketball game", speaker="SPEAKER_1"),
+            "related context": lambda: index.related_context("what about the basketball game this weekend"),
+        }
+        print(f"{'query':<24} {'p50 ms':>8} {'p99 ms':>8}")
+        for name, query in queries.items():
+            timings = latencies(query, args.rounds)
+            print(f"{name:<24} {timings[len(timings) // 2]:>8.2f} {timings[int(len(timings) * 0.99) - 1]:>8.2f}")
+
+        started = time.perf_counter()
+        hits = scan_files(conversations_dir, "I like your")
+        print(f"\nLoading every archive (previous): {(time.perf_counter() - started) * 1000:.1f} ms "
+              f"for the same phrase ({hits} hits, index found {len(index.search('I like your', limit=10000))})")
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
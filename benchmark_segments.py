@@ -0,0 +1,90 @@
+import gc
+import json
+import time
+import tracemalloc
+from typing import Callable, List
+
+from payload_archive import iter_payloads
+from segment_model import Segment, SegmentBuffer, format_timestamp
+
+
+def load_contents(source: str = 'live_transcript.json', target: int = 100000) -> List[str]:
+    """
+    Build webhook content strings holding about target segments, from recorded payloads.
+    Segment ids are made unique per copy so nothing is shared between copies.
+    """
+    recorded = [json.loads(payload['content']) for payload in iter_payloads(source)
+                if isinstance(payload.get('content'), str)]
+    per_copy = sum(len(content.get('segments', [])) for content in recorded) or 1
+    contents = []
+    for copy in range(max(1, target // per_copy)):
+        for content in recorded:
+            segments = [dict(segment, id=f"{segment.get('id')}-{copy}") for segment in content.get('segments', [])]
+            contents.append(json.dumps(dict(content, segments=segments)))
+    return contents
+
+
+def parse_dicts(contents: List[str]) -> list:
+    """The previous parse_webhook_data: one dict with a formatted timestamp per segment."""
+    parsed = []
+    for content in contents:
+        for segment in json.loads(content).get('segments', []):
+            processed = {
+                "speaker": segment.get('speaker', 'UNKNOWN'),
+                "text": segment.get('text', '').strip(),
+                "timestamp": format_timestamp(segment.get('start', 0)),
+            }
+            if segment.get('id'):
+                processed["id"] = segment['id']
+            parsed.append(processed)
+    return parsed
+
+
+def parse_segments(contents: List[str]) -> list:
+    """parse_webhook_data now: one Segment (with __slots__) per segment."""
+    parsed = []
+    for content in contents:
+        parsed.extend(Segment.from_omi(segment) for segment in json.loads(content).get('segments', []))
+    return parsed
+
+
+def parse_buffer(contents: List[str]) -> SegmentBuffer:
+    """Segments appended to a columnar SegmentBuffer."""
+    buffer = SegmentBuffer()
+    for content in contents:
+        buffer.extend(Segment.from_omi(segment) for segment in json.loads(content).get('segments', []))
+    return buffer
+
+
+def measure(build: Callable, contents: List[str]):
+    """Time one build and measure the memory its result keeps alive."""
+    gc.collect()
+    started = time.perf_counter()
+    result = build(contents)
+    seconds = time.perf_counter() - started
+    del result
+
+    gc.collect()
+    tracemalloc.start()
+    result = build(contents)
+    gc.collect()
+    retained, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return len(result), seconds, retained
+
+
+def main():
+    contents = load_contents()
+    print(f"Parsing {len(contents)} webhook bodies\n")
+    print(f"{'model':<24} {'segments':>9} {'segments/s':>12} {'bytes/segment':>14}")
+    for name, build in (("dict (previous)", parse_dicts), ("Segment", parse_segments),
+                        ("SegmentBuffer", parse_buffer)):
+        count, seconds, retained = measure(build, contents)
+        print(f"{name:<24} {count:>9} {count / seconds:>12,.0f} {retained / count:>14.0f}")
+    print("\nbytes/segment includes the segment text and id. The recording is repeated, so SegmentBuffer's "
+          "interning shares repeated texts more than a real conversation would. The dict version also drops "
+          "end, speaker_id and is_user.")
+
+
+if __name__ == "__main__":
+    main()
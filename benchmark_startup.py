@@ -0,0 +1,95 @@
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from segment_log import SegmentLog
+from trigger_engine import TriggerEngine
+from webhook import TranscriptionProcessor
+
+WORDS = ("so", "what", "do", "you", "think", "about", "the", "new", "project", "we", "should",
+         "probably", "meet", "again", "tomorrow", "yeah", "that", "sounds", "good", "really")
+
+
+def noop_action(context=None):
+    """Trigger action that does nothing (takes context so no legacy file is compacted per trigger)."""
+
+
+def make_segments(count: int, start: int = 0, trigger_every: int = 5000, seed: int = 11):
+    """Build synthetic processed segments; every trigger_every-th one contains the trigger phrase."""
+    rng = random.Random(seed + start)
+    segments = []
+    for i in range(start, start + count):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(4, 14))]
+        if i % trigger_every == 0:
+            words[1:1] = ["i", "like", "your", "shoes"]
+        seconds = i * 3
+        segments.append({
+            "id": f"seg-{i}",
+            "speaker": f"SPEAKER_{i % 2}",
+            "text": " ".join(words),
+            "timestamp": f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}",
+        })
+    return segments
+
+
+def full_rescan(output_file: str, engine: TriggerEngine) -> int:
+    """The previous startup path: load the whole legacy file and match every segment."""
+    with open(output_file, 'r', encoding='utf-8') as f:
+        segments = json.load(f)
+    return sum(1 for segment in segments if engine.match(segment.get('text', '')))
+
+
+def timed_startup(output_file: str):
+    """
+    Time what webhook.py does before listening: open the log and scan for triggers.
+
+    Returns:
+        (seconds, number of trigger actions queued)
+    """
+    started = time.perf_counter()
+    processor = TranscriptionProcessor({"I like your": noop_action})
+    processor.scan_all_segments_for_phrase(output_file)
+    elapsed = time.perf_counter() - started
+    processor.action_executor.shutdown()
+    for segment_log in processor.segment_logs.values():
+        segment_log.close()
+    return elapsed, processor.action_executor.stats()["submitted"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark startup scanning with and without the scan checkpoint")
+    parser.add_argument('--segments', type=int, default=100000, help="Segments in the synthetic transcript")
+    parser.add_argument('--new', type=int, default=100, help="Segments appended between the two restarts")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        output_file = os.path.join(tmp, 'processed_transcription.json')
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(make_segments(args.segments), f)
+
+        results = {}
+
+        started = time.perf_counter()
+        hits = full_rescan(output_file, TriggerEngine({"I like your": None}))
+        results["full rescan (previous)"] = (time.perf_counter() - started, hits)
+
+        # First launch imports the legacy file into the log and checks everything once
+        results["first launch (no checkpoint)"] = timed_startup(output_file)
+        results["restart, nothing new"] = timed_startup(output_file)
+
+        segment_log = SegmentLog(output_file)
+        segment_log.append(make_segments(args.new, start=args.segments, trigger_every=max(1, args.new // 2)))
+        segment_log.close()
+        results[f"restart, {args.new} new"] = timed_startup(output_file)
+
+    print(f"\nStartup scan over {args.segments} segments")
+    print(f"{'scenario':<32} {'ms':>10} {'triggers':>9}")
+    for name, (seconds, triggers) in results.items():
+        print(f"{name:<32} {seconds * 1000:>10.1f} {triggers:>9}")
+
+
+if __name__ == "__main__":
+    main()
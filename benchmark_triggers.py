@@ -0,0 +1,106 @@
+import glob
+import json
+import random
+import time
+from typing import List
+
+from trigger_engine import TriggerEngine, normalize_tokens
+
+
+def load_corpus(pattern: str = 'previous_conversations/**/convo_*.json') -> List[str]:
+    """
+    Load the text of every archived segment.
+
+    Args:
+        pattern: Glob for the archived conversation files
+
+    Returns:
+        List of segment texts
+    """
+    texts = []
+    for path in sorted(glob.glob(pattern, recursive=True)):
+        with open(path, 'r', encoding='utf-8') as f:
+            try:
+                segments = json.load(f)
+            except json.JSONDecodeError:
+                continue
+        texts.extend(segment.get('text', '') for segment in segments)
+    return texts
+
+
+def make_phrases(texts: List[str], count: int, seed: int = 7) -> List[str]:
+    """
+    Build trigger phrases: "I like your", some word n-grams taken from the
+    corpus (so a share of them really match), and made-up filler phrases.
+    """
+    rng = random.Random(seed)
+    ngrams = set()
+    for text in texts:
+        tokens = normalize_tokens(text)
+        for size in (2, 3):
+            for i in range(len(tokens) - size + 1):
+                ngrams.add(" ".join(tokens[i:i + size]))
+    ngrams = sorted(ngrams)
+
+    phrases = ["I like your"]
+    while len(phrases) < count:
+        if ngrams and rng.random() < 0.3:
+            phrases.append(rng.choice(ngrams))
+        else:
+            phrases.append(f"zq{rng.randrange(10 ** 6)} trigger {rng.randrange(10 ** 6)}")
+    return phrases[:count]
+
+
+def naive_match(texts: List[str], phrases: List[str]) -> int:
+    """The current approach: lowercase each text and run one `in` test per phrase."""
+    lowered_phrases = [phrase.lower() for phrase in phrases]
+    hits = 0
+    for text in texts:
+        text_lower = text.lower()
+        for phrase in lowered_phrases:
+            if phrase in text_lower:
+                hits += 1
+    return hits
+
+
+def engine_match(texts: List[str], engine: TriggerEngine) -> int:
+    """The trigger engine: one pass per text for all phrases (hits counted once per phrase, like naive)."""
+    hits = 0
+    for text in texts:
+        hits += len({match.phrase for match in engine.match(text)})
+    return hits
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - started
+
+
+def main():
+    texts = load_corpus()
+    if not texts:
+        print("No archived segments found in previous_conversations/")
+        return
+
+    # Repeat the archive so timings are well above timer resolution
+    corpus = texts * max(1, 20000 // len(texts))
+    print(f"Corpus: {len(texts)} archived segments, replayed as {len(corpus)} segments\n")
+    print(f"{'phrases':>8} {'naive ms':>10} {'engine ms':>10} {'compile ms':>11} {'speedup':>8} {'naive hits':>11} {'engine hits':>12}")
+
+    for count in (1, 10, 100, 500, 1000):
+        phrases = make_phrases(texts, count)
+        naive_hits, naive_seconds = timed(naive_match, corpus, phrases)
+        engine, compile_seconds = timed(TriggerEngine, {phrase: None for phrase in phrases})
+        engine_hits, engine_seconds = timed(engine_match, corpus, engine)
+        print(f"{count:>8} {naive_seconds * 1000:>10.1f} {engine_seconds * 1000:>10.1f} "
+              f"{compile_seconds * 1000:>11.2f} {naive_seconds / engine_seconds:>7.1f}x "
+              f"{naive_hits:>11} {engine_hits:>12}")
+
+    print("\nHit counts differ because the engine ignores punctuation between words "
+          "(\"yeah. yeah\" matches \"yeah yeah\") and only matches whole words "
+          "(\"i like your\" does not fire on \"i like yours\").")
+
+
+if __name__ == "__main__":
+    main()
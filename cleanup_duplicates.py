@@ -1,28 +1,28 @@
 import json
+import os
+from segment_log import compact_log, log_path_for
+from segment_merge import merge_segments
 
 def cleanup_duplicates():
-    """Remove duplicate segments from processed_transcription.json"""
+    """Remove duplicate and superseded (partial, later revised) segments from processed_transcription.json"""
     try:
+        # Pick up segments that are still only in the append-only log
+        log_file = log_path_for('processed_transcription.json')
+        if os.path.exists(log_file):
+            compact_log(log_file, 'processed_transcription.json')
+        
         # Read the current file
         with open('processed_transcription.json', 'r', encoding='utf-8') as f:
             segments = json.load(f)
         
         print(f"Original segments: {len(segments)}")
         
-        # Create a set to track unique segments
-        seen_segments = set()
-        unique_segments = []
-        
-        for segment in segments:
-            # Create a unique identifier for each segment
-            segment_id = f"{segment['speaker']}_{segment['text']}_{segment['timestamp']}"
-            
-            if segment_id not in seen_segments:
-                seen_segments.add(segment_id)
-                unique_segments.append(segment)
+        # Same upsert logic as the live pipeline: matched by Omi id or by speaker + overlapping time,
+        # each revision replaces the partial version it grew from
+        unique_segments = merge_segments(segments)
         
         print(f"Unique segments: {len(unique_segments)}")
-        print(f"Removed {len(segments) - len(unique_segments)} duplicates")
+        print(f"Removed {len(segments) - len(unique_segments)} duplicates and superseded partial segments")
         
         # Write back the cleaned data
         with open('processed_transcription.json', 'w', encoding='utf-8') as f:
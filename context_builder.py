@@ -0,0 +1,201 @@
+import threading
+from collections import deque
+from typing import Callable, List, Tuple
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count for budgeting (about 4 characters per token for English).
+
+    Args:
+        text: Text to measure
+
+    Returns:
+        Estimated number of tokens (at least 1)
+    """
+    return max(1, (len(text) + 3) // 4)
+
+
+def summarize_turns(turns: List[Tuple[str, str]], words_per_turn: int = 12) -> str:
+    """
+    Default summarizer: keep the opening words of each older turn.
+
+    Args:
+        turns: (speaker, text) pairs, oldest first
+        words_per_turn: Words kept from each turn
+
+    Returns:
+        One-line summary of the turns
+    """
+    parts = []
+    for speaker, text in turns:
+        words = text.split()
+        snippet = " ".join(words[:words_per_turn])
+        if len(words) > words_per_turn:
+            snippet += "…"
+        parts.append(f"{speaker}: {snippet}")
+    return " / ".join(parts)
+
+
+class ConversationContext:
+    """
+    Rolling, token-budgeted view of the conversation for building prompts.
+
+    Segments are added as they arrive, so a trigger never has to reload the
+    transcript file. The most recent turns are kept verbatim with speaker
+    labels. When they outgrow their share of the budget, the oldest turns are
+    folded, a block at a time, into summaries that are computed once and
+    cached. The oldest summaries are dropped when they outgrow theirs. The
+    rendered text is cached until the next segment arrives, so building a
+    prompt costs O(1) amortized per trigger and is bounded by the budget, not
+    by the length of the conversation.
+    """
+
+    def __init__(self, token_budget: int = 2000, summary_share: float = 0.25,
+                 summary_block: int = 8, summarizer: Callable[[List[Tuple[str, str]]], str] = summarize_turns):
+        """
+        Args:
+            token_budget: Maximum estimated tokens of conversation text in a prompt
+            summary_share: Fraction of the budget reserved for summaries of older turns
+            summary_block: Number of evicted turns folded into each cached summary
+            summarizer: Turns a block of (speaker, text) pairs into one summary line
+        """
+        self.token_budget = token_budget
+        self.summary_budget = int(token_budget * summary_share)
+        self.recent_budget = max(1, token_budget - self.summary_budget)  # Room for at least the latest words
+        self.summary_block = summary_block
+        self.summarizer = summarizer
+
+        self._recent = deque()  # [speaker, text, tokens], oldest first
+        self._recent_tokens = 0
+        self._evicted = []  # Turns waiting to fill a summary block
+        self._summaries = deque()  # (summary, tokens), oldest first
+        self._summary_tokens = 0
+        self._rendered = None
+        self._lock = threading.Lock()
+
+    def add(self, speaker: str, text: str, new_turn: bool = False) -> None:
+        """
+        Add a segment (or a whole turn) to the conversation.
+        Consecutive segments from the same speaker are joined into one turn.
+
+        Args:
+            speaker: Speaker label (e.g. SPEAKER_1)
+            text: Segment text
+            new_turn: Start a new turn even if the same speaker spoke last (e.g. after a long pause)
+        """
+        text = text.strip()
+        if not text:
+            return
+        with self._lock:
+            if not new_turn and self._recent and self._recent[-1][0] == speaker:
+                turn = self._recent[-1]
+                turn[1] = f"{turn[1]} {text}"
+                self._recent_tokens -= turn[2]
+                turn[2] = estimate_tokens(turn[1])
+                self._recent_tokens += turn[2]
+            else:
+                tokens = estimate_tokens(text)
+                self._recent.append([speaker, text, tokens])
+                self._recent_tokens += tokens
+            self._rendered = None
+            self._enforce_budget()
+
+    def revise(self, speaker: str, old_text: str, new_text: str) -> bool:
+        """
+        Replace the text of a segment that was revised after it was added.
+        Only turns that are still verbatim can be revised; summarized ones are left alone.
+
+        Args:
+            speaker: Speaker label of the segment
+            old_text: Text the segment was added with
+            new_text: Revised text
+
+        Returns:
+            True if the segment was found and revised
+        """
+        old_text = old_text.strip()
+        new_text = new_text.strip()
+        if not old_text:
+            return False
+        with self._lock:
+            for turn in reversed(self._recent):
+                if turn[0] != speaker:
+                    continue
+                position = turn[1].rfind(old_text)
+                if position == -1:
+                    continue
+                turn[1] = turn[1][:position] + new_text + turn[1][position + len(old_text):]
+                self._recent_tokens -= turn[2]
+                turn[2] = estimate_tokens(turn[1])
+                self._recent_tokens += turn[2]
+                self._rendered = None
+                self._enforce_budget()
+                return True
+        return False
+
+    def add_segments(self, segments: List[dict]) -> None:
+        """Add processed segments (dicts with speaker and text)."""
+        for segment in segments:
+            self.add(segment.get('speaker', 'UNKNOWN'), segment.get('text', ''))
+
+    def _enforce_budget(self) -> None:
+        """Move the oldest verbatim turns into summaries until everything fits (caller holds the lock)."""
+        while self._recent_tokens > self.recent_budget and len(self._recent) > 1:
+            speaker, text, tokens = self._recent.popleft()
+            self._recent_tokens -= tokens
+            self._evicted.append((speaker, text))
+            if len(self._evicted) >= self.summary_block:
+                self._add_summary(self.summarizer(self._evicted))
+                self._evicted = []
+
+        # A single turn longer than the whole budget keeps only its most recent words
+        if self._recent_tokens > self.recent_budget:
+            turn = self._recent[0]
+            turn[1] = "…" + turn[1][-self.recent_budget * 4:]
+            self._recent_tokens = turn[2] = estimate_tokens(turn[1])
+
+    def _add_summary(self, summary: str) -> None:
+        tokens = estimate_tokens(summary)
+        self._summaries.append((summary, tokens))
+        self._summary_tokens += tokens
+        while self._summary_tokens > self.summary_budget and self._summaries:
+            _, dropped = self._summaries.popleft()
+            self._summary_tokens -= dropped
+
+    def render(self) -> str:
+        """
+        Build the conversation text for a prompt.
+
+        Returns:
+            Summaries of older turns (if any) followed by recent turns as "SPEAKER_n: text" lines
+        """
+        with self._lock:
+            if self._rendered is None:
+                lines = []
+                earlier = [summary for summary, _ in self._summaries]
+                if self._evicted:
+                    earlier.append(self.summarizer(self._evicted))
+                if earlier:
+                    lines.append("Earlier in the conversation (summarized):")
+                    lines.extend(earlier)
+                    lines.append("")
+                    lines.append("Most recent turns:")
+                lines.extend(f"{speaker}: {text}" for speaker, text, _ in self._recent)
+                self._rendered = "\n".join(lines)
+            return self._rendered
+
+    def token_count(self) -> int:
+        """Estimated tokens of the verbatim turns and cached summaries."""
+        with self._lock:
+            return self._recent_tokens + self._summary_tokens
+
+    def reset(self) -> None:
+        """Forget the conversation, e.g. when a new one starts."""
+        with self._lock:
+            self._recent.clear()
+            self._recent_tokens = 0
+            self._evicted = []
+            self._summaries.clear()
+            self._summary_tokens = 0
+            self._rendered = None
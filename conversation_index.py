@@ -0,0 +1,295 @@
+import argparse
+import glob
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List
+
+from archive_manager import MANIFEST_FILE
+from fast_json import iter_json_array
+from segment_model import Segment, format_timestamp
+from trigger_engine import normalize_tokens
+
+
+def fts_phrase(phrase: str) -> str:
+    """Quote text as an FTS5 phrase query (words in order, case and punctuation ignored)."""
+    return '"' + " ".join(normalize_tokens(phrase)).replace('"', '""') + '"'
+
+
+class ConversationIndex:
+    """
+    Full-text index over archived conversations, backed by SQLite FTS5.
+
+    Every segment of an archived conversation is one row of a plain table
+    (speaker, start/end times, text) with an external-content FTS5 index
+    over the text, so phrase, speaker and time-range filters are all
+    answered from indexes instead of reading the archives.
+    Conversations are indexed one at a time as they are archived; update()
+    catches up with a directory by (re)indexing only new or changed files.
+    """
+
+    def __init__(self, db_file: str = 'conversation_index.sqlite3'):
+        """
+        Args:
+            db_file: SQLite database path (':memory:' for a throwaway index)
+        """
+        self.db_file = db_file
+        self._lock = threading.Lock()
+        # Searched from trigger actions on the action executor's worker thread
+        self._db = sqlite3.connect(db_file, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS conversations ("
+            " id INTEGER PRIMARY KEY,"
+            " path TEXT UNIQUE NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " mtime REAL NOT NULL,"
+            " segment_count INTEGER NOT NULL,"
+            " indexed_at REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS segments ("
+            " id INTEGER PRIMARY KEY,"
+            " conversation_id INTEGER NOT NULL,"
+            " position INTEGER NOT NULL,"
+            " speaker TEXT NOT NULL,"
+            " start REAL NOT NULL,"
+            " end REAL,"
+            " text TEXT NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS segments_conversation ON segments (conversation_id, start)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS segments_speaker ON segments (speaker, start)")
+        self._db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS segment_text USING fts5("
+                         "text, content='segments', content_rowid='id', tokenize='unicode61')")
+        # Per-word document counts, used to query with the most distinctive words
+        self._db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS segment_vocab USING fts5vocab(segment_text, 'row')")
+        self._db.commit()
+
+    def __len__(self) -> int:
+        """Number of indexed conversations."""
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+
+    def _remove(self, conversation_id: int) -> None:
+        # External-content FTS rows are removed by passing the indexed values back
+        self._db.execute("INSERT INTO segment_text (segment_text, rowid, text)"
+                         " SELECT 'delete', id, text FROM segments WHERE conversation_id = ?", (conversation_id,))
+        self._db.execute("DELETE FROM segments WHERE conversation_id = ?", (conversation_id,))
+        self._db.execute("DELETE FROM conversations WHERE id = ?", (conversation_id,))
+
+    def index_conversation(self, path: str, segments: Iterable[Dict[str, Any]] = None) -> int:
+        """
+        Add an archived conversation to the index, replacing it if it was indexed before.
+
+        Args:
+            path: Path of the archived conversation file
+            segments: Its processed segments (read from the file when not given)
+
+        Returns:
+            Number of segments indexed
+        """
+        stat = os.stat(path)
+        if segments is None:
+            with open(path, 'r', encoding='utf-8') as f:
+                segments = [data for data in iter_json_array(f) if isinstance(data, dict)]
+        segments = [data if isinstance(data, Segment) else Segment.from_dict(data) for data in segments]
+
+        with self._lock:
+            with self._db:
+                row = self._db.execute("SELECT id FROM conversations WHERE path = ?", (path,)).fetchone()
+                if row is not None:
+                    self._remove(row[0])
+                conversation_id = self._db.execute(
+                    "INSERT INTO conversations (path, size, mtime, segment_count, indexed_at) VALUES (?, ?, ?, ?, ?)",
+                    (path, stat.st_size, stat.st_mtime, len(segments), time.time()),
+                ).lastrowid
+                first = self._db.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM segments").fetchone()[0]
+                self._db.executemany(
+                    "INSERT INTO segments (id, conversation_id, position, speaker, start, end, text)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    ((first + position, conversation_id, position, segment.speaker, segment.start, segment.end,
+                      segment.text) for position, segment in enumerate(segments)),
+                )
+                self._db.execute("INSERT INTO segment_text (rowid, text) SELECT id, text FROM segments WHERE id >= ?",
+                                 (first,))
+        return len(segments)
+
+    def update(self, conversations_dir: str = 'previous_conversations') -> Dict[str, int]:
+        """
+        Bring the index in line with a directory of archives (including date subdirectories).
+        New and changed files are (re)indexed, deleted ones removed.
+
+        Args:
+            conversations_dir: Archive directory
+
+        Returns:
+            Counts of indexed, unchanged and removed conversations
+        """
+        paths = {path for path in glob.glob(os.path.join(conversations_dir, '**', '*.json'), recursive=True)
+                 if os.path.basename(path) != MANIFEST_FILE}
+        # Only rows inside this directory: the separator keeps e.g. previous_conversations_old/ out
+        prefix = os.path.join(conversations_dir, '')
+        with self._lock:
+            known = {path: (conversation_id, size, mtime) for conversation_id, path, size, mtime in self._db.execute(
+                "SELECT id, path, size, mtime FROM conversations WHERE path LIKE ? ESCAPE '\\'",
+                (prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%',))}
+
+        counts = {"indexed": 0, "unchanged": 0, "removed": 0}
+        for path in sorted(paths):
+            stat = os.stat(path)
+            entry = known.get(path)
+            if entry is not None and entry[1] == stat.st_size and entry[2] == stat.st_mtime:
+                counts["unchanged"] += 1
+                continue
+            try:
+                self.index_conversation(path)
+                counts["indexed"] += 1
+            except (OSError, ValueError) as e:
+                print(f"Error indexing {path}: {e}")
+
+        with self._lock:
+            with self._db:
+                for path, (conversation_id, _size, _mtime) in known.items():
+                    if path not in paths:
+                        self._remove(conversation_id)
+                        counts["removed"] += 1
+        return counts
+
+    def search(self, phrase: str = None, speaker: str = None, start: float = None, end: float = None,
+               conversation: str = None, match_any: bool = False, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Find archived segments.
+
+        Args:
+            phrase: Words that must appear in this order (case and punctuation ignored)
+            speaker: Only segments from this speaker label (e.g. SPEAKER_0)
+            start: Only segments starting at or after this many seconds into their conversation
+            end: Only segments starting before this many seconds into their conversation
+            conversation: Only segments from this archive path
+            match_any: Treat phrase as a bag of words and rank segments containing any of them
+            limit: Maximum number of results
+
+        Returns:
+            Processed segment dicts with the archive path ("conversation") and segment position added,
+            best text matches first (or in conversation order without a phrase)
+        """
+        conditions = []
+        params = []
+        if phrase:
+            tokens = normalize_tokens(phrase)
+            if not tokens:
+                return []
+            if match_any:
+                query = " OR ".join(fts_phrase(token) for token in dict.fromkeys(tokens))
+            else:
+                query = fts_phrase(phrase)
+            conditions.append("segment_text MATCH ?")
+            params.append(query)
+        if speaker is not None:
+            conditions.append("s.speaker = ?")
+            params.append(speaker)
+        if start is not None:
+            conditions.append("s.start >= ?")
+            params.append(start)
+        if end is not None:
+            conditions.append("s.start < ?")
+            params.append(end)
+        if conversation is not None:
+            conditions.append("c.path = ?")
+            params.append(conversation)
+
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        if phrase:
+            # Start from the full-text matches, best first
+            tables = "segment_text JOIN segments s ON s.id = segment_text.rowid"
+            order = "bm25(segment_text)"
+        else:
+            tables = "segments s"
+            order = "s.id"
+        sql = ("SELECT c.path, s.position, s.speaker, s.text, s.start, s.end"
+               f" FROM {tables} JOIN conversations c ON c.id = s.conversation_id"
+               f"{where} ORDER BY {order} LIMIT ?")
+        params.append(limit)
+
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        return [
+            {"conversation": path, "position": position, "speaker": speaker_label, "text": text,
+             "timestamp": format_timestamp(segment_start), "start": segment_start, "end": segment_end}
+            for path, position, speaker_label, text, segment_start, segment_end in rows
+        ]
+
+    def related_context(self, conversation_text: str, limit: int = 5, recent_words: int = 64,
+                        max_words: int = 8) -> str:
+        """
+        Earlier segments most related to the current conversation, for adding to a prompt.
+
+        Of the last recent_words distinct words of the conversation, the
+        max_words that occur in the fewest archived segments (the most
+        distinctive ones; filler words are in nearly all of them) are ranked
+        against the whole index with BM25.
+
+        Args:
+            conversation_text: Text of the current conversation
+            limit: Number of earlier segments to include
+            recent_words: Number of recent distinct words considered
+            max_words: Number of words used as the query
+
+        Returns:
+            One "[convo] SPEAKER: text" line per segment, or '' if nothing matches
+        """
+        words = list(dict.fromkeys(reversed(normalize_tokens(conversation_text))))[:recent_words]
+        if not words:
+            return ""
+        with self._lock:
+            counts = self._db.execute(
+                f"SELECT term FROM segment_vocab WHERE term IN ({', '.join('?' * len(words))}) ORDER BY doc LIMIT ?",
+                words + [max_words],
+            ).fetchall()
+        if not counts:
+            return ""
+        hits = self.search(" ".join(term for term, in counts), match_any=True, limit=limit)
+        return "\n".join(f"[{os.path.splitext(os.path.basename(hit['conversation']))[0]}] "
+                         f"{hit['speaker']}: {hit['text']}" for hit in hits)
+
+    def stats(self) -> Dict[str, int]:
+        """Number of indexed conversations and segments."""
+        with self._lock:
+            conversations = self._db.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+            segments = self._db.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+        return {"conversations": conversations, "segments": segments}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search archived conversations")
+    parser.add_argument('phrase', nargs='?', help="Words to find, in order")
+    parser.add_argument('--dir', default='previous_conversations', help="Archive directory")
+    parser.add_argument('--db', default='conversation_index.sqlite3', help="Index database")
+    parser.add_argument('--speaker', help="Only this speaker (e.g. SPEAKER_0)")
+    parser.add_argument('--start', type=float, help="Only segments starting at or after this many seconds")
+    parser.add_argument('--end', type=float, help="Only segments starting before this many seconds")
+    parser.add_argument('--limit', type=int, default=20, help="Maximum number of results")
+    args = parser.parse_args()
+
+    index = ConversationIndex(args.db)
+    counts = index.update(args.dir)
+    if counts["indexed"] or counts["removed"]:
+        print(f"📚 Indexed {counts['indexed']}, removed {counts['removed']} conversation(s)")
+
+    started = time.perf_counter()
+    hits = index.search(args.phrase, args.speaker, args.start, args.end, limit=args.limit)
+    elapsed = (time.perf_counter() - started) * 1000
+    for hit in hits:
+        print(f"{hit['conversation']} [{hit['timestamp']}] {hit['speaker']}: {hit['text']}")
+    print(f"\n{len(hits)} result(s) in {elapsed:.1f} ms")
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
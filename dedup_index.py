@@ -0,0 +1,118 @@
+import hashlib
+import mmap
+import os
+from array import array
+from typing import Dict, Any, Iterable
+
+KEY_SIZE = 8  # Bytes per key in the sidecar file (unsigned 64-bit, native byte order)
+
+
+def segment_key(segment: Dict[str, Any]) -> int:
+    """
+    Compute the compact 64-bit dedup key for a segment.
+
+    Segments carrying Omi's stable segment id are keyed on that id. Omi resends
+    revised text under the same id, so the text is folded into the key too and
+    a revision is never mistaken for a duplicate. Segments without an id (e.g.
+    older archives) fall back to a hash of speaker, text and timestamp.
+
+    Args:
+        segment: Processed segment dictionary
+
+    Returns:
+        Unsigned 64-bit integer key
+    """
+    segment_id = segment.get('id')
+    if segment_id:
+        material = f"{segment_id}\x00{segment.get('text', '')}"
+    else:
+        material = f"{segment.get('speaker', '')}\x00{segment.get('text', '')}\x00{segment.get('timestamp', '')}"
+    digest = hashlib.blake2b(material.encode('utf-8'), digest_size=KEY_SIZE).digest()
+    return int.from_bytes(digest, 'little')
+
+
+class DedupIndex:
+    """
+    Set of 64-bit segment keys persisted to a flat sidecar file.
+
+    The sidecar is an array of raw unsigned 64-bit integers, appended to as
+    keys are added. On startup it is memory-mapped and loaded straight into a
+    set, so a restarted process does not have to re-parse the transcript to
+    rebuild its dedup state.
+    """
+
+    def __init__(self, index_file: str):
+        """
+        Load (or create) the dedup index sidecar.
+
+        Args:
+            index_file: Path to the sidecar file (e.g. processed_transcription.idx)
+        """
+        self.index_file = index_file
+        self.keys = set()
+        self.last_key = None  # Most recently appended key, to check the sidecar against the end of its log
+        self._load()
+        self._handle = open(index_file, 'ab')
+
+    def _load(self) -> None:
+        """Memory-map the sidecar file and load its keys."""
+        try:
+            size = os.path.getsize(self.index_file)
+        except FileNotFoundError:
+            return
+
+        usable = size - size % KEY_SIZE
+        if usable != size:
+            # A crash mid-write left a partial key at the end
+            with open(self.index_file, 'rb+') as f:
+                f.truncate(usable)
+            print(f"Repaired torn write at the end of {self.index_file}")
+        if usable == 0:
+            return
+
+        with open(self.index_file, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped).cast('Q')
+                try:
+                    self.keys.update(view)
+                    self.last_key = view[-1]
+                finally:
+                    view.release()
+
+    def __contains__(self, key: int) -> bool:
+        return key in self.keys
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def add_many(self, keys: Iterable[int]) -> None:
+        """
+        Add keys to the index and append them to the sidecar file.
+
+        Args:
+            keys: Keys that are not in the index yet
+        """
+        new_keys = array('Q', (key for key in keys if key not in self.keys))
+        if new_keys:
+            self.keys.update(new_keys)
+            self.last_key = new_keys[-1]
+            self._handle.write(new_keys.tobytes())
+            self._handle.flush()
+
+    def sync(self) -> None:
+        """Force appended keys to disk."""
+        self._handle.flush()
+        os.fsync(self._handle.fileno())
+
+    def clear(self) -> None:
+        """Remove every key from the index and truncate the sidecar file."""
+        self._handle.close()
+        self._handle = open(self.index_file, 'wb')
+        self.keys.clear()
+        self.last_key = None
+
+    def close(self) -> None:
+        """Flush, fsync and close the sidecar file."""
+        if not self._handle.closed:
+            self.sync()
+            self._handle.close()
@@ -1,11 +1,12 @@
-import pyttsx3
+from tts_worker import TTSWorker
 
-# Initialize the TTS engine
-engine = pyttsx3.init()
+if __name__ == "__main__":
+    # Start the TTS worker process (the engine is loaded and warmed up there)
+    worker = TTSWorker()
 
-# Get text input from user
-text = input("Enter text to speak: ")
+    # Get text input from user
+    text = input("Enter text to speak: ")
 
-# Convert text to speech
-engine.say(text)
-engine.runAndWait()
\ No newline at end of file
+    # Convert text to speech
+    worker.say(text).wait()
+    worker.close()
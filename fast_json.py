@@ -0,0 +1,116 @@
+import json
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Tuple, Union
+
+from segment_model import Segment
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKEND = 'orjson' if orjson is not None else 'json'
+
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so one except clause covers both backends
+JSONDecodeError = json.JSONDecodeError
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """
+    Decode JSON with orjson when it is installed, falling back to the json module.
+
+    Args:
+        data: JSON text (str or UTF-8 bytes)
+
+    Returns:
+        The decoded value
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def decode_content(content: Union[str, bytes, Dict[str, Any], None]) -> Tuple[Optional[str], List[Segment]]:
+    """
+    Decode the content field of a webhook payload straight into Segments.
+
+    webhook.site stores the Omi body as a JSON string inside the request
+    JSON, so it is decoded a second time here. Only session_id and the
+    segment fields Segment keeps are read; everything else (translations,
+    person_id, ...) is dropped as soon as it is decoded.
+
+    Args:
+        content: The content field (a JSON string, or an already decoded dict)
+
+    Returns:
+        (session_id or None, list of Segments)
+
+    Raises:
+        JSONDecodeError: If content is not valid JSON
+    """
+    if isinstance(content, (str, bytes)):
+        content = loads(content) if content else {}
+    if not isinstance(content, dict):
+        return None, []
+    from_omi = Segment.from_omi
+    return content.get('session_id'), [from_omi(segment) for segment in content.get('segments') or ()]
+
+
+def iter_json_array(f: TextIO, chunk_size: int = 64 * 1024) -> Iterator[Any]:
+    """
+    Lazily decode the elements of a JSON array file, reading it in chunks.
+
+    Only the element being decoded is held in memory, so large transcript
+    files can be processed without loading them whole. A file holding a
+    single object instead of an array yields that object.
+
+    Args:
+        f: File opened in text mode, positioned at the start of the array
+        chunk_size: Characters read at a time
+
+    Yields:
+        Array elements in order
+
+    Raises:
+        JSONDecodeError: If the file is not valid JSON
+    """
+    decoder = json.JSONDecoder()
+    buffer = f.read(chunk_size).lstrip()
+    if not buffer:
+        return
+    if buffer[0] != '[':
+        yield decoder.decode(buffer + f.read())
+        return
+
+    position = 1
+    eof = False
+    while True:
+        # Skip whitespace and the comma between elements
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if position < len(buffer) or eof:
+                break
+            more = f.read(chunk_size)
+            eof = not more
+            buffer = buffer[position:] + more
+            position = 0
+        if position >= len(buffer):
+            raise JSONDecodeError("Unterminated array", buffer, position)
+        if buffer[position] == ']':
+            return
+
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+                # A number at the end of the buffer may continue in the next chunk
+                if end < len(buffer) or eof:
+                    break
+            except JSONDecodeError:
+                if eof:
+                    raise
+            more = f.read(chunk_size)
+            eof = not more
+            buffer = buffer[position:] + more
+            position = 0
+        yield value
+        position = end
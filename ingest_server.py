@@ -0,0 +1,233 @@
+import asyncio
+import json
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Dict, Any, Optional, Tuple
+from urllib.parse import urlsplit, parse_qs
+
+MAX_HEADER_LINES = 100
+MAX_BODY_SIZE = 1024 * 1024  # Omi transcript chunks are a few KB
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    503: "Service Unavailable",
+}
+
+
+def wrap_payload(body: str, query: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Wrap a pushed Omi body in the same envelope webhook.site stores requests in,
+    so parse_webhook_data and live_transcript.json see the same shape in both modes.
+
+    Args:
+        body: Raw request body (the Omi JSON transcript chunk)
+        query: Query string parameters of the request
+
+    Returns:
+        Webhook payload dictionary
+    """
+    now = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    return {
+        "uuid": str(uuid.uuid4()),
+        "type": "web",
+        "method": "POST",
+        "content": body,
+        "query": query,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+class IngestServer:
+    """
+    Minimal asyncio HTTP endpoint the Omi app can POST transcripts to directly.
+
+    Each request is acknowledged as soon as it is queued. Payloads are handed
+    to the pipeline in arrival order on a single worker thread, so a slow
+    handler (LLM call, speech) never stops the server from accepting data.
+    """
+
+    def __init__(self, handler: Callable[[Dict[str, Any]], None], host: str = '127.0.0.1',
+                 port: int = 8000, path: str = '/webhook', max_queue: int = 10000):
+        """
+        Args:
+            handler: Called with each wrapped payload (e.g. webhook.handle_webhook_data)
+            host: Interface to listen on
+            port: Port to listen on (0 picks a free port)
+            path: URL path that accepts transcript POSTs
+            max_queue: Payloads allowed to wait for the handler before returning 503
+        """
+        self.handler = handler
+        self.host = host
+        self.port = port
+        self.path = path
+        self.max_queue = max_queue
+
+        self.received = 0
+        self.processed = 0
+        self.failed = 0
+
+        self._server = None
+        self._queue = None
+        self._worker = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ingest')
+
+    async def start(self) -> None:
+        """Start listening and processing queued payloads."""
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._worker = asyncio.create_task(self._process_queue())
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        # Pick up the real port when 0 was requested
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        """Stop accepting connections and finish the payloads already queued."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._queue is not None:
+            await self._queue.join()
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        self._executor.shutdown(wait=True)
+
+    async def serve_forever(self) -> None:
+        """Run until cancelled (e.g. by Ctrl+C)."""
+        await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.stop()
+
+    def run(self) -> None:
+        """Blocking entry point used by webhook.py --serve."""
+        asyncio.run(self.serve_forever())
+
+    async def _process_queue(self) -> None:
+        """Feed queued payloads to the handler one at a time, in arrival order."""
+        loop = asyncio.get_running_loop()
+        while True:
+            payload = await self._queue.get()
+            try:
+                await loop.run_in_executor(self._executor, self.handler, payload)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"Error processing pushed payload: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader,
+                                 writer: asyncio.StreamWriter) -> None:
+        """Serve HTTP/1.1 requests on one (possibly keep-alive) connection."""
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                status, body, keep_alive = self._dispatch(*request)
+                self._write_response(writer, status, body, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except ValueError as e:
+            self._write_response(writer, 400, {"error": str(e)}, False)
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+        """
+        Read one request from the connection.
+
+        Returns:
+            (method, target, headers, body), or None when the client hung up
+        """
+        request_line = await reader.readline()
+        if not request_line.strip():
+            return None
+        try:
+            method, target, _version = request_line.decode('latin-1').split()
+        except ValueError:
+            raise ValueError("Malformed request line")
+
+        headers = {}
+        for _ in range(MAX_HEADER_LINES):
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        else:
+            raise ValueError("Too many headers")
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            body = await self._read_chunked(reader)
+        else:
+            length = int(headers.get('content-length', 0) or 0)
+            if length > MAX_BODY_SIZE:
+                raise ValueError("Body too large")
+            body = await reader.readexactly(length) if length else b''
+        return method.upper(), target, headers, body
+
+    async def _read_chunked(self, reader: asyncio.StreamReader) -> bytes:
+        """Read a body sent with Transfer-Encoding: chunked."""
+        chunks = []
+        total = 0
+        while True:
+            size = int((await reader.readline()).split(b';')[0].strip() or b'0', 16)
+            if size == 0:
+                # Skip trailers up to the blank line
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                return b''.join(chunks)
+            total += size
+            if total > MAX_BODY_SIZE:
+                raise ValueError("Body too large")
+            chunks.append(await reader.readexactly(size))
+            await reader.readline()
+
+    def _dispatch(self, method: str, target: str, headers: Dict[str, str],
+                  body: bytes) -> Tuple[int, Dict[str, Any], bool]:
+        """Route a request and return (status, response body, keep-alive)."""
+        keep_alive = headers.get('connection', '').lower() != 'close'
+        parts = urlsplit(target)
+
+        if parts.path == '/health' and method == 'GET':
+            return 200, {"status": "ok", "received": self.received,
+                         "processed": self.processed, "queued": self._queue.qsize()}, keep_alive
+        if parts.path != self.path:
+            return 404, {"error": "not found"}, keep_alive
+        if method != 'POST':
+            return 405, {"error": "use POST"}, keep_alive
+
+        query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        payload = wrap_payload(body.decode('utf-8', errors='replace'), query)
+        try:
+            self._queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            return 503, {"error": "ingest queue full"}, keep_alive
+
+        self.received += 1
+        return 200, {"status": "queued", "uuid": payload["uuid"]}, keep_alive
+
+    def _write_response(self, writer: asyncio.StreamWriter, status: int,
+                        body: Dict[str, Any], keep_alive: bool) -> None:
+        """Write a JSON response."""
+        data = json.dumps(body).encode('utf-8')
+        head = (
+            f"HTTP/1.1 {status} {REASONS.get(status, 'OK')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode('latin-1') + data)
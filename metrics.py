@@ -0,0 +1,336 @@
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from array import array
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict
+
+# Histogram values are whole microseconds. Below 2 * SUB_BUCKETS every value has its own
+# bucket; above that each power of two is split into SUB_BUCKETS buckets (about 3% wide).
+SUB_BUCKET_BITS = 5
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+BUCKET_COUNT = 1024  # Covers up to ~2^31 us (35 minutes); longer values land in the last bucket
+
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+
+def bucket_index(value: int) -> int:
+    """Bucket of a value in microseconds."""
+    if value < 2 * SUB_BUCKETS:
+        return max(0, value)
+    shift = value.bit_length() - (SUB_BUCKET_BITS + 1)
+    return min(BUCKET_COUNT - 1, (shift + 1) * SUB_BUCKETS + (value >> shift) - SUB_BUCKETS)
+
+
+def bucket_lower_bound(index: int) -> int:
+    """Smallest value (in microseconds) that falls in a bucket."""
+    if index < 2 * SUB_BUCKETS:
+        return index
+    shift = index // SUB_BUCKETS - 1
+    return (index % SUB_BUCKETS + SUB_BUCKETS) << shift
+
+
+class Histogram:
+    """
+    Latency histogram with HDR-style log-linear buckets.
+
+    Recording is one bit_length() and an array increment, memory is fixed
+    (1024 counters) however many values are recorded, and any percentile is
+    accurate to about 3%. Percentiles report the upper edge of their bucket,
+    so they never understate a latency.
+    """
+
+    def __init__(self):
+        self.counts = array('Q', bytes(8 * BUCKET_COUNT))
+        self.count = 0
+        self.total = 0.0  # Seconds
+        self.min = float('inf')
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        """Record one duration in seconds."""
+        value = int(seconds * 1_000_000)
+        index = value if value < 2 * SUB_BUCKETS else bucket_index(value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+            if seconds < self.min:
+                self.min = seconds
+
+    def percentile(self, quantile: float) -> float:
+        """Value at a quantile (0-1) in seconds, or 0.0 without any recordings."""
+        with self._lock:
+            if not self.count:
+                return 0.0
+            target = max(1, int(quantile * self.count + 0.5))
+            seen = 0
+            for index, count in enumerate(self.counts):
+                seen += count
+                if seen >= target:
+                    if index + 1 == BUCKET_COUNT:
+                        return self.max
+                    return min((bucket_lower_bound(index + 1) - 1) / 1_000_000, self.max)
+            return self.max
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Count, sum, min, max, mean and the QUANTILES, in seconds."""
+        summary = {
+            "count": self.count,
+            "sum": round(self.total, 6),
+            "min": round(self.min, 6) if self.count else 0.0,
+            "max": round(self.max, 6),
+            "mean": round(self.total / self.count, 6) if self.count else 0.0,
+        }
+        for quantile in QUANTILES:
+            summary[f"p{quantile * 100:g}"] = round(self.percentile(quantile), 6)
+        return summary
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counts = array('Q', bytes(8 * BUCKET_COUNT))
+            self.count = 0
+            self.total = 0.0
+            self.min = float('inf')
+            self.max = 0.0
+
+
+class Timer:
+    """Context manager that records how long its block took into a histogram."""
+
+    __slots__ = ('histogram', 'started')
+
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+        self.started = 0.0
+
+    def __enter__(self) -> 'Timer':
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.histogram.record(time.perf_counter() - self.started)
+
+
+class Metrics:
+    """
+    Counters, latency histograms and gauges for the ingest pipeline.
+
+    Stages time themselves with `with metrics.timer('parse'):` and count
+    events with metrics.count('segments_new', n). Gauges are callables read
+    when a snapshot is taken (e.g. the poll scheduler's current delay).
+    Everything can be exported as Prometheus text or as a JSON snapshot.
+    """
+
+    def __init__(self, namespace: str = 'omi'):
+        """
+        Args:
+            namespace: Prefix of the exported Prometheus metric names
+        """
+        self.namespace = namespace
+        self.counters: Dict[str, int] = {}
+        self.histograms: Dict[str, Histogram] = {}
+        self.gauges: Dict[str, Callable[[], float]] = {}
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+
+    def count(self, name: str, amount: int = 1) -> None:
+        """Add to a counter."""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def histogram(self, name: str) -> Histogram:
+        """Get (or create) a latency histogram."""
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(name, Histogram())
+        return histogram
+
+    def timer(self, name: str) -> Timer:
+        """Time a block into a histogram: `with metrics.timer('fetch'): ...`"""
+        return Timer(self.histogram(name))
+
+    def observe(self, name: str, seconds: float) -> None:
+        """Record a duration measured elsewhere."""
+        self.histogram(name).record(seconds)
+
+    def gauge(self, name: str, read: Callable[[], float]) -> None:
+        """Register a gauge, read on every snapshot/export."""
+        self.gauges[name] = read
+
+    def _read_gauges(self) -> Dict[str, float]:
+        values = {}
+        for name, read in list(self.gauges.items()):
+            try:
+                values[name] = float(read())
+            except Exception:
+                continue  # A gauge must never break an export
+        return values
+
+    def snapshot(self) -> Dict[str, Any]:
+        """All metrics as a JSON-serializable dictionary (durations in seconds)."""
+        with self._lock:
+            counters = dict(self.counters)
+            histograms = sorted(self.histograms.items())
+        return {
+            "timestamp": time.time(),
+            "uptime": round(time.time() - self.started_at, 3),
+            "counters": counters,
+            "gauges": self._read_gauges(),
+            "latency": {name: histogram.snapshot() for name, histogram in histograms},
+        }
+
+    def prometheus_text(self) -> str:
+        """All metrics in the Prometheus text exposition format (histograms as summaries)."""
+        prefix = self.namespace
+        lines = []
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items())
+        for name, value in counters:
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+        for name, value in sorted(self._read_gauges().items()):
+            lines.append(f"# TYPE {prefix}_{name} gauge")
+            lines.append(f"{prefix}_{name} {value:g}")
+        for name, histogram in histograms:
+            metric = f"{prefix}_{name}_seconds"
+            lines.append(f"# TYPE {metric} summary")
+            for quantile in QUANTILES:
+                lines.append(f'{metric}{{quantile="{quantile:g}"}} {histogram.percentile(quantile):.6f}')
+            lines.append(f"{metric}_sum {histogram.total:.6f}")
+            lines.append(f"{metric}_count {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        """Drop every counter and empty every histogram (gauges stay registered)."""
+        with self._lock:
+            self.counters.clear()
+            for histogram in self.histograms.values():
+                histogram.reset()
+            self.started_at = time.time()
+
+
+def serve_metrics(registry: Metrics, host: str = '127.0.0.1', port: int = 9464) -> ThreadingHTTPServer:
+    """
+    Serve /metrics (Prometheus text) and /metrics.json (snapshot) on a background thread.
+
+    Args:
+        registry: Metrics to export
+        host: Interface to listen on
+        port: Port to listen on (0 picks a free one)
+
+    Returns:
+        The running server (call shutdown() to stop it)
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == '/metrics':
+                body = registry.prometheus_text().encode('utf-8')
+                content_type = 'text/plain; version=0.0.4'
+            elif self.path == '/metrics.json':
+                body = json.dumps(registry.snapshot()).encode('utf-8')
+                content_type = 'application/json'
+            else:
+                self.send_response(404)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    return server
+
+
+class SnapshotWriter:
+    """Writes a JSON snapshot of the metrics to a file every few seconds (temporary file + os.replace)."""
+
+    def __init__(self, registry: Metrics, snapshot_file: str = 'metrics.json', interval: float = 10.0):
+        """
+        Args:
+            registry: Metrics to export
+            snapshot_file: Where to write the snapshot
+            interval: Seconds between snapshots
+        """
+        self.registry = registry
+        self.snapshot_file = snapshot_file
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='metrics-snapshot', daemon=True)
+        self._thread.start()
+
+    def write(self) -> None:
+        tmp_file = f"{self.snapshot_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.registry.snapshot(), f, indent=2)
+        os.replace(tmp_file, self.snapshot_file)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.write()
+            except OSError as e:
+                logger.warning("Error writing metrics snapshot %s: %s", self.snapshot_file, e)
+
+    def stop(self) -> None:
+        """Stop the thread and write a final snapshot."""
+        self._stop.set()
+        self._thread.join()
+        self.write()
+
+
+class SampleFilter(logging.Filter):
+    """
+    Lets through every record at or above always_level, and one in every
+    `every` records below it, counted separately per message format, so
+    per-segment debug lines cost almost nothing even when enabled.
+    """
+
+    def __init__(self, every: int = 1, always_level: int = logging.INFO):
+        super().__init__()
+        self.every = max(1, every)
+        self.always_level = always_level
+        self._seen: Dict[Any, int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= self.always_level or self.every == 1:
+            return True
+        seen = self._seen.get(record.msg, 0)
+        self._seen[record.msg] = seen + 1
+        return seen % self.every == 0
+
+
+def configure_logging(level: str = 'INFO', sample_every: int = 1) -> None:
+    """
+    Send pipeline log records to stdout in the same plain style as the rest of the output.
+
+    Args:
+        level: Lowest level shown (DEBUG shows per-segment lines)
+        sample_every: Show one in this many records below INFO
+    """
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    handler.addFilter(SampleFilter(sample_every))
+    logger.handlers[:] = [handler]
+    logger.setLevel(getattr(logging, str(level).upper(), logging.INFO))
+    logger.propagate = False
+
+
+# Pipeline-wide metrics and logger, shared by the processor, fetcher, segment log and actions
+metrics = Metrics()
+logger = logging.getLogger('omi')
@@ -1,50 +1,301 @@
 import requests
 import json
 import os
-import pyttsx3
+import re
+import threading
+import time
+from response_cache import ResponseCache, context_fingerprint
+from metrics import metrics
+from tts_worker import TTSWorker
 
 # Set the API key - better to use environment variable
-openai_api_key = ""
-engine = pyttsx3.init()
+openai_api_key = os.environ.get("OPENAI_API_KEY", "")
+OPENAI_API_URL = os.environ.get("OPENAI_API_URL", "https://api.openai.com/v1/chat/completions")
 
+MODEL = "gpt-3.5-turbo"
 
-def hello_world():
-    """Function that gets called when 'I like your' phrase is detected"""
-    print("Hello, world!")
-    print("🎉 OpenAI function triggered by 'I like your' phrase!")
+# Cache generated questions on disk, keyed on model + prompt + recent conversation
+USE_RESPONSE_CACHE = True
+RESPONSE_CACHE_FILE = "question_cache.sqlite3"
+response_cache = None
+
+# Add the most related segments of earlier conversations (from the conversation index) to the prompt
+INCLUDE_EARLIER_CONVERSATIONS = False
+
+# Stream the completion and start speaking at the first sentence boundary
+STREAM_RESPONSES = True
+
+# Sentence boundary: ., ! or ? (optionally followed by closing quotes/brackets) and whitespace
+SENTENCE_END = re.compile(r'(?<=[.!?])["\')\]]*\s+')
+
+# Timings of the most recent hello_world call, in seconds
+last_latency = {}
+
+# Original prompt
+PROMPT_PREFIX = (
+    "You are the best conversation talker. I am mid way through this conversation with this person. "
+    "Analyze it and determine the best singular broad question about something directly said in the convo. that is medium size, "
+    "concise, nice, and well-crafted. Finish this fast and ALSO ONLY return the question by itself. "
+    "DO THIS WITH HIGH ACCURACY. and make sure it's a unique question that makes one appear in a good light\n\n"
+)
+
+# Speech runs in a separate, pre-warmed process (see tts_worker.py); 'null' speaks nothing (headless)
+TTS_BACKEND = "pyttsx3"
+
+# Keep rendered utterances as WAV files here, so repeated questions replay without re-synthesis (None: off)
+TTS_CACHE_DIR = None
+
+# The TTS worker is started on first use, or ahead of time by warm_up_speech()
+tts_worker = None
+_tts_lock = threading.Lock()
+
+
+def get_tts_worker():
+    """Start the TTS worker process the first time it is needed."""
+    global tts_worker
+    with _tts_lock:
+        if tts_worker is None:
+            tts_worker = TTSWorker(TTS_BACKEND, cache_dir=TTS_CACHE_DIR)
+    return tts_worker
+
+
+def warm_up_speech():
+    """Start the TTS worker now, so the first question doesn't wait for the engine to load."""
+    try:
+        get_tts_worker()
+    except Exception as e:
+        print(f"Error starting text-to-speech: {e}")
+
+
+def speak_async(text, replace=False):
+    """
+    Queue text to be spoken by the TTS worker, in order.
+    
+    Args:
+        text: Text to speak
+        replace: Cut off whatever is still being spoken or queued (e.g. an older question)
     
+    Returns:
+        (started, done) threading.Events for when speech of this text begins and ends
+    """
     try:
-        # Simple one-shot prompt - no conversation context
+        utterance = get_tts_worker().say(text, replace=replace)
+    except RuntimeError as e:
+        print(f"Error speaking text: {e}")
+        started, done = threading.Event(), threading.Event()
+        started.set()
+        done.set()
+        return started, done
+    return utterance.started, utterance.done
+
+
+def speak(text, replace=False):
+    """Read text aloud (blocks until speech finishes)."""
+    _, done = speak_async(text, replace)
+    done.wait()
+
+
+def close_speech(wait=False):
+    """Stop the TTS worker (cutting off queued speech unless wait is set)."""
+    if tts_worker is not None:
+        tts_worker.close(wait=wait)
+
+
+def iter_sentences(chunks):
+    """
+    Regroup streamed text chunks into complete sentences.
+    
+    Args:
+        chunks: Iterable of text fragments (e.g. streamed completion tokens)
+        
+    Yields:
+        Each sentence as soon as its boundary has arrived; the remainder at the end
+    """
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk
+        while True:
+            boundary = SENTENCE_END.search(buffer)
+            if not boundary:
+                break
+            sentence = buffer[:boundary.start()].strip() + buffer[boundary.start():boundary.end()].strip()
+            buffer = buffer[boundary.end():]
+            if sentence:
+                yield sentence
+    if buffer.strip():
+        yield buffer.strip()
+
+
+def iter_stream_deltas(response):
+    """
+    Yield the content deltas of a streamed (server-sent events) chat completion.
+    
+    Args:
+        response: requests.Response opened with stream=True
+    """
+    for line in response.iter_lines(decode_unicode=True):
+        if not line or not line.startswith("data:"):
+            continue
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            break
+        try:
+            delta = json.loads(data)['choices'][0].get('delta', {})
+        except (json.JSONDecodeError, KeyError, IndexError) as e:
+            print(f"Skipping malformed stream event: {e}")
+            continue
+        content = delta.get('content')
+        if content:
+            yield content
+
+
+def stream_question(url, headers, data, cancel_event=None):
+    """
+    Stream the completion and speak it sentence by sentence while later tokens are still arriving.
+    Records the request-start -> first-token -> first-audio breakdown in last_latency.
+    
+    Returns:
+        The full question text, or None if the request failed
+    """
+    timings = {}
+    requested_at = time.perf_counter()
+    response = requests.post(url, headers=headers, json=dict(data, stream=True), timeout=30, stream=True)
+    
+    with response:
+        if response.status_code != 200:
+            print(f"Error calling OpenAI API: {response.status_code} - {response.text}")
+            metrics.count('llm_errors')
+            return None
         
-       # Load the processed transcription from the JSON file
-        with open("processed_transcription.json", "r") as f:
-            conversation_data = json.load(f)
+        if not response.headers.get('Content-Type', '').startswith('text/event-stream'):
+            # The server ignored stream=True; fall back to the whole-response path
+            question = response.json()['choices'][0]['message']['content']
+            timings["request_to_first_token"] = time.perf_counter() - requested_at
+            metrics.observe('llm', timings["request_to_first_token"])
+            print(f"🤖 AI Response: {question}")
+            if cancel_event is None or not cancel_event.is_set():
+                speak(question, replace=True)
+            timings["total"] = time.perf_counter() - requested_at
+            last_latency.clear()
+            last_latency.update(timings)
+            return question
+        
+        def timed_deltas():
+            for content in iter_stream_deltas(response):
+                if "request_to_first_token" not in timings:
+                    timings["request_to_first_token"] = time.perf_counter() - requested_at
+                    metrics.observe('llm_first_token', timings["request_to_first_token"])
+                yield content
+            metrics.observe('llm', time.perf_counter() - requested_at)
+        
+        sentences = []
+        first_started = None
+        last_done = None
+        for sentence in iter_sentences(timed_deltas()):
+            if cancel_event is not None and cancel_event.is_set():
+                print("⏹️  Question superseded while streaming")
+                break
+            sentences.append(sentence)
+            print(f"🤖 AI Response (sentence {len(sentences)}): {sentence}")
+            started, last_done = speak_async(sentence, replace=first_started is None)
+            if first_started is None:
+                first_started = started
+    
+    if first_started is not None:
+        first_started.wait()
+        first_audio = time.perf_counter() - requested_at
+        timings["first_token_to_first_audio"] = first_audio - timings.get("request_to_first_token", first_audio)
+        timings["request_to_first_audio"] = first_audio
+    if last_done is not None:
+        last_done.wait()
+    timings["total"] = time.perf_counter() - requested_at
+    last_latency.clear()
+    last_latency.update(timings)
+    
+    if "request_to_first_audio" in timings:
+        print(f"⏱️  First token {timings['request_to_first_token'] * 1000:.0f} ms, "
+              f"first audio +{timings['first_token_to_first_audio'] * 1000:.0f} ms, "
+              f"total {timings['total'] * 1000:.0f} ms")
+    return " ".join(sentences) if sentences else None
 
-        # Extract only the 'text' fields and join them into a single string
-        conversation_text = " ".join([entry["text"] for entry in conversation_data if "text" in entry])
 
-        # Original prompt
-        prompt = (
-            "You are the best conversation talker. I am mid way through this conversation with this person. "
-            "Analyze it and determine the best singular broad question about something directly said in the convo. that is medium size, "
-            "concise, nice, and well-crafted. Finish this fast and ALSO ONLY return the question by itself. "
-            "DO THIS WITH HIGH ACCURACY. and make sure it's a unique question that makes one appear in a good light\n\n"
-        )
+def get_response_cache():
+    """Open the question cache the first time it is needed."""
+    global response_cache
+    if response_cache is None:
+        response_cache = ResponseCache(RESPONSE_CACHE_FILE)
+    return response_cache
 
-        # Append the extracted conversation text to the prompt
-        prompt += conversation_text
+
+def load_conversation_text(transcript_file="processed_transcription.json"):
+    """Load the processed transcription from the JSON file and join every text field."""
+    with open(transcript_file, "r") as f:
+        conversation_data = json.load(f)
+
+    # Extract only the 'text' fields and join them into a single string
+    return " ".join([entry["text"] for entry in conversation_data if "text" in entry])
+
+
+def build_prompt(conversation_text):
+    """Append the conversation to the question-generation prompt."""
+    return PROMPT_PREFIX + conversation_text
+
+
+def hello_world(cancel_event=None, context=None, get_conversation_index=None):
+    """
+    Function that gets called when 'I like your' phrase is detected.
+    
+    Args:
+        cancel_event: Optional threading.Event; when set (e.g. by the action executor)
+            the question is not spoken
+        context: Optional ConversationContext to build the prompt from; without it the
+            whole processed_transcription.json file is loaded
+        get_conversation_index: Optional callable returning the ConversationIndex to pull related
+            earlier conversation from; only called when INCLUDE_EARLIER_CONVERSATIONS is on, so the
+            index is opened on the action's worker thread and only if it is used
+    """
+    print("Hello, world!")
+    print("🎉 OpenAI function triggered by 'I like your' phrase!")
+    
+    try:
+        if context is not None:
+            # Rolling, token-budgeted conversation kept in memory by the processor
+            conversation_text = context.render()
+        else:
+            conversation_text = load_conversation_text()
+
+        if INCLUDE_EARLIER_CONVERSATIONS and get_conversation_index is not None:
+            earlier = get_conversation_index().related_context(conversation_text)
+            if earlier:
+                conversation_text = f"Earlier conversations:\n{earlier}\n\nCurrent conversation:\n{conversation_text}"
+
+        prompt = build_prompt(conversation_text)
 
         # Print the final prompt
         print(prompt)
+        
+        # Repeat triggers over the same stretch of conversation reuse the earlier question
+        cache = get_response_cache() if USE_RESPONSE_CACHE else None
+        cache_key = None
+        if cache is not None:
+            cache_key = context_fingerprint(MODEL, PROMPT_PREFIX, conversation_text)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                metrics.count('llm_cache_hits')
+                print(f"💾 Cached question ({cache.hits} hits / {cache.misses} misses): {cached}")
+                if cancel_event is None or not cancel_event.is_set():
+                    speak(cached, replace=True)
+                return cached
+        
         # Make the API call
-        url = "https://api.openai.com/v1/chat/completions"
+        url = OPENAI_API_URL
         headers = {
             "Authorization": f"Bearer {openai_api_key}",
             "Content-Type": "application/json"
         }
         
         data = {
-            "model": "gpt-3.5-turbo",
+            "model": MODEL,
             "messages": [
                 {
                     "role": "user",
@@ -55,20 +306,30 @@ def hello_world():
             "temperature": 0.7
         }
         
-        response = requests.post(url, headers=headers, json=data)
-        
-        if response.status_code == 200:
-            result = response.json()
-            question = result['choices'][0]['message']['content']
-            print(f"🤖 AI Response: {question}")
-            engine.say(question)
-            engine.runAndWait()
-            return question
+        if STREAM_RESPONSES:
+            question = stream_question(url, headers, data, cancel_event)
         else:
-            print(f"Error calling OpenAI API: {response.status_code} - {response.text}")
-            return None
+            with metrics.timer('llm'):
+                response = requests.post(url, headers=headers, json=data, timeout=30)
+            
+            if response.status_code == 200:
+                result = response.json()
+                question = result['choices'][0]['message']['content']
+                print(f"🤖 AI Response: {question}")
+                if cancel_event is not None and cancel_event.is_set():
+                    print("⏹️  Question superseded before it was spoken")
+                else:
+                    speak(question, replace=True)
+            else:
+                print(f"Error calling OpenAI API: {response.status_code} - {response.text}")
+                metrics.count('llm_errors')
+                question = None
+        
+        if question and cache is not None and (cancel_event is None or not cancel_event.is_set()):
+            cache.put(cache_key, question)
+        return question
             
     except Exception as e:
         print(f"Error calling OpenAI API: {e}")
+        metrics.count('llm_errors')
         return None
-
@@ -0,0 +1,226 @@
+import glob
+import gzip
+import hashlib
+import json
+import os
+import re
+import time
+import zlib
+from typing import Any, Dict, Iterator, List
+
+from dedup_index import DedupIndex, KEY_SIZE
+
+CHUNK_PATTERN = re.compile(r'chunk-(\d+)-(\d+)\.jsonl\.gz$')
+
+
+def payload_key(payload: Dict[str, Any]) -> int:
+    """
+    Compute the 64-bit archive key for a raw webhook payload.
+
+    webhook.site (and the ingestion server) give every request a uuid; a
+    payload without one is keyed on its canonical JSON instead.
+
+    Args:
+        payload: Raw webhook payload
+
+    Returns:
+        Unsigned 64-bit integer key
+    """
+    material = payload.get('uuid') or json.dumps(payload, sort_keys=True)
+    digest = hashlib.blake2b(str(material).encode('utf-8'), digest_size=KEY_SIZE).digest()
+    return int.from_bytes(digest, 'little')
+
+
+def iter_chunk(chunk_file: str) -> Iterator[Dict[str, Any]]:
+    """
+    Lazily iterate over the payloads in one gzip JSON Lines chunk.
+
+    The chunk still being written (or one cut short by a crash) ends in an
+    unfinished gzip member; everything flushed before that point is yielded.
+
+    Args:
+        chunk_file: Path to the chunk
+
+    Yields:
+        Raw webhook payloads in the order they were archived
+    """
+    try:
+        with gzip.open(chunk_file, 'rt', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as e:
+                    print(f"Skipping unreadable payload in {chunk_file}: {e}")
+    except (FileNotFoundError, EOFError):
+        return
+    except (zlib.error, gzip.BadGzipFile) as e:
+        print(f"Stopped reading truncated chunk {chunk_file}: {e}")
+
+
+def iter_payloads(source: str = 'live_transcript') -> Iterator[Dict[str, Any]]:
+    """
+    Lazily iterate over archived webhook payloads, oldest first.
+
+    Args:
+        source: A payload archive directory, or a legacy live_transcript.json style file
+
+    Yields:
+        Raw webhook payloads
+    """
+    if os.path.isdir(source):
+        for chunk_file in list_chunks(source):
+            yield from iter_chunk(chunk_file)
+        return
+
+    with open(source, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    yield from (data if isinstance(data, list) else [data])
+
+
+def list_chunks(archive_dir: str) -> List[str]:
+    """
+    List the chunks of a payload archive in the order they were written.
+
+    Args:
+        archive_dir: Payload archive directory
+
+    Returns:
+        Chunk paths, oldest first
+    """
+    chunks = []
+    for path in glob.glob(os.path.join(archive_dir, 'chunk-*.jsonl.gz')):
+        match = CHUNK_PATTERN.search(os.path.basename(path))
+        if match:
+            chunks.append((int(match.group(1)), path))
+    return [path for _, path in sorted(chunks)]
+
+
+class PayloadArchive:
+    """
+    Append-only, compressed store of raw webhook payloads.
+
+    Payloads are appended as JSON Lines to a gzip chunk, which is rotated
+    once it reaches max_chunk_bytes or is older than max_chunk_age seconds.
+    Only the newest max_chunks chunks are kept when a limit is set. The
+    uuid of every archived payload is kept in a DedupIndex sidecar, so
+    checking whether a payload was already archived is a set lookup instead
+    of a scan of everything received so far.
+    """
+
+    def __init__(self, archive_dir: str = 'live_transcript', max_chunk_bytes: int = 4 * 1024 * 1024,
+                 max_chunk_age: float = 60 * 60, max_chunks: int = None, compresslevel: int = 6):
+        """
+        Open (or create) a payload archive.
+
+        Args:
+            archive_dir: Directory holding the chunks and the uuid index
+            max_chunk_bytes: Compressed size at which the current chunk is rotated
+            max_chunk_age: Seconds after which the current chunk is rotated
+            max_chunks: Number of chunks to keep (None keeps all of them)
+            compresslevel: gzip compression level
+        """
+        self.archive_dir = archive_dir
+        self.max_chunk_bytes = max_chunk_bytes
+        self.max_chunk_age = max_chunk_age
+        self.max_chunks = max_chunks
+        self.compresslevel = compresslevel
+
+        os.makedirs(archive_dir, exist_ok=True)
+        self.index = DedupIndex(os.path.join(archive_dir, 'uuids.idx'))
+        self._raw = None
+        self._gzip = None
+        self._chunk_number = 0
+        self._chunk_started = 0.0
+
+        # Keep filling the newest chunk if it still has room
+        chunks = list_chunks(archive_dir)
+        if chunks:
+            match = CHUNK_PATTERN.search(os.path.basename(chunks[-1]))
+            self._chunk_number = int(match.group(1))
+            self._chunk_started = float(match.group(2))
+            if not self._chunk_is_full(os.path.getsize(chunks[-1])):
+                self._open_chunk(chunks[-1])
+
+    def _chunk_is_full(self, size: int) -> bool:
+        return size >= self.max_chunk_bytes or time.time() - self._chunk_started >= self.max_chunk_age
+
+    def _open_chunk(self, chunk_file: str) -> None:
+        # Appending starts a new gzip member, which gzip readers handle transparently
+        self._raw = open(chunk_file, 'ab')
+        self._gzip = gzip.GzipFile(fileobj=self._raw, mode='ab', compresslevel=self.compresslevel)
+
+    def _close_chunk(self) -> None:
+        if self._gzip is not None:
+            self._gzip.close()
+            self._raw.flush()
+            os.fsync(self._raw.fileno())
+            self._raw.close()
+            self._gzip = self._raw = None
+            self.index.sync()
+
+    def rotate(self) -> None:
+        """Close the current chunk and start a new one, dropping the oldest beyond max_chunks."""
+        self._close_chunk()
+        self._chunk_number += 1
+        self._chunk_started = time.time()
+        chunk_file = os.path.join(self.archive_dir,
+                                  f'chunk-{self._chunk_number:06d}-{int(self._chunk_started)}.jsonl.gz')
+        self._open_chunk(chunk_file)
+
+        if self.max_chunks:
+            for old_chunk in list_chunks(self.archive_dir)[:-self.max_chunks]:
+                os.remove(old_chunk)
+                print(f"Removed old payload chunk {old_chunk}")
+
+    def __contains__(self, payload: Dict[str, Any]) -> bool:
+        return payload_key(payload) in self.index
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        if self._gzip is not None:
+            self._gzip.flush()
+        return iter_payloads(self.archive_dir)
+
+    def append(self, payload: Dict[str, Any]) -> bool:
+        """
+        Archive a payload unless one with the same uuid is already stored.
+
+        Args:
+            payload: Raw webhook payload
+
+        Returns:
+            True if the payload was appended, False if it was already archived
+        """
+        key = payload_key(payload)
+        if key in self.index:
+            return False
+
+        if self._gzip is None or self._chunk_is_full(self._raw.tell()):
+            self.rotate()
+        self._gzip.write((json.dumps(payload, ensure_ascii=False) + '\n').encode('utf-8'))
+        self._gzip.flush()  # Sync flush, so the record is readable even if the process dies
+        self._raw.flush()
+        # Recorded after the payload so a crash can't hide an unwritten payload
+        self.index.add_many([key])
+        return True
+
+    def chunks(self) -> List[str]:
+        """Chunk paths, oldest first."""
+        return list_chunks(self.archive_dir)
+
+    def clear(self) -> None:
+        """Delete every chunk and forget every uuid, e.g. when a new conversation starts."""
+        self._close_chunk()
+        for chunk_file in list_chunks(self.archive_dir):
+            os.remove(chunk_file)
+        self.index.clear()
+        self._chunk_number = 0
+
+    def close(self) -> None:
+        """Finish the current chunk and close the index."""
+        self._close_chunk()
+        self.index.close()
@@ -0,0 +1,133 @@
+import queue
+import threading
+import time
+from typing import Any, Callable, List
+
+from metrics import metrics
+
+_STOP = object()
+
+
+class WriteBehind:
+    """
+    Background writer that takes items from the ingest path and writes them in batches.
+
+    submit() only puts the item on a queue. A worker thread waits for the
+    first item, keeps collecting until max_batch items are waiting or
+    max_delay seconds have passed, and hands the whole batch to the write
+    function, so one write (and fsync) covers everything that arrived in
+    the window. A full queue makes submit() wait, which slows ingest down
+    instead of growing memory without bound when the disk can't keep up.
+
+    flush() blocks until everything submitted so far has been written; it
+    is called before anything that reads the files back. A failed write is
+    retried with the same batch, so items are never dropped.
+    """
+
+    def __init__(self, write: Callable[[List[Any]], None], name: str = 'write-behind',
+                 max_batch: int = 256, max_delay: float = 0.2, max_queue: int = 10000,
+                 retry_delay: float = 1.0):
+        """
+        Args:
+            write: Called on the worker thread with each batch of items, in submission order
+            name: Worker thread name, also used for the write latency metric
+            max_batch: Most items written in one batch
+            max_delay: Longest time an item waits for its batch to fill up
+            max_queue: Items allowed to wait before submit() blocks
+            retry_delay: Seconds to wait before retrying a failed write
+        """
+        self.write = write
+        self.name = name
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.retry_delay = retry_delay
+
+        self.submitted = 0
+        self.written = 0
+        self.batches = 0
+        self.failures = 0
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._condition = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, item: Any) -> None:
+        """Queue an item to be written."""
+        if self._closed:
+            raise RuntimeError(f"{self.name} is closed")
+        with self._condition:
+            self.submitted += 1
+        self._queue.put(item)
+
+    def _collect(self) -> List[Any]:
+        """Wait for the next batch (empty once closed and drained)."""
+        first = self._queue.get()
+        if first is _STOP:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._queue.put(_STOP)  # Seen again once this batch is written
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            if not batch:
+                return
+            while True:
+                try:
+                    with metrics.timer(self.name):
+                        self.write(batch)
+                    break
+                except Exception as e:
+                    self.failures += 1
+                    metrics.count('write_failures')
+                    print(f"Error writing {len(batch)} item(s) in {self.name}, retrying: {e}")
+                    time.sleep(self.retry_delay)
+            with self._condition:
+                self.written += len(batch)
+                self.batches += 1
+                self._condition.notify_all()
+
+    def flush(self, timeout: float = None) -> bool:
+        """
+        Wait until every item submitted so far has been written.
+
+        Returns:
+            True if everything was written, False on timeout or if the worker thread has died
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            target = self.submitted
+            while self.written < target:
+                if not self._thread.is_alive():
+                    return False  # Nothing will write the rest
+                wait = 0.1 if deadline is None else min(0.1, deadline - time.monotonic())
+                if wait <= 0:
+                    return False
+                self._condition.wait(wait)
+            return True
+
+    def pending(self) -> int:
+        """Items submitted but not written yet."""
+        with self._condition:
+            return self.submitted - self.written
+
+    def close(self) -> None:
+        """Write everything still queued and stop the worker."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
@@ -0,0 +1,167 @@
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Optional
+
+ACTIVE = "active"
+IDLE = "idle"
+ERROR = "error"
+RETRY_AFTER = "retry_after"
+
+
+def parse_retry_after(value: Optional[str], now: datetime = None) -> Optional[float]:
+    """
+    Read a Retry-After header, given either as seconds or as an HTTP date.
+
+    Args:
+        value: Header value (None when the header is missing)
+        now: Current time for HTTP dates (defaults to now, UTC)
+
+    Returns:
+        Seconds to wait, or None if there is no usable value
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - (now or datetime.now(timezone.utc))).total_seconds())
+
+
+class PollScheduler:
+    """
+    Decides how long to wait before the next webhook.site poll.
+
+    While new requests keep arriving the interval drops to min_interval, so
+    a burst is picked up with little delay. Empty polls grow it back to the
+    normal interval, hold it there for a few polls (a pause between
+    sentences) and then back off exponentially up to max_interval, saving
+    requests and rate limit while nobody is talking. Errors back off
+    exponentially on their own streak, and a Retry-After sent by the server
+    is always waited out. Every delay gets random jitter so restarts and
+    several listeners don't poll in lockstep.
+
+    Each decision is counted; metrics() returns the counters, the last
+    delay and why it was chosen.
+    """
+
+    def __init__(self, min_interval: float = 0.25, interval: float = 1.0, max_interval: float = 30.0,
+                 backoff: float = 2.0, jitter: float = 0.1, idle_grace: int = 3,
+                 rng: random.Random = None, sleep: Callable[[float], None] = time.sleep):
+        """
+        Args:
+            min_interval: Delay while new requests are arriving
+            interval: Normal delay between polls once requests stop arriving
+            max_interval: Longest delay for idle and error backoff (Retry-After can exceed it)
+            backoff: Factor the delay grows by per further empty poll or error
+            jitter: Random spread applied to each delay, as a fraction of it
+            idle_grace: Empty polls at the normal interval before backing off further
+            rng: Random source for the jitter (seeded in tests)
+            sleep: Function used by wait()
+        """
+        self.min_interval = min_interval
+        self.interval = interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.jitter = jitter
+        self.idle_grace = idle_grace
+        self.rng = rng or random.Random()
+        self.sleep = sleep
+
+        self.idle_streak = 0
+        self.error_streak = 0
+        self._idle_delay = interval  # Un-jittered delay while idle
+        self._held = 0  # Empty polls spent at the normal interval
+        self.last_delay = interval
+        self.last_reason = IDLE
+        self.counts = {ACTIVE: 0, IDLE: 0, ERROR: 0, RETRY_AFTER: 0}
+        self.requests_seen = 0
+        self.total_delay = 0.0
+
+    def _jittered(self, delay: float) -> float:
+        if self.jitter:
+            delay *= 1 + self.rng.uniform(-self.jitter, self.jitter)
+        return max(0.0, delay)
+
+    def _decide(self, delay: float, reason: str) -> float:
+        self.counts[reason] += 1
+        self.last_delay = delay
+        self.last_reason = reason
+        self.total_delay += delay
+        return delay
+
+    def record_poll(self, new_requests: int) -> float:
+        """
+        Record a successful poll.
+
+        Args:
+            new_requests: Number of new requests it returned
+
+        Returns:
+            Seconds to wait before the next poll
+        """
+        self.error_streak = 0
+        if new_requests:
+            self.idle_streak = 0
+            self.requests_seen += new_requests
+            self._idle_delay = self.min_interval
+            self._held = 0
+            return self._decide(self._jittered(self.min_interval), ACTIVE)
+
+        self.idle_streak += 1
+        if self._idle_delay < self.interval:
+            self._idle_delay = min(self.interval, self._idle_delay * self.backoff)
+        elif self._held < self.idle_grace:
+            self._held += 1
+        else:
+            self._idle_delay = min(self.max_interval, self._idle_delay * self.backoff)
+        return self._decide(self._jittered(self._idle_delay), IDLE)
+
+    def record_error(self, retry_after: float = None) -> float:
+        """
+        Record a failed poll.
+
+        Args:
+            retry_after: Seconds the server asked us to wait (Retry-After), if any
+
+        Returns:
+            Seconds to wait before the next poll
+        """
+        self.error_streak += 1
+        delay = self._jittered(min(self.max_interval, self.interval * self.backoff ** self.error_streak))
+        if retry_after is not None and retry_after >= delay:
+            # Never poll before the server said we may; jitter only ever adds to it
+            return self._decide(retry_after * (1 + self.rng.uniform(0, self.jitter)), RETRY_AFTER)
+        return self._decide(delay, ERROR)
+
+    def wait(self, delay: float = None) -> None:
+        """Sleep for the given delay (the last decided one by default)."""
+        self.sleep(self.last_delay if delay is None else delay)
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Snapshot of the scheduler's decisions.
+
+        Returns:
+            Polls per decision (active/idle/error/retry_after), current streaks,
+            last delay and reason, requests seen and total time spent waiting
+        """
+        return {
+            "polls": sum(self.counts.values()),
+            "decisions": dict(self.counts),
+            "idle_streak": self.idle_streak,
+            "error_streak": self.error_streak,
+            "last_delay": round(self.last_delay, 3),
+            "last_reason": self.last_reason,
+            "requests_seen": self.requests_seen,
+            "total_delay": round(self.total_delay, 3),
+        }
@@ -0,0 +1,231 @@
+import argparse
+import asyncio
+import http.client
+import json
+import threading
+import time
+from datetime import datetime
+from typing import List, Dict, Any
+from urllib.parse import urlsplit, urlencode
+
+from payload_archive import iter_payloads
+
+
+def load_payloads(input_file: str = 'live_transcript.json') -> List[Dict[str, Any]]:
+    """
+    Load recorded webhook.site payloads to replay.
+
+    Args:
+        input_file: Path to a live_transcript.json style file or a payload archive directory
+
+    Returns:
+        List of raw webhook payloads
+    """
+    return list(iter_payloads(input_file))
+
+
+def session_payloads(payloads: List[Dict[str, Any]], sessions: int) -> List[Dict[str, Any]]:
+    """
+    Fan recorded payloads out to several simulated Omi sessions.
+
+    Every payload is sent once per session, with the session_id in its
+    content (and the uid query parameter) replaced, interleaved the way
+    several necklaces streaming at once would arrive.
+
+    Args:
+        payloads: Recorded webhook.site payloads
+        sessions: Number of simulated sessions
+
+    Returns:
+        Payloads for all sessions
+    """
+    fanned = []
+    for payload in payloads:
+        content = payload.get('content') or '{}'
+        if isinstance(content, str):
+            content = json.loads(content)
+        for session in range(sessions):
+            session_id = f"replay-session-{session}"
+            copy = dict(payload)
+            copy['content'] = json.dumps(dict(content, session_id=session_id))
+            copy['query'] = dict(payload.get('query') or {}, uid=session_id)
+            fanned.append(copy)
+    return fanned
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Return the pct-th percentile of values (nearest rank)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+class ReplayClient:
+    """
+    Stand-in for the Omi app: POSTs recorded transcript chunks to the ingestion server.
+
+    Each worker keeps one keep-alive connection open, like the app would.
+    Requests are sent either as fast as possible or with the original gaps
+    between payloads (realtime), and per-request latency is recorded.
+    """
+
+    def __init__(self, url: str, payloads: List[Dict[str, Any]], connections: int = 1,
+                 realtime: bool = False):
+        """
+        Args:
+            url: Ingestion endpoint, e.g. http://127.0.0.1:8000/webhook
+            payloads: Recorded webhook.site payloads to replay
+            connections: Number of concurrent client connections
+            realtime: Preserve the original created_at gaps instead of sending at max speed
+        """
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.path = parts.path or '/'
+        self.payloads = payloads
+        self.connections = connections
+        self.realtime = realtime
+
+        self.latencies = []
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def _delays(self) -> List[float]:
+        """Seconds to wait before each payload when replaying in real time."""
+        delays = [0.0]
+        for previous, current in zip(self.payloads, self.payloads[1:]):
+            try:
+                start = datetime.strptime(previous['created_at'], "%Y-%m-%d %H:%M:%S")
+                end = datetime.strptime(current['created_at'], "%Y-%m-%d %H:%M:%S")
+                delays.append(max(0.0, (end - start).total_seconds()))
+            except (KeyError, ValueError):
+                delays.append(0.0)
+        return delays
+
+    def _send_all(self, payloads: List[Dict[str, Any]], delays: List[float]) -> None:
+        """Send payloads over one keep-alive connection."""
+        connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        latencies = []
+        errors = 0
+        try:
+            for payload, delay in zip(payloads, delays):
+                if delay:
+                    time.sleep(delay)
+                body = payload.get('content') or '{}'
+                if not isinstance(body, str):
+                    body = json.dumps(body)
+                query = payload.get('query') or {}
+                target = f"{self.path}?{urlencode(query)}" if query else self.path
+
+                started = time.perf_counter()
+                try:
+                    connection.request('POST', target, body=body.encode('utf-8'),
+                                       headers={'Content-Type': 'application/json'})
+                    response = connection.getresponse()
+                    response.read()
+                    if response.status != 200:
+                        errors += 1
+                except (OSError, http.client.HTTPException):
+                    errors += 1
+                    connection.close()
+                    connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+                    continue
+                latencies.append(time.perf_counter() - started)
+        finally:
+            connection.close()
+
+        with self._lock:
+            self.latencies.extend(latencies)
+            self.errors += errors
+
+    def run(self) -> Dict[str, float]:
+        """
+        Replay every payload and report throughput and latency.
+
+        Returns:
+            Summary with request count, errors, requests per second and p50/p99 latency (ms)
+        """
+        delays = self._delays() if self.realtime else [0.0] * len(self.payloads)
+
+        # Deal payloads round-robin across connections
+        threads = []
+        for worker in range(self.connections):
+            thread = threading.Thread(
+                target=self._send_all,
+                args=(self.payloads[worker::self.connections], delays[worker::self.connections]),
+            )
+            threads.append(thread)
+
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        return {
+            "requests": len(self.latencies),
+            "errors": self.errors,
+            "seconds": elapsed,
+            "requests_per_second": len(self.latencies) / elapsed if elapsed else 0.0,
+            "p50_ms": percentile(self.latencies, 50) * 1000,
+            "p99_ms": percentile(self.latencies, 99) * 1000,
+        }
+
+
+def start_local_server():
+    """
+    Start an IngestServer with a no-op handler in a background thread,
+    to load-test the ingestion path without touching transcript files.
+    """
+    from ingest_server import IngestServer
+
+    server = IngestServer(lambda payload: None, port=0)
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+
+    def serve():
+        loop.run_until_complete(server.start())
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=serve, daemon=True).start()
+    ready.wait()
+    return server, loop
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded Omi payloads against the ingestion server")
+    parser.add_argument('--file', default='live_transcript.json', help="Recorded payloads to replay (JSON file or payload archive directory)")
+    parser.add_argument('--url', default='http://127.0.0.1:8000/webhook', help="Ingestion endpoint")
+    parser.add_argument('--repeat', type=int, default=1, help="Replay the recording this many times")
+    parser.add_argument('--connections', type=int, default=1, help="Concurrent client connections")
+    parser.add_argument('--realtime', action='store_true', help="Keep the original gaps between payloads")
+    parser.add_argument('--sessions', type=int, default=1,
+                        help="Replay the recording as this many concurrent Omi sessions")
+    parser.add_argument('--local-server', action='store_true',
+                        help="Start a no-op ingestion server in-process and replay against it")
+    args = parser.parse_args()
+
+    payloads = load_payloads(args.file) * args.repeat
+    if args.sessions > 1:
+        payloads = session_payloads(payloads, args.sessions)
+    url = args.url
+    if args.local_server:
+        server, loop = start_local_server()
+        url = f"http://127.0.0.1:{server.port}{server.path}"
+
+    print(f"Replaying {len(payloads)} payloads to {url} over {args.connections} connection(s)...")
+    summary = ReplayClient(url, payloads, args.connections, args.realtime).run()
+    print(f"Sent {summary['requests']} requests ({summary['errors']} errors) in {summary['seconds']:.2f}s")
+    print(f"Throughput: {summary['requests_per_second']:.1f} req/s")
+    print(f"Latency: p50 {summary['p50_ms']:.2f} ms, p99 {summary['p99_ms']:.2f} ms")
+
+    if args.local_server:
+        asyncio.run_coroutine_threadsafe(server.stop(), loop).result()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from trigger_engine import normalize_tokens
+
+
+def context_fingerprint(model: str, template: str, context_text: str, window_words: int = 300) -> str:
+    """
+    Hash the inputs that determine a generated question.
+
+    The context is normalized (case, punctuation and spacing ignored) and
+    only its last window_words words are used, so re-triggers over the same
+    stretch of conversation map to the same key.
+
+    Args:
+        model: Model name
+        template: Prompt template the context is inserted into
+        context_text: Conversation text that goes into the prompt
+        window_words: Number of most recent normalized words that make up the key
+
+    Returns:
+        Hex digest identifying the request
+    """
+    window = " ".join(normalize_tokens(context_text)[-window_words:])
+    material = "\x00".join((model, template, window))
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """
+    On-disk LRU/TTL cache of generated questions, backed by SQLite.
+
+    Entries expire after ttl_seconds, and the least recently used entries
+    are evicted once there are more than max_entries. Hit and miss counts
+    are kept for the life of the process.
+    """
+
+    def __init__(self, db_file: str = 'question_cache.sqlite3', max_entries: int = 500,
+                 ttl_seconds: float = 24 * 60 * 60, clock: Callable[[], float] = time.time):
+        """
+        Args:
+            db_file: SQLite database path (':memory:' for a throwaway cache)
+            max_entries: Entries kept before the least recently used are evicted
+            ttl_seconds: Age after which an entry is ignored and removed
+            clock: Time source for ages and recency (wall clock, as entries outlive the process)
+        """
+        self.db_file = db_file
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        # Questions are generated on the action executor's worker thread
+        self._db = sqlite3.connect(db_file, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " response TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self._db.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a cached response.
+
+        Args:
+            key: Fingerprint from context_fingerprint()
+
+        Returns:
+            The cached response, or None on a miss or expired entry
+        """
+        now = self.clock()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            response, created_at = row
+            if now - created_at > self.ttl_seconds:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._db.commit()
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.hits += 1
+            return response
+
+    def put(self, key: str, response: str) -> None:
+        """
+        Store a response, evicting expired and least recently used entries.
+
+        Args:
+            key: Fingerprint from context_fingerprint()
+            response: Generated question
+        """
+        now = self.clock()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, response, now, now),
+            )
+            self._db.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+            evicted = self._db.execute(
+                "DELETE FROM responses WHERE key IN ("
+                " SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            ).rowcount
+            self.evictions += max(evicted, 0)
+            self._db.commit()
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters and current size."""
+        with self._lock:
+            size = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": size,
+        }
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
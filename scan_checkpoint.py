@@ -0,0 +1,93 @@
+import json
+import os
+import threading
+from typing import Set
+
+
+def checkpoint_path_for(output_file: str) -> str:
+    """
+    Get the scan checkpoint path that belongs to a legacy JSON transcription file.
+
+    Args:
+        output_file: Path to the legacy JSON array file
+
+    Returns:
+        Path to the matching checkpoint (e.g. processed_transcription.checkpoint.json)
+    """
+    return os.path.splitext(output_file)[0] + '.checkpoint.json'
+
+
+class ScanCheckpoint:
+    """
+    Remembers how far the segment log has been checked for trigger phrases.
+
+    offset is the byte position in the segment log up to which every segment
+    has already been checked, so a restart only reads what was appended after
+    it. fired holds the dedup keys (see dedup_index.py) of segments whose
+    triggers already ran, so no segment fires twice, even if the offset is
+    lost. The checkpoint is small and rewritten atomically. It may be saved
+    from the segment log's writer thread while the ingest thread updates it.
+    """
+
+    def __init__(self, checkpoint_file: str):
+        """
+        Args:
+            checkpoint_file: Path to the checkpoint JSON file
+        """
+        self.checkpoint_file = checkpoint_file
+        self.offset = 0
+        self.fired: Set[int] = set()
+        self._dirty = False
+        self._lock = threading.Lock()  # Guards offset/fired while a snapshot is taken
+        self._save_lock = threading.Lock()  # One writer of the file at a time
+
+        try:
+            with open(checkpoint_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            self.offset = int(state.get('offset', 0))
+            self.fired = {int(key, 16) for key in state.get('fired', [])}
+        except FileNotFoundError:
+            pass
+        except (json.JSONDecodeError, ValueError, TypeError, AttributeError) as e:
+            print(f"Ignoring unreadable scan checkpoint {checkpoint_file}: {e}")
+
+    def has_fired(self, key: int) -> bool:
+        return key in self.fired
+
+    def mark_fired(self, key: int) -> None:
+        """Record that a segment's triggers have run."""
+        with self._lock:
+            if key not in self.fired:
+                self.fired.add(key)
+                self._dirty = True
+
+    def advance(self, offset: int) -> None:
+        """Record that every segment before this log offset has been checked."""
+        with self._lock:
+            if offset != self.offset:
+                self.offset = offset
+                self._dirty = True
+
+    def save(self) -> None:
+        """Write the checkpoint if it changed (temporary file + os.replace)."""
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                state = {
+                    "offset": self.offset,
+                    "fired": [format(key, 'x') for key in sorted(self.fired)],
+                }
+                self._dirty = False
+            tmp_file = f"{self.checkpoint_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+            os.replace(tmp_file, self.checkpoint_file)
+
+    def reset(self) -> None:
+        """Start over, e.g. when a new conversation starts."""
+        with self._lock:
+            self.offset = 0
+            self.fired.clear()
+            self._dirty = True
+        self.save()
@@ -0,0 +1,489 @@
+import json
+import os
+import threading
+import time
+from typing import List, Dict, Any, Iterator, Tuple, Callable, Optional
+from dedup_index import DedupIndex, segment_key
+from segment_model import Segment
+from fast_json import loads
+from segment_merge import merge_segments
+from metrics import metrics
+from persistence import WriteBehind
+
+
+def log_path_for(output_file: str) -> str:
+    """
+    Get the segment log path that backs a legacy JSON transcription file.
+
+    Args:
+        output_file: Path to the legacy JSON array file
+
+    Returns:
+        Path to the matching JSON Lines log (e.g. processed_transcription.jsonl)
+    """
+    return os.path.splitext(output_file)[0] + '.jsonl'
+
+
+def index_path_for(output_file: str) -> str:
+    """
+    Get the dedup index sidecar path that belongs to a legacy JSON transcription file.
+
+    Args:
+        output_file: Path to the legacy JSON array file
+
+    Returns:
+        Path to the matching index sidecar (e.g. processed_transcription.idx)
+    """
+    return os.path.splitext(output_file)[0] + '.idx'
+
+
+def iter_log(log_file: str) -> Iterator[Dict[str, Any]]:
+    """
+    Lazily iterate over the segments stored in a JSON Lines log.
+
+    Lines that cannot be decoded (e.g. a write torn by a crash) are skipped.
+
+    Args:
+        log_file: Path to the JSON Lines log
+
+    Yields:
+        Segment dictionaries in the order they were appended
+    """
+    try:
+        with open(log_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield loads(line)
+                except json.JSONDecodeError as e:
+                    print(f"Skipping unreadable segment log line: {e}")
+    except FileNotFoundError:
+        return
+
+
+def compact_log(log_file: str, output_file: str, merge: bool = True) -> int:
+    """
+    Write the contents of a segment log out as the legacy JSON array.
+
+    The log keeps every version of a segment Omi sent; with merge on, each
+    revision replaces the version before it (see segment_merge.py). The
+    array is written to a temporary file and swapped in with os.replace,
+    so readers never see a half-written file.
+
+    Args:
+        log_file: Path to the JSON Lines log
+        output_file: Path to the legacy JSON array file
+        merge: Collapse revised versions of the same segment
+
+    Returns:
+        Number of segments written
+    """
+    segments = merge_segments(iter_log(log_file)) if merge else list(iter_log(log_file))
+    tmp_file = f"{output_file}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(segments, f, indent=2, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, output_file)
+    return len(segments)
+
+
+class SegmentLog:
+    """
+    Append-only JSON Lines store for processed transcription segments.
+
+    Each append writes only the new segments to the end of the log, so the
+    cost of a poll no longer grows with the length of the conversation. The
+    log is fsynced in batches. Its dedup index lives in memory for the
+    lifetime of the process and is persisted next to the log (see
+    dedup_index.py), so reopening the log does not rescan it. The legacy JSON
+    array read by openai.py and cleanup_duplicates.py is produced on demand
+    by compact(). After a crash, opening the log cuts off a torn last line
+    and checks the sidecar against the end of the log, so the two agree
+    again before anything is appended.
+
+    With write_behind on, append() only deduplicates and queues the new
+    lines; a WriteBehind worker (see persistence.py) writes and fsyncs them
+    in batches, so the caller never waits for the disk. Keys still waiting
+    to be written count as seen, and everything that reads the log back
+    (size, iter_from, compact, reset) first waits for the queue to drain.
+    """
+
+    def __init__(self, legacy_file: str = 'processed_transcription.json',
+                 log_file: str = None, index_file: str = None, fsync_every: int = 20,
+                 fsync_interval: float = 1.0, write_behind: bool = False, max_batch: int = 256,
+                 max_delay: float = 0.2, on_write: Optional[Callable[[], None]] = None):
+        """
+        Open (or create) the segment log backing a legacy JSON file.
+
+        Args:
+            legacy_file: Path to the legacy JSON array file
+            log_file: Path to the JSON Lines log (defaults to legacy_file with .jsonl)
+            index_file: Path to the dedup index sidecar (defaults to legacy_file with .idx)
+            fsync_every: Number of appended segments after which the log is fsynced
+            fsync_interval: Maximum number of seconds between fsyncs while appending
+            write_behind: Write appended segments on a background thread
+            max_batch: Most appends coalesced into one background write
+            max_delay: Longest time an append waits for its background write
+            on_write: Called after each write (on the writer thread with write_behind)
+        """
+        self.legacy_file = legacy_file
+        self.log_file = log_file or log_path_for(legacy_file)
+        self.index_file = index_file or index_path_for(legacy_file)
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.on_write = on_write
+
+        self.segment_count = 0
+        self._compacted_count = None
+        self._pending_sync = 0
+        self._last_sync = time.monotonic()
+        self._pending_keys = set()  # Queued for the writer, not in the index yet
+        self._written_size = 0
+        self._lock = threading.Lock()  # Guards the file handle between the writer and readers
+        self._writer = None
+
+        log_exists = os.path.exists(self.log_file)
+        index_exists = os.path.exists(self.index_file)
+        self.index = DedupIndex(self.index_file)
+
+        if log_exists:
+            self._repair_tail()
+            if index_exists:
+                self._reconcile_index()
+                self.segment_count = len(self.index)
+            else:
+                self._rebuild_index()
+            self._handle = open(self.log_file, 'a', encoding='utf-8')
+            # A legacy file written after the last append is already compacted (e.g. at shutdown)
+            if (os.path.exists(self.legacy_file) and
+                    os.path.getmtime(self.legacy_file) > os.path.getmtime(self.log_file)):
+                self._compacted_count = self.segment_count
+        else:
+            # A sidecar without its log is stale
+            self.index.clear()
+            self._handle = open(self.log_file, 'a', encoding='utf-8')
+            self._import_legacy_file()
+        self._written_size = self._handle.tell()
+
+        if write_behind:
+            self._writer = WriteBehind(self._write_batches, name='segment_log_write',
+                                       max_batch=max_batch, max_delay=max_delay)
+
+    @property
+    def write_behind(self) -> bool:
+        return self._writer is not None
+
+    def _repair_tail(self) -> None:
+        """Drop a partially written last line left behind by a crash."""
+        with open(self.log_file, 'rb+') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            if size == 0:
+                return
+            f.seek(size - 1)
+            if f.read(1) == b'\n':
+                return
+
+            # Walk back to the last complete line and cut everything after it
+            position = size
+            while position > 0:
+                step = min(4096, position)
+                position -= step
+                f.seek(position)
+                chunk = f.read(step)
+                newline = chunk.rfind(b'\n')
+                if newline != -1:
+                    f.truncate(position + newline + 1)
+                    break
+            else:
+                f.truncate(0)
+            print(f"Repaired torn write at the end of {self.log_file}")
+
+    def _iter_lines_reversed(self) -> Iterator[Dict[str, Any]]:
+        """Segments in the log from the last one back, reading only as much of the file as is consumed."""
+        with open(self.log_file, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            position = f.tell()
+            rest = b''
+            while position > 0:
+                step = min(4096, position)
+                position -= step
+                f.seek(position)
+                lines = (f.read(step) + rest).split(b'\n')
+                rest = lines.pop(0)  # May continue in the previous chunk
+                for line in reversed(lines):
+                    if line.strip():
+                        try:
+                            yield loads(line)
+                        except json.JSONDecodeError as e:
+                            print(f"Skipping unreadable segment log line: {e}")
+            if rest.strip():
+                try:
+                    yield loads(rest)
+                except json.JSONDecodeError as e:
+                    print(f"Skipping unreadable segment log line: {e}")
+
+    def _reconcile_index(self) -> None:
+        """
+        Bring the dedup index sidecar in line with the end of the log after a crash between their writes.
+
+        Segments are written before their keys, so lines at the end of the log whose keys are missing
+        are added to the index (otherwise they would be appended again when Omi resends them). If the
+        newest line the index does know is not the last key it recorded, the index is ahead of the log
+        (keys whose lines were lost) and is rebuilt from the log.
+        """
+        missing = []
+        anchor = None
+        for segment in self._iter_lines_reversed():
+            key = segment_key(segment)
+            if key in self.index:
+                anchor = key
+                break
+            missing.append(key)
+
+        if anchor != self.index.last_key:
+            print(f"Dedup index {self.index_file} doesn't match {self.log_file}, rebuilding it")
+            self.index.clear()
+            self._rebuild_index()
+        elif missing:
+            self.index.add_many(reversed(missing))
+            self.index.sync()
+            print(f"Recovered {len(missing)} segment key(s) missing from {self.index_file}")
+
+    def _rebuild_index(self) -> None:
+        """Rebuild the dedup index sidecar by scanning the log (only when it is missing)."""
+        keys = [segment_key(segment) for segment in iter_log(self.log_file)]
+        self.index.add_many(keys)
+        self.index.sync()
+        self.segment_count = len(keys)
+
+    def _import_legacy_file(self) -> None:
+        """Seed a brand new log with segments already in the legacy JSON file."""
+        try:
+            with open(self.legacy_file, 'r', encoding='utf-8') as f:
+                content = f.read().strip()
+                existing_data = loads(content) if content else []
+        except FileNotFoundError:
+            return
+        except json.JSONDecodeError as e:
+            # Keep the unreadable file for inspection instead of silently dropping its history
+            corrupt_file = f"{self.legacy_file}.corrupt-{int(time.time())}"
+            os.replace(self.legacy_file, corrupt_file)
+            print(f"Error reading {self.legacy_file}, moved it to {corrupt_file} and started the log fresh: {e}")
+            return
+
+        if existing_data:
+            self.append(existing_data)
+            self.sync()
+            self._compacted_count = self.segment_count
+
+    def append(self, segments: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Append the segments that have not been stored yet.
+
+        Args:
+            segments: Processed segments to store (Segment objects or processed segment dicts)
+
+        Returns:
+            The segments that were actually appended (duplicates removed)
+        """
+        unique_new_segments = []
+        new_keys = []
+        seen_keys = set()
+        with metrics.timer('dedup'):
+            for segment in segments:
+                key = segment_key(segment)
+                if key not in self.index and key not in self._pending_keys and key not in seen_keys:
+                    seen_keys.add(key)
+                    new_keys.append(key)
+                    unique_new_segments.append(segment)
+        metrics.count('segments_duplicate', len(segments) - len(unique_new_segments))
+
+        if unique_new_segments:
+            lines = ''.join(
+                json.dumps(segment.to_dict() if isinstance(segment, Segment) else segment,
+                           ensure_ascii=False) + '\n'
+                for segment in unique_new_segments
+            )
+            if self._writer is not None:
+                self._pending_keys.update(new_keys)
+                self._writer.submit((lines, new_keys))
+            else:
+                self._write_batches([(lines, new_keys)])
+            self.segment_count += len(unique_new_segments)
+
+        return unique_new_segments
+
+    def _write_batches(self, batches: List[Tuple[str, List[int]]]) -> None:
+        """Write queued appends in one go (on the writer thread with write_behind)."""
+        keys = [key for _lines, batch_keys in batches for key in batch_keys]
+        with metrics.timer('persist'):
+            with self._lock:
+                try:
+                    self._handle.write(''.join(lines for lines, _keys in batches))
+                    self._handle.flush()
+                except Exception:
+                    self._rewind()  # The batch is retried, so none of it may stay in the log
+                    raise
+                # Keys are recorded after the segments so a crash can't hide an unwritten segment
+                self.index.add_many(keys)
+                self._pending_keys.difference_update(keys)
+                self._pending_sync += len(keys)
+                self._written_size = self._handle.tell()
+
+                if (self._pending_sync >= self.fsync_every or
+                        time.monotonic() - self._last_sync >= self.fsync_interval):
+                    self._sync()
+        if self.on_write is not None:
+            self.on_write()
+
+    def _rewind(self) -> None:
+        """Cut off whatever a failed write left after the last complete write and reopen the log."""
+        try:
+            self._handle.close()
+        except OSError:
+            pass  # The buffered part of the failed write is dropped with the handle
+        os.truncate(self.log_file, self._written_size)
+        self._handle = open(self.log_file, 'a', encoding='utf-8')
+
+    def drain(self, timeout: float = None) -> bool:
+        """
+        Wait until every appended segment has been written to the log.
+
+        Returns:
+            True if everything was written, False on timeout or if the writer has died
+        """
+        if self._writer is not None:
+            return self._writer.flush(timeout)
+        return True
+
+    def written_size(self) -> int:
+        """Byte length of the log as written so far, without waiting for queued appends."""
+        return self._written_size
+
+    def size(self) -> int:
+        """Byte length of the log, i.e. the offset the next append will be written at."""
+        self.drain()
+        with self._lock:
+            self._handle.flush()
+        return os.path.getsize(self.log_file)
+
+    def iter_from(self, offset: int = 0) -> Iterator[Tuple[Dict[str, Any], int]]:
+        """
+        Read the segments appended at or after a byte offset, without touching the rest of the log.
+
+        Args:
+            offset: Byte offset to start from (from size() or a previous iteration);
+                an offset in the middle of a line skips ahead to the next one
+
+        Yields:
+            (segment, offset just past that segment) pairs
+        """
+        self.drain()
+        with self._lock:
+            self._handle.flush()
+        with open(self.log_file, 'rb') as f:
+            if offset > 0:
+                f.seek(offset - 1)
+                if f.read(1) != b'\n':
+                    f.readline()  # Landed inside a line
+            position = f.tell()
+            for line in f:
+                position += len(line)
+                if not line.strip():
+                    continue
+                try:
+                    yield loads(line), position
+                except json.JSONDecodeError as e:
+                    print(f"Skipping unreadable segment log line: {e}")
+
+    def sync(self) -> None:
+        """Force pending appends to disk."""
+        self.drain()
+        with self._lock:
+            self._sync()
+
+    def _sync(self) -> None:
+        if self._pending_sync:
+            self._handle.flush()
+            os.fsync(self._handle.fileno())
+            self.index.sync()
+            self._pending_sync = 0
+        self._last_sync = time.monotonic()
+
+    def compact(self, output_file: str = None) -> int:
+        """
+        Produce the legacy JSON array from the log.
+
+        Skips the rewrite when nothing was appended since the last compaction.
+
+        Args:
+            output_file: Path to write the array to (defaults to the legacy file)
+
+        Returns:
+            Number of segments written (0 when the legacy file was already up to date)
+        """
+        output_file = output_file or self.legacy_file
+        if output_file == self.legacy_file and self._compacted_count == self.segment_count:
+            return 0
+
+        self.drain()
+        with self._lock:
+            self._handle.flush()
+        count = compact_log(self.log_file, output_file)
+        if output_file == self.legacy_file:
+            self._compacted_count = self.segment_count
+        return count
+
+    def reset(self) -> None:
+        """Empty the log and its dedup index, e.g. when a new conversation starts."""
+        self.drain()
+        with self._lock:
+            self._handle.close()
+            self._handle = open(self.log_file, 'w', encoding='utf-8')
+            self.index.clear()
+            self.segment_count = 0
+            self._compacted_count = None
+            self._pending_sync = 0
+            self._last_sync = time.monotonic()
+            self._written_size = 0
+
+    def drop_before(self, offset: int) -> None:
+        """
+        Remove the first offset bytes of the log (e.g. a conversation that was archived
+        before a crash stopped the log being reset) and rebuild the dedup index from the rest.
+
+        Args:
+            offset: Byte length of the part to drop, at a line boundary
+        """
+        self.drain()
+        with self._lock:
+            self._handle.flush()
+            with open(self.log_file, 'rb') as f:
+                f.seek(offset)
+                rest = f.read()
+            tmp_file = f"{self.log_file}.tmp"
+            with open(tmp_file, 'wb') as f:
+                f.write(rest)
+                f.flush()
+                os.fsync(f.fileno())
+            self._handle.close()
+            os.replace(tmp_file, self.log_file)
+            self._handle = open(self.log_file, 'a', encoding='utf-8')
+            self.index.clear()
+            self._rebuild_index()
+            self._compacted_count = None
+            self._pending_sync = 0
+            self._written_size = self._handle.tell()
+
+    def close(self) -> None:
+        """Write out queued appends, fsync and close the log."""
+        if self._writer is not None:
+            self._writer.close()
+        if not self._handle.closed:
+            self.sync()
+            self._handle.close()
+            self.index.close()
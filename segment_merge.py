@@ -0,0 +1,252 @@
+import random
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from segment_model import Segment, SegmentBuffer
+from trigger_engine import normalize_tokens
+
+INSERTED = 'inserted'
+REPLACED = 'replaced'
+UNCHANGED = 'unchanged'
+
+
+def is_revision(old_text: str, new_text: str) -> bool:
+    """Check whether new_text continues old_text (same words, ignoring case and punctuation, plus more)."""
+    old_tokens = normalize_tokens(old_text)
+    new_tokens = normalize_tokens(new_text)
+    return len(new_tokens) >= len(old_tokens) and new_tokens[:len(old_tokens)] == old_tokens
+
+
+class _Node:
+    __slots__ = ('key', 'forward')
+
+    def __init__(self, key: Any, level: int):
+        self.key = key
+        self.forward = [None] * level
+
+
+class SortedIndex:
+    """
+    Sorted set of comparable keys kept in a skip list.
+
+    add(), remove() and finding the first key >= a bound are O(log n)
+    expected, wherever in the order the key falls; iterating from there
+    costs O(1) per key. Keys must be unique (e.g. (start, row) tuples).
+    """
+
+    MAX_LEVEL = 32
+
+    def __init__(self, seed: int = 0):
+        """
+        Args:
+            seed: Seed for the node levels, so the layout is reproducible
+        """
+        self._random = random.Random(seed)
+        self._head = _Node(None, self.MAX_LEVEL)
+        self._level = 1
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[Any]:
+        node = self._head.forward[0]
+        while node is not None:
+            yield node.key
+            node = node.forward[0]
+
+    def _predecessors(self, key: Any) -> List[_Node]:
+        """Last node before key on every level."""
+        update = [self._head] * self.MAX_LEVEL
+        node = self._head
+        for level in range(self._level - 1, -1, -1):
+            while node.forward[level] is not None and node.forward[level].key < key:
+                node = node.forward[level]
+            update[level] = node
+        return update
+
+    def add(self, key: Any) -> None:
+        update = self._predecessors(key)
+        level = 1
+        while level < self.MAX_LEVEL and self._random.random() < 0.5:
+            level += 1
+        self._level = max(self._level, level)
+        node = _Node(key, level)
+        for i in range(level):
+            node.forward[i] = update[i].forward[i]
+            update[i].forward[i] = node
+        self._size += 1
+
+    def remove(self, key: Any) -> None:
+        """Remove key; raises KeyError if it isn't in the index."""
+        update = self._predecessors(key)
+        node = update[0].forward[0]
+        if node is None or node.key != key:
+            raise KeyError(key)
+        for i in range(len(node.forward)):
+            update[i].forward[i] = node.forward[i]
+        while self._level > 1 and self._head.forward[self._level - 1] is None:
+            self._level -= 1
+        self._size -= 1
+
+    def irange(self, low: Any) -> Iterator[Any]:
+        """Keys >= low, in order."""
+        node = self._predecessors(low)[0].forward[0]
+        while node is not None:
+            yield node.key
+            node = node.forward[0]
+
+    def clear(self) -> None:
+        self._head = _Node(None, self.MAX_LEVEL)
+        self._level = 1
+        self._size = 0
+
+
+class SegmentMerger:
+    """
+    Collapses the revised versions of a segment that Omi resends.
+
+    Omi sends a segment while it is still being spoken and resends it as it
+    grows or is corrected. upsert() matches an incoming segment to the one
+    it revises, first by Omi's segment id and otherwise by the same speaker
+    with an overlapping time span (start times within overlap_tolerance when
+    end times are unknown, as in older archives) and text that continues the
+    stored text. The stored segment is replaced in place. An older, shorter
+    copy arriving late is ignored.
+
+    Rows live in a SegmentBuffer in arrival order, indexed by start time in
+    a SortedIndex, so finding overlapping segments is O(log n + k) for k
+    candidates and adding, revising or moving a segment is O(log n),
+    whatever order segments arrive in. A revision that keeps its start
+    time (the usual case) leaves the index untouched.
+    """
+
+    def __init__(self, overlap_tolerance: float = 1.0):
+        """
+        Args:
+            overlap_tolerance: Seconds two start times may differ by and still describe the same segment
+        """
+        self.overlap_tolerance = overlap_tolerance
+        self.buffer = SegmentBuffer()
+        self._row_by_id = {}
+        self._by_start = SortedIndex()  # (start, row)
+        self._max_duration = 0.0
+
+    def __len__(self) -> int:
+        return len(self.buffer)
+
+    def __iter__(self) -> Iterator[Segment]:
+        """Merged segments in arrival order."""
+        return iter(self.buffer)
+
+    def ordered(self) -> List[Segment]:
+        """Merged segments sorted by start time."""
+        return [self.buffer[row] for _, row in self._by_start]
+
+    def _overlaps(self, row: int, segment: Segment) -> bool:
+        start = self.buffer.starts[row]
+        end = self.buffer.ends[row]
+        if segment.end is None or end != end:  # NaN: no end time stored
+            return abs(start - segment.start) <= self.overlap_tolerance
+        return start < segment.end + self.overlap_tolerance and segment.start < end + self.overlap_tolerance
+
+    def find(self, segment: Segment) -> Optional[int]:
+        """
+        Find the stored row an incoming segment is a version of.
+
+        Args:
+            segment: Incoming segment
+
+        Returns:
+            Row number in the buffer, or None if it is a new segment
+        """
+        if segment.id is not None:
+            row = self._row_by_id.get(segment.id)
+            if row is not None:
+                return row
+
+        # Only segments starting within the longest span seen can overlap
+        low = segment.start - self._max_duration - self.overlap_tolerance
+        high = (segment.end if segment.end is not None else segment.start) + self.overlap_tolerance
+        for start, row in self._by_start.irange((low, -1)):
+            if start > high:
+                break
+            if (self.buffer.speaker(row) == segment.speaker and self._overlaps(row, segment) and
+                    (segment.id is None or self.buffer.ids[row] is None) and
+                    (is_revision(self.buffer.texts[row], segment.text) or
+                     is_revision(segment.text, self.buffer.texts[row]))):
+                return row
+        return None
+
+    def upsert(self, segment: Segment) -> Tuple[str, int, Optional[Segment]]:
+        """
+        Add a segment, or replace the stored segment it is a revision of.
+
+        Args:
+            segment: Incoming segment
+
+        Returns:
+            (status, row, previous): status is INSERTED, REPLACED or UNCHANGED, row is the segment's
+            row number in the buffer, and previous is the stored segment it matched (None when inserted)
+        """
+        row = self.find(segment)
+        if row is None:
+            row = len(self.buffer)
+            self.buffer.append(segment)
+            self._index(row, segment)
+            return INSERTED, row, None
+
+        previous = self.buffer[row]
+        stale = is_revision(segment.text, previous.text) and not is_revision(previous.text, segment.text)
+        if segment.text == previous.text or stale:
+            # Same text again, or an older and shorter copy arriving late
+            return UNCHANGED, row, previous
+
+        moved = segment.start != previous.start
+        if moved:
+            self._by_start.remove((previous.start, row))
+        if previous.id is not None and previous.id != segment.id:
+            self._row_by_id.pop(previous.id, None)
+        self.buffer[row] = segment
+        self._index(row, segment, moved)
+        return REPLACED, row, previous
+
+    def _index(self, row: int, segment: Segment, by_start: bool = True) -> None:
+        if by_start:
+            self._by_start.add((segment.start, row))
+        if segment.id is not None:
+            self._row_by_id[segment.id] = row
+        if segment.end is not None:
+            self._max_duration = max(self._max_duration, segment.end - segment.start)
+
+    def clear(self) -> None:
+        """Forget every segment, e.g. when a new conversation starts."""
+        self.buffer.clear()
+        self._row_by_id.clear()
+        self._by_start.clear()
+        self._max_duration = 0.0
+
+
+def merge_segments(segments: Iterable[Dict[str, Any]], overlap_tolerance: float = 1.0) -> List[Dict[str, Any]]:
+    """
+    Collapse duplicates and revisions in a list of processed segment dicts.
+
+    Each revision replaces the version before it in place, so the result
+    keeps the order in which segments first appeared. The dicts are passed
+    through unchanged (older archives keep their original fields).
+
+    Args:
+        segments: Processed segment dicts, in the order they were received
+        overlap_tolerance: See SegmentMerger
+
+    Returns:
+        Merged segment dicts
+    """
+    merger = SegmentMerger(overlap_tolerance)
+    merged = []
+    for data in segments:
+        action, row, _previous = merger.upsert(Segment.from_dict(data))
+        if action == INSERTED:
+            merged.append(data)
+        elif action == REPLACED:
+            merged[row] = data
+    return merged
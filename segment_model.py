@@ -0,0 +1,244 @@
+import math
+import sys
+from array import array
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+
+def format_timestamp(seconds: float) -> str:
+    """
+    Convert a start time in seconds to the HH:MM:SS display format.
+
+    Args:
+        seconds: Time in seconds
+
+    Returns:
+        Formatted timestamp string (HH:MM:SS)
+    """
+    seconds = int(seconds or 0)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def parse_timestamp(timestamp: str) -> float:
+    """
+    Convert an HH:MM:SS timestamp (as stored by older versions) back to seconds.
+
+    Args:
+        timestamp: Formatted timestamp
+
+    Returns:
+        Seconds, or 0.0 if the timestamp can't be read
+    """
+    try:
+        hours, minutes, seconds = timestamp.split(':')
+        return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    except (AttributeError, ValueError):
+        return 0.0
+
+
+class Segment:
+    """
+    One transcription segment, with the fields Omi sends that we keep.
+
+    Times stay numeric (seconds from the start of the recording) so they
+    sort and compare cheaply; the HH:MM:SS timestamp is only produced for
+    display and when the segment is written out. Speaker labels are
+    interned, so every segment from one speaker shares the same string.
+
+    Segments also answer dict-style reads (segment['text'],
+    segment.get('id')) with the keys of the stored processed format, so
+    code written against processed segment dicts keeps working.
+    """
+
+    __slots__ = ('text', 'speaker', 'start', 'end', 'id', 'speaker_id', 'is_user')
+
+    def __init__(self, text: str, speaker: str = 'UNKNOWN', start: float = 0.0, end: Optional[float] = None,
+                 id: Optional[str] = None, speaker_id: Optional[int] = None, is_user: Optional[bool] = None):
+        self.text = text
+        self.speaker = sys.intern(speaker)
+        self.start = start
+        self.end = end
+        self.id = id
+        self.speaker_id = speaker_id
+        self.is_user = is_user
+
+    @classmethod
+    def from_omi(cls, raw: Dict[str, Any]) -> 'Segment':
+        """
+        Build a segment from one entry of the segments list in an Omi webhook body.
+
+        Args:
+            raw: Omi segment (id, text, speaker, speaker_id, is_user, start, end, ...)
+
+        Returns:
+            The segment
+        """
+        end = raw.get('end')
+        return cls(
+            (raw.get('text') or '').strip(),
+            raw.get('speaker') or 'UNKNOWN',
+            float(raw.get('start') or 0.0),
+            float(end) if end is not None else None,
+            raw.get('id') or None,
+            raw.get('speaker_id'),
+            raw.get('is_user'),
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Segment':
+        """
+        Build a segment from a stored processed segment (older ones only have an HH:MM:SS timestamp).
+
+        Args:
+            data: Processed segment dictionary
+
+        Returns:
+            The segment
+        """
+        start = data.get('start')
+        return cls(
+            data.get('text', ''),
+            data.get('speaker', 'UNKNOWN'),
+            float(start) if start is not None else parse_timestamp(data.get('timestamp')),
+            data.get('end'),
+            data.get('id') or None,
+            data.get('speaker_id'),
+            data.get('is_user'),
+        )
+
+    @property
+    def timestamp(self) -> str:
+        """Start time formatted as HH:MM:SS."""
+        return format_timestamp(self.start)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Serialize to the processed segment format (speaker, text, timestamp, plus the optional fields we have).
+
+        Returns:
+            Processed segment dictionary
+        """
+        data = {"speaker": self.speaker, "text": self.text, "timestamp": self.timestamp}
+        if self.id:
+            data["id"] = self.id
+        data["start"] = self.start
+        if self.end is not None:
+            data["end"] = self.end
+        if self.speaker_id is not None:
+            data["speaker_id"] = self.speaker_id
+        if self.is_user is not None:
+            data["is_user"] = self.is_user
+        return data
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key == 'timestamp':
+            return self.timestamp
+        if key in Segment.__slots__:
+            value = getattr(self, key)
+            return default if value is None else value
+        return default
+
+    def __getitem__(self, key: str) -> Any:
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, Segment):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in Segment.__slots__)
+
+    def __repr__(self) -> str:
+        return f"Segment([{self.timestamp}] {self.speaker}: {self.text!r})"
+
+
+class SegmentBuffer:
+    """
+    Columnar store for many segments.
+
+    Start and end times live in float arrays, speakers as small integer
+    codes into a table of labels, speaker ids and is_user flags in integer
+    arrays, and texts as interned strings. A segment costs a few dozen
+    bytes plus its text instead of a dict and its boxed values; Segment
+    objects are only created when a row is read. Rows are appended, and
+    can be replaced in place when a segment is revised.
+    """
+
+    def __init__(self, segments: Iterable[Segment] = ()):
+        self.starts = array('d')
+        self.ends = array('d')  # NaN when Omi didn't send an end time
+        self.speaker_codes = array('H')
+        self.speaker_ids = array('i')  # -1 when unknown
+        self.is_user = array('b')  # -1 unknown, 0 no, 1 yes
+        self.texts = []
+        self.ids = []
+        self.speakers = []  # Speaker labels, indexed by code
+        self._speaker_codes = {}
+        self.extend(segments)
+
+    def append(self, segment: Segment) -> None:
+        code = self._speaker_code(segment.speaker)
+        self.starts.append(segment.start)
+        self.ends.append(math.nan if segment.end is None else segment.end)
+        self.speaker_codes.append(code)
+        self.speaker_ids.append(-1 if segment.speaker_id is None else segment.speaker_id)
+        self.is_user.append(-1 if segment.is_user is None else int(segment.is_user))
+        self.texts.append(sys.intern(segment.text))
+        self.ids.append(segment.id)
+
+    def __setitem__(self, index: int, segment: Segment) -> None:
+        """Replace a row in place (e.g. with a revised version of the segment)."""
+        code = self._speaker_code(segment.speaker)
+        self.starts[index] = segment.start
+        self.ends[index] = math.nan if segment.end is None else segment.end
+        self.speaker_codes[index] = code
+        self.speaker_ids[index] = -1 if segment.speaker_id is None else segment.speaker_id
+        self.is_user[index] = -1 if segment.is_user is None else int(segment.is_user)
+        self.texts[index] = sys.intern(segment.text)
+        self.ids[index] = segment.id
+
+    def _speaker_code(self, speaker: str) -> int:
+        code = self._speaker_codes.get(speaker)
+        if code is None:
+            code = self._speaker_codes[speaker] = len(self.speakers)
+            self.speakers.append(speaker)
+        return code
+
+    def extend(self, segments: Iterable[Segment]) -> None:
+        for segment in segments:
+            self.append(segment)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __getitem__(self, index: int) -> Segment:
+        end = self.ends[index]
+        speaker_id = self.speaker_ids[index]
+        is_user = self.is_user[index]
+        return Segment(
+            self.texts[index],
+            self.speakers[self.speaker_codes[index]],
+            self.starts[index],
+            None if math.isnan(end) else end,
+            self.ids[index],
+            None if speaker_id < 0 else speaker_id,
+            None if is_user < 0 else bool(is_user),
+        )
+
+    def __iter__(self) -> Iterator[Segment]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def speaker(self, index: int) -> str:
+        """Speaker label of a row without building the Segment."""
+        return self.speakers[self.speaker_codes[index]]
+
+    def clear(self) -> None:
+        """Remove every segment, e.g. when a new conversation starts."""
+        self.__init__()
+
+    def column_bytes(self) -> int:
+        """Bytes used by the numeric columns and the list slots (texts themselves not included)."""
+        numeric = sum(column.itemsize * len(column) for column in
+                      (self.starts, self.ends, self.speaker_codes, self.speaker_ids, self.is_user))
+        return numeric + sys.getsizeof(self.texts) + sys.getsizeof(self.ids)
@@ -0,0 +1,215 @@
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from fast_json import decode_content, JSONDecodeError
+from metrics import metrics
+
+DEFAULT_SESSION = 'default'
+
+
+def session_id_for(payload: Dict[str, Any], content_session_id: Optional[str] = None) -> str:
+    """
+    Work out which Omi session a webhook payload belongs to.
+
+    Uses the session_id from the transcript content, then the uid query
+    parameter Omi adds to the webhook URL, then DEFAULT_SESSION. The id is
+    made safe to use as a directory name.
+
+    Args:
+        payload: Raw webhook payload (webhook.site request format)
+        content_session_id: session_id decoded from the payload's content (see fast_json.decode_content)
+
+    Returns:
+        Session id
+    """
+    session_id = content_session_id
+    if not session_id:
+        session_id = (payload.get('query') or {}).get('uid')
+    if not session_id:
+        return DEFAULT_SESSION
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', str(session_id))[:128] or DEFAULT_SESSION
+
+
+class Session:
+    """Queue and counters of one session; its processor is created on first use."""
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.processor = None
+        self.pending = deque()
+        self.scheduled = False  # A worker is draining this session's queue
+        self.received = 0
+        self.processed = 0
+        self.failed = 0
+        self.last_payload_at = None
+
+
+class SessionManager:
+    """
+    Routes webhook payloads to isolated per-session processors.
+
+    Each session has its own processor (state and files) and its own queue.
+    A session's payloads are handled one at a time, in arrival order, while
+    different sessions run concurrently on a shared worker pool. A worker
+    hands a session back to the pool after batch_size payloads, so one busy
+    or slow session holds at most one worker and never delays the others.
+
+    Payloads are numbered as they are submitted. acknowledged is the number
+    of the last payload such that it and every payload before it have been
+    handled, so a caller can persist its progress (e.g. the webhook.site
+    cursor) without waiting for a slow session to go idle.
+    """
+
+    def __init__(self, processor_factory: Callable[[str], Any], workers: int = 4, batch_size: int = 8):
+        """
+        Args:
+            processor_factory: Creates the processor for a session id; the processor needs
+                handle_payload(payload, segments=None) and close() (e.g. webhook.create_session_processor)
+            workers: Sessions processed at the same time
+            batch_size: Payloads a worker handles for one session before moving on
+        """
+        self.processor_factory = processor_factory
+        self.batch_size = batch_size
+
+        self.sessions: Dict[str, Session] = {}
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._active = 0  # Sessions scheduled or running
+        self.submitted = 0  # Number of the last payload submitted
+        self.acknowledged = 0  # Every payload up to this number has been handled
+        self._handled = set()  # Handled payloads numbered after acknowledged
+        self._shutdown = False
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='session')
+
+    def submit(self, payload: Dict[str, Any]) -> str:
+        """
+        Queue a payload for its session without waiting for it.
+        The content is decoded once here; the session's processor gets the decoded segments.
+
+        Args:
+            payload: Raw webhook payload
+
+        Returns:
+            Id of the session the payload was routed to
+        """
+        try:
+            with metrics.timer('parse'):
+                content_session_id, segments = decode_content(payload.get('content'))
+            metrics.count('segments_parsed', len(segments))
+        except JSONDecodeError:
+            content_session_id, segments = None, None  # The processor reports it when it parses the payload
+        session_id = session_id_for(payload, content_session_id)
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("SessionManager has been shut down")
+            session = self.sessions.get(session_id)
+            if session is None:
+                session = self.sessions[session_id] = Session(session_id)
+                print(f"🆕 New session {session_id}")
+            self.submitted += 1
+            session.pending.append((self.submitted, payload, segments))
+            session.received += 1
+            session.last_payload_at = time.time()
+            if not session.scheduled:
+                session.scheduled = True
+                self._active += 1
+                self._executor.submit(self._drain, session)
+        return session_id
+
+    def _drain(self, session: Session) -> None:
+        """Handle up to batch_size of a session's payloads, then requeue it if more are waiting."""
+        if session.processor is None:
+            try:
+                session.processor = self.processor_factory(session.session_id)
+            except Exception as e:
+                print(f"Error starting session {session.session_id}: {e}")
+                with self._lock:
+                    session.failed += len(session.pending)
+                    for number, _, _ in session.pending:
+                        self._acknowledge(number)
+                    session.pending.clear()
+                    session.scheduled = False
+                    self._active -= 1
+                    self._idle.notify_all()
+                return
+
+        for _ in range(self.batch_size):
+            with self._lock:
+                if not session.pending:
+                    break
+                number, payload, segments = session.pending.popleft()
+            try:
+                session.processor.handle_payload(payload, segments=segments)
+                session.processed += 1
+            except Exception as e:
+                session.failed += 1
+                print(f"Error processing payload for session {session.session_id}: {e}")
+            with self._lock:
+                self._acknowledge(number)
+
+        with self._lock:
+            if session.pending and not self._shutdown:
+                # Go to the back of the pool's queue so other sessions get a turn
+                self._executor.submit(self._drain, session)
+            else:
+                session.scheduled = False
+                self._active -= 1
+                self._idle.notify_all()
+
+    def _acknowledge(self, number: int) -> None:
+        """Record a handled payload and move acknowledged past it if nothing before it is outstanding."""
+        self._handled.add(number)
+        while self.acknowledged + 1 in self._handled:
+            self.acknowledged += 1
+            self._handled.remove(self.acknowledged)
+
+    def wait_idle(self, timeout: float = None) -> bool:
+        """
+        Wait until every queued payload has been handled.
+
+        Returns:
+            True if all sessions went idle within the timeout
+        """
+        with self._idle:
+            return self._idle.wait_for(lambda: self._active == 0, timeout)
+
+    def processors(self) -> List[Any]:
+        """Processors of the sessions started so far."""
+        with self._lock:
+            return [session.processor for session in self.sessions.values() if session.processor is not None]
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Per-session counters (received, processed, failed, pending)."""
+        with self._lock:
+            return {
+                session_id: {
+                    "received": session.received,
+                    "processed": session.processed,
+                    "failed": session.failed,
+                    "pending": len(session.pending),
+                }
+                for session_id, session in self.sessions.items()
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Stop the workers and close every session's processor.
+
+        Args:
+            wait: Finish queued payloads first
+        """
+        if wait:
+            self.wait_idle()
+        with self._lock:
+            self._shutdown = True
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+        for session in list(self.sessions.values()):
+            if session.processor is not None:
+                try:
+                    session.processor.close()
+                except Exception as e:
+                    print(f"Error closing session {session.session_id}: {e}")
@@ -0,0 +1,178 @@
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+from webhook_fetcher import WebhookSiteFetcher
+
+TOKEN = "e00c4adb-0534-4647-b85f-10d3f936fd38"
+
+
+class QuietHandler(BaseHTTPRequestHandler):
+    """Request handler that doesn't log every request to stderr."""
+
+    def send_empty(self, status: int, headers: dict = None) -> None:
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def send_json(self, data) -> None:
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer:
+    """Serves a handler class on a free local port from a daemon thread."""
+
+    def __init__(self, handler):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    @property
+    def url(self) -> str:
+        """Chat completions endpoint, for the OpenAI stand-ins."""
+        return f"{self.base_url}/v1/chat/completions"
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class FakeWebhookSite(StubServer):
+    """In-process stand-in for the webhook.site /token/{uuid}/requests API."""
+
+    def __init__(self):
+        self.requests = []
+        self.connections = set()
+        self.calls = 0
+        self.failures = []  # (status, headers) answered to the next GETs instead of a page
+        self._sorting = 1750475858000000
+        self._clock = datetime(2025, 6, 21, 3, 17, 38)
+
+        fake = self
+
+        class Handler(QuietHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive, so connection reuse is visible
+
+            def do_GET(self):
+                fake.calls += 1
+                fake.connections.add(self.client_address)
+                if fake.failures:
+                    self.send_empty(*fake.failures.pop(0))
+                    return
+                parts = urlsplit(self.path)
+                if parts.path != f"/token/{TOKEN}/requests":
+                    self.send_empty(404)
+                    return
+                self.send_json(fake.page(parse_qs(parts.query)))
+
+        super().__init__(Handler)
+
+    def inject(self, count, same_second=False, with_sorting=True):
+        """Simulate a burst of requests from the necklace."""
+        for _ in range(count):
+            if not same_second:
+                self._clock += timedelta(seconds=1)
+            self._sorting += 1
+            request = {
+                "uuid": f"req-{len(self.requests):05d}",
+                "created_at": self._clock.strftime("%Y-%m-%d %H:%M:%S"),
+                "content": json.dumps({"session_id": "s1", "segments": [
+                    {"id": f"seg-{len(self.requests)}", "text": f"segment {len(self.requests)}",
+                     "speaker": "SPEAKER_0", "start": float(len(self.requests)), "end": 0.0}
+                ]}),
+            }
+            if with_sorting:
+                request["sorting"] = self._sorting
+            self.requests.append(request)
+
+    def page(self, query):
+        per_page = int(query.get('per_page', ['50'])[0])
+        page = int(query.get('page', ['1'])[0])
+        newest_first = query.get('sorting', ['newest'])[0] == 'newest'
+        date_from = query.get('date_from', [None])[0]
+
+        matching = [r for r in self.requests if not date_from or r['created_at'] >= date_from]
+        if newest_first:
+            matching = matching[::-1]
+        start = (page - 1) * per_page
+        data = matching[start:start + per_page]
+        return {"data": data, "total": len(matching), "per_page": per_page,
+                "current_page": page, "is_last_page": start + per_page >= len(matching)}
+
+
+def make_fetcher(fake, cursor_file=None):
+    return WebhookSiteFetcher(TOKEN, api_key="test", base_url=fake.base_url,
+                              per_page=25, cursor_file=cursor_file)
+
+
+class MockCompletionsServer(StubServer):
+    """Local stand-in for the chat completions endpoint with a configurable delay."""
+
+    def __init__(self, delay: float = 0.3, question: str = "What do you like most about it?"):
+        self.delay = delay
+        self.question = question
+        self.calls = 0
+        self.release = threading.Event()
+        self.release.set()
+
+        mock = self
+
+        class Handler(QuietHandler):
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                self.rfile.read(length)
+                mock.calls += 1
+                mock.release.wait(10)
+                time.sleep(mock.delay)
+                self.send_json({"choices": [{"message": {"content": mock.question}}]})
+
+        super().__init__(Handler)
+
+    def close(self):
+        self.release.set()
+        super().close()
+
+
+class SSEStubServer(StubServer):
+    """Local chat completions stub that streams its answer as server-sent events."""
+
+    def __init__(self, chunks, first_token_delay: float = 0.05, chunk_delay: float = 0.05):
+        self.chunks = chunks
+        self.first_token_delay = first_token_delay
+        self.chunk_delay = chunk_delay
+        self.requests = []
+        self.finished_at = None
+
+        stub = self
+
+        class Handler(QuietHandler):
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                stub.requests.append(json.loads(self.rfile.read(length)))
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.end_headers()
+                time.sleep(stub.first_token_delay)
+                for chunk in stub.chunks:
+                    event = {"choices": [{"delta": {"content": chunk}}]}
+                    self.wfile.write(f"data: {json.dumps(event)}\n\n".encode('utf-8'))
+                    self.wfile.flush()
+                    time.sleep(stub.chunk_delay)
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+                stub.finished_at = time.perf_counter()
+
+        super().__init__(Handler)
@@ -0,0 +1,123 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+import openai
+from action_executor import ActionExecutor, DONE, CANCELLED, DROPPED
+from stub_servers import MockCompletionsServer
+
+
+class OpenAIFixture:
+    """Point openai.hello_world at the mock server and record what would be spoken."""
+
+    def __init__(self, delay: float = 0.3):
+        self.mock = MockCompletionsServer(delay)
+        self.spoken = []
+        self._tmp = tempfile.TemporaryDirectory()
+        self._cwd = os.getcwd()
+        self._saved = (openai.OPENAI_API_URL, openai.speak, openai.USE_RESPONSE_CACHE)
+
+    def __enter__(self):
+        os.chdir(self._tmp.name)
+        with open('processed_transcription.json', 'w') as f:
+            json.dump([{"speaker": "SPEAKER_1", "text": "I like your shoes", "timestamp": "00:00:01"}], f)
+        openai.OPENAI_API_URL = self.mock.url
+        openai.speak = lambda text, replace=False: self.spoken.append(text)
+        openai.USE_RESPONSE_CACHE = False  # Every trigger should reach the mock server
+        return self
+
+    def __exit__(self, *exc):
+        openai.OPENAI_API_URL, openai.speak, openai.USE_RESPONSE_CACHE = self._saved
+        os.chdir(self._cwd)
+        self._tmp.cleanup()
+        self.mock.close()
+
+
+def test_submit_does_not_block_ingest():
+    with OpenAIFixture(delay=0.5) as fixture:
+        executor = ActionExecutor()
+        started = time.perf_counter()
+        job = executor.submit(openai.hello_world, cancellable=True)
+        assert time.perf_counter() - started < 0.05
+
+        assert job.wait(5)
+        assert job.status == DONE
+        assert job.result == fixture.mock.question
+        assert fixture.spoken == [fixture.mock.question]
+        executor.shutdown()
+
+
+def test_quick_triggers_are_coalesced():
+    with OpenAIFixture(delay=0.1) as fixture:
+        fixture.mock.release.clear()
+        executor = ActionExecutor()
+        first = executor.submit(openai.hello_world, cancellable=True)
+        while fixture.mock.calls == 0:
+            time.sleep(0.01)
+
+        # Five more triggers while the first call is in flight collapse into one follow-up
+        follow_ups = [executor.submit(openai.hello_world, cancellable=True) for _ in range(5)]
+        assert all(job is follow_ups[0] for job in follow_ups)
+        assert follow_ups[0].coalesced == 4
+
+        fixture.mock.release.set()
+        assert first.wait(5) and follow_ups[0].wait(5)
+        assert fixture.mock.calls == 2
+        assert executor.stats()["coalesced"] == 4
+        executor.shutdown()
+
+
+def test_cancelled_question_is_not_spoken():
+    with OpenAIFixture(delay=0.3) as fixture:
+        executor = ActionExecutor()
+        job = executor.submit(openai.hello_world, cancellable=True)
+        while fixture.mock.calls == 0:
+            time.sleep(0.01)
+        assert executor.cancel() == 1
+
+        assert job.wait(5)
+        assert job.status == CANCELLED
+        assert fixture.spoken == []
+        executor.shutdown()
+
+
+def test_full_queue_drops_oldest_pending_job():
+    release = threading.Event()
+    executor = ActionExecutor(max_pending=2)
+    blocker = executor.submit(release.wait, 5, key='blocker')
+    while executor.stats()["running"] == 0:
+        time.sleep(0.01)
+
+    jobs = [executor.submit(lambda: None, key=f'job-{i}') for i in range(3)]
+    assert jobs[0].status == DROPPED
+    assert executor.stats()["dropped"] == 1
+
+    release.set()
+    assert blocker.wait(5) and jobs[1].wait(5) and jobs[2].wait(5)
+    assert executor.stats()["completed"] == 3
+    executor.shutdown()
+
+
+def test_conversation_index_is_opened_by_the_action():
+    from webhook import TranscriptionProcessor
+
+    seen = []
+
+    def action(context=None, get_conversation_index=None):
+        seen.append(processor.conversation_index)  # Not opened on the ingest thread
+        seen.append(get_conversation_index())
+        seen.append(threading.current_thread())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        processor = TranscriptionProcessor(triggers={"I like your": action}, data_dir=tmp, write_behind=False)
+        content = {"segments": [{"id": "s1", "text": "I like your shoes", "speaker": "SPEAKER_0",
+                                 "start": 0, "end": 1}]}
+        processor.handle_payload({"uuid": "1", "content": json.dumps(content)})
+        processor.action_executor.shutdown(wait=True)
+        processor.close()
+
+    assert seen[0] is None
+    assert seen[1] is processor.conversation_index
+    assert seen[2] is not threading.current_thread()
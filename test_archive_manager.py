@@ -0,0 +1,94 @@
+import json
+import os
+import tempfile
+import time
+
+from archive_manager import ArchiveManager, MANIFEST_FILE
+
+
+def write_conversation(path, texts):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump([{"speaker": "SPEAKER_0", "text": text, "start": float(i), "end": i + 0.5}
+                   for i, text in enumerate(texts)], f)
+
+
+def test_numbering_and_date_shards():
+    with tempfile.TemporaryDirectory() as tmp:
+        conversations_dir = os.path.join(tmp, 'previous_conversations')
+        source = os.path.join(tmp, 'processed_transcription.json')
+        manager = ArchiveManager(conversations_dir)
+        shard = time.strftime('%Y-%m-%d')
+
+        for texts in (["one", "two"], ["three"]):
+            write_conversation(source, texts)
+            manager.archive(source)
+        assert not os.path.exists(source)
+        assert sorted(manager.conversations) == [1, 2] and manager.next_id == 3
+        assert manager.path(1) == os.path.join(conversations_dir, shard, 'convo_1.json')
+        assert manager.conversations[1]["segments"] == 2
+        assert manager.conversations[1]["duration"] == 1.5
+
+        # Numbering survives a reload, and a lost manifest is rebuilt from the shards
+        assert ArchiveManager(conversations_dir).next_id == 3
+        os.remove(os.path.join(conversations_dir, MANIFEST_FILE))
+        rebuilt = ArchiveManager(conversations_dir)
+        assert rebuilt.paths() == manager.paths() and rebuilt.next_id == 3
+
+        flat = ArchiveManager(os.path.join(tmp, 'flat'), shard_by_date=False)
+        write_conversation(source, ["four"])
+        assert flat.path(flat.archive(source)) == os.path.join(tmp, 'flat', 'convo_1.json')
+
+
+def test_interrupted_rotation_is_recovered():
+    with tempfile.TemporaryDirectory() as tmp:
+        conversations_dir = os.path.join(tmp, 'previous_conversations')
+        ArchiveManager(conversations_dir, shard_by_date=False)
+        manifest_file = os.path.join(conversations_dir, MANIFEST_FILE)
+
+        # Crash after the number was reserved and the file moved
+        write_conversation(os.path.join(conversations_dir, 'convo_1.json'), ["moved"])
+        with open(manifest_file, 'w', encoding='utf-8') as f:
+            json.dump({"next_id": 2, "pending": {"id": 1, "path": "convo_1.json", "log_size": 120},
+                       "conversations": {}}, f)
+        manager = ArchiveManager(conversations_dir, shard_by_date=False)
+        assert manager.pending is None
+        assert manager.conversations[1]["segments"] == 1
+        assert manager.archived_log == {"id": 1, "size": 120}
+        manager.log_cleared()
+        assert ArchiveManager(conversations_dir).archived_log is None
+
+        # Crash before the file moved: the reservation is dropped and its number is not reused
+        with open(manifest_file, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        manifest.update(next_id=3, pending={"id": 2, "path": "convo_2.json"})
+        with open(manifest_file, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        manager = ArchiveManager(conversations_dir, shard_by_date=False)
+        assert sorted(manager.conversations) == [1] and manager.next_id == 3 and manager.pending is None
+
+
+def test_rotation_interrupted_before_the_log_reset_is_not_archived_twice():
+    from webhook import TranscriptionProcessor
+
+    def payload(number, text):
+        content = {"segments": [{"id": f"s{number}", "text": text, "speaker": "SPEAKER_0",
+                                 "start": float(number), "end": number + 0.5}]}
+        return {"uuid": str(number), "content": json.dumps(content)}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        processor = TranscriptionProcessor(triggers={}, data_dir=tmp, write_behind=False)
+        processor.handle_payload(payload(0, "first conversation"))
+        segment_log = processor.get_segment_log()
+        segment_log.compact()
+        # The process dies right after the archive, before the log is reset
+        processor.get_archive_manager().archive(processor.output_file, log_size=segment_log.size())
+        segment_log.close()
+
+        restarted = TranscriptionProcessor(triggers={}, data_dir=tmp, write_behind=False)
+        restarted.handle_payload(payload(1, "second conversation"))
+        restarted.start_new_conversation()
+        manager = restarted.get_archive_manager()
+        assert sorted(manager.conversations) == [1, 2] and manager.archived_log is None
+        with open(manager.path(2), 'r', encoding='utf-8') as f:
+            assert [segment["text"] for segment in json.load(f)] == ["second conversation"]
+        restarted.close()
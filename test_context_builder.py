@@ -0,0 +1,20 @@
+from context_builder import ConversationContext, estimate_tokens
+
+
+def test_turns_are_kept_verbatim_within_budget():
+    context = ConversationContext(token_budget=200)
+    context.add("SPEAKER_0", "Hi there,")
+    context.add("SPEAKER_0", "nice jacket.")
+    context.add("SPEAKER_1", "Thanks!")
+    context.add("SPEAKER_1", "It's new.", new_turn=True)
+    assert context.render() == "SPEAKER_0: Hi there, nice jacket.\nSPEAKER_1: Thanks!\nSPEAKER_1: It's new."
+
+
+def test_oversized_turn_is_truncated_even_with_no_recent_budget():
+    for share in (0.5, 1.0):
+        context = ConversationContext(token_budget=10, summary_share=share)
+        context.add("SPEAKER_0", "word " * 200)
+        rendered = context.render()
+        assert rendered.startswith("SPEAKER_0: …")
+        assert estimate_tokens(rendered) < 20
+        assert context.token_count() <= context.token_budget
@@ -0,0 +1,22 @@
+import json
+import os
+import tempfile
+
+from conversation_index import ConversationIndex
+
+
+def test_update_leaves_sibling_directories_alone():
+    with tempfile.TemporaryDirectory() as tmp:
+        current = os.path.join(tmp, 'previous_conversations')
+        sibling = os.path.join(tmp, 'previous_conversations_old')
+        for directory, text in ((current, "I like your shoes"), (sibling, "I like your hat")):
+            os.makedirs(directory)
+            with open(os.path.join(directory, 'convo_1.json'), 'w', encoding='utf-8') as f:
+                json.dump([{"speaker": "SPEAKER_0", "text": text, "start": 0.0, "end": 1.0}], f)
+
+        index = ConversationIndex(os.path.join(tmp, 'conversation_index.sqlite3'))
+        assert index.update(sibling)["indexed"] == 1
+        assert index.update(current) == {"indexed": 1, "unchanged": 0, "removed": 0}
+        assert index.update(sibling) == {"indexed": 0, "unchanged": 1, "removed": 0}
+        assert len(index.search("I like your")) == 2
+        index.close()
@@ -0,0 +1,82 @@
+import json
+import logging
+import os
+import random
+import tempfile
+import urllib.request
+
+from metrics import (Histogram, Metrics, SampleFilter, SnapshotWriter, bucket_index, bucket_lower_bound,
+                     serve_metrics)
+
+
+def test_buckets_are_contiguous_and_ordered():
+    previous = -1
+    for value in list(range(0, 5000)) + [10 ** 6, 10 ** 8]:
+        index = bucket_index(value)
+        assert index >= previous
+        assert bucket_lower_bound(index) <= value < bucket_lower_bound(index + 1)
+        previous = index
+
+
+def test_percentiles_within_bucket_precision():
+    rng = random.Random(3)
+    values = sorted(rng.expovariate(1 / 0.02) for _ in range(20000))
+    histogram = Histogram()
+    for value in values:
+        histogram.record(value)
+
+    assert histogram.count == len(values)
+    for quantile in (0.5, 0.9, 0.99, 0.999):
+        exact = values[int(quantile * len(values)) - 1]
+        assert exact * 0.99 <= histogram.percentile(quantile) <= exact * 1.04
+    assert histogram.percentile(1.0) == max(values)
+    assert Histogram().percentile(0.5) == 0.0
+
+
+def test_prometheus_and_json_export():
+    registry = Metrics()
+    registry.count('payloads', 3)
+    registry.gauge('poll_delay_seconds', lambda: 0.25)
+    registry.gauge('broken', lambda: 1 / 0)
+    with registry.timer('parse'):
+        pass
+    registry.observe('parse', 0.002)
+
+    text = registry.prometheus_text()
+    assert "omi_payloads_total 3" in text
+    assert "omi_poll_delay_seconds 0.25" in text
+    assert 'omi_parse_seconds{quantile="0.99"}' in text
+    assert "omi_parse_seconds_count 2" in text
+    assert "broken" not in text
+
+    server = serve_metrics(registry, port=0)
+    try:
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        assert "omi_payloads_total 3" in urllib.request.urlopen(f"{base}/metrics").read().decode()
+        snapshot = json.load(urllib.request.urlopen(f"{base}/metrics.json"))
+        assert snapshot["counters"] == {"payloads": 3}
+        assert snapshot["latency"]["parse"]["count"] == 2
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot_file = os.path.join(tmp, 'metrics.json')
+        writer = SnapshotWriter(registry, snapshot_file, interval=60)
+        writer.stop()
+        with open(snapshot_file, 'r', encoding='utf-8') as f:
+            assert json.load(f)["counters"]["payloads"] == 3
+
+
+def test_sampled_debug_logging():
+    sample = SampleFilter(every=10)
+
+    def record(level, msg):
+        return logging.LogRecord('omi', level, __file__, 0, msg, (), None)
+
+    debug_passed = sum(sample.filter(record(logging.DEBUG, "🔍 Checking text: '%s'")) for _ in range(100))
+    other_passed = sum(sample.filter(record(logging.DEBUG, "No new unique segments to add")) for _ in range(5))
+    info_passed = sum(sample.filter(record(logging.INFO, "Added %d new unique segments to %s")) for _ in range(5))
+    assert debug_passed == 10
+    assert other_passed == 1
+    assert info_passed == 5
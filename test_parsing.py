@@ -1,16 +1,16 @@
-import json
+import os
 from webhook import TranscriptionProcessor
+from payload_archive import iter_payloads
 
-# Load existing webhook data
-with open('live_transcript.json', 'r') as f:
-    webhook_data_list = json.load(f)
+# Read webhook data lazily from the payload archive (or an old live_transcript.json)
+source = 'live_transcript' if os.path.isdir('live_transcript') else 'live_transcript.json'
+first_webhook = next(iter_payloads(source), None)
 
 # Initialize processor
 processor = TranscriptionProcessor()
 
 # Test parsing with the first webhook entry
-if webhook_data_list:
-    first_webhook = webhook_data_list[0]
+if first_webhook is not None:
     print("Testing with first webhook entry:")
     print(f"Webhook keys: {list(first_webhook.keys())}")
     
@@ -0,0 +1,102 @@
+import json
+import os
+import tempfile
+import threading
+
+import pytest
+
+from persistence import WriteBehind
+from segment_log import SegmentLog, iter_log, log_path_for
+
+
+def test_write_behind_batches_and_flushes():
+    batches = []
+    release = threading.Event()
+
+    def write(batch):
+        release.wait(5)
+        batches.append(list(batch))
+
+    writer = WriteBehind(write, name='test_write', max_batch=50, max_delay=0.05)
+    writer.submit(0)  # Held by the blocked first write while the rest queue up
+    for i in range(1, 101):
+        writer.submit(i)
+    assert writer.pending() == 101
+    release.set()
+    assert writer.flush(timeout=5)
+    assert writer.pending() == 0
+    assert [item for batch in batches for item in batch] == list(range(101))
+    assert len(batches) <= 4
+    writer.close()
+
+
+def test_write_behind_retries_failed_writes():
+    written = []
+    attempts = []
+
+    def write(batch):
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise OSError("disk full")
+        written.extend(batch)
+
+    writer = WriteBehind(write, name='test_retry', max_delay=0.01, retry_delay=0.01)
+    writer.submit('a')
+    writer.close()
+    assert written == ['a']
+    assert writer.failures == 2
+
+
+def die(batch):
+    raise SystemExit  # Not retried: the worker thread stops, as if it had been killed
+
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_write_behind_flush_fails_once_the_worker_dies():
+    writer = WriteBehind(die, name='test_dead', max_delay=0.01)
+    writer.submit('a')
+    assert not writer.flush(timeout=5)
+    assert writer.pending() == 1
+
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_cursor_is_not_saved_past_unwritten_payloads():
+    from webhook import TranscriptionProcessor, save_written_cursor
+    from webhook_fetcher import WebhookSiteFetcher
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cursor_file = os.path.join(tmp, 'webhook_cursor.json')
+        fetcher = WebhookSiteFetcher("token", base_url="http://127.0.0.1:9", cursor_file=cursor_file)
+        fetcher.save_cursor({"sorting": 1})
+        processor = TranscriptionProcessor(triggers={}, data_dir=tmp, write_behind=True)
+        processor.get_segment_log()._writer.write = die
+        processor.handle_payload({"uuid": "req-1", "content": json.dumps({"segments": [
+            {"id": "seg-1", "text": "hello", "speaker": "SPEAKER_0", "start": 0.0, "end": 1.0}]})})
+
+        fetcher.cursor = {"sorting": 2}
+        assert not save_written_cursor(fetcher, [processor])
+        with open(cursor_file, encoding='utf-8') as f:
+            assert json.load(f) == {"sorting": 1}
+        processor.close()
+        fetcher.close()
+
+
+def test_segment_log_write_behind_is_read_consistent():
+    with tempfile.TemporaryDirectory() as tmp:
+        output_file = os.path.join(tmp, 'processed_transcription.json')
+        writes = []
+        log = SegmentLog(output_file, write_behind=True, max_delay=0.05, on_write=lambda: writes.append(1))
+        segments = [{"text": f"segment {i}", "speaker": "SPEAKER_0", "start": i, "end": i + 1}
+                    for i in range(20)]
+        assert len(log.append(segments)) == 20
+        assert log.append(segments[:5]) == []  # Still queued, but already deduplicated
+
+        assert log.size() == log.written_size() > 0  # size() waits for the writer
+        assert [segment["text"] for segment, _ in log.iter_from(0)] == [s["text"] for s in segments]
+        assert writes
+        log.close()
+
+        assert len(list(iter_log(log_path_for(output_file)))) == 20
+        reopened = SegmentLog(output_file)
+        assert reopened.append(segments) == []
+        reopened.close()
@@ -0,0 +1,88 @@
+import random
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import requests
+
+from poll_scheduler import PollScheduler, parse_retry_after, ACTIVE, IDLE, ERROR, RETRY_AFTER
+from stub_servers import FakeWebhookSite, make_fetcher
+
+
+def test_parse_retry_after():
+    now = datetime(2025, 6, 21, 3, 17, 38, tzinfo=timezone.utc)
+    assert parse_retry_after("12") == 12.0
+    assert parse_retry_after(format_datetime(now + timedelta(seconds=30), usegmt=True), now) == 30.0
+    assert parse_retry_after(format_datetime(now - timedelta(seconds=30), usegmt=True), now) == 0.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+
+
+def test_backoff_and_jitter_bounds():
+    scheduler = PollScheduler(min_interval=0.25, interval=1.0, max_interval=30.0, jitter=0.1,
+                              idle_grace=2, rng=random.Random(1))
+    assert 0.225 <= scheduler.record_poll(5) <= 0.275
+    idle = [scheduler.record_poll(0) for _ in range(10)]
+    # Back up to the normal interval, held for idle_grace polls, then exponential backoff
+    expected = (0.5, 1, 1, 1, 2, 4, 8, 16)
+    assert all(0.9 * value <= delay <= 1.1 * value for delay, value in zip(idle, expected))
+    assert 27 <= idle[-1] <= 33
+
+    errors = [scheduler.record_error() for _ in range(3)]
+    assert 1.8 <= errors[0] <= 2.2 and 3.6 <= errors[1] <= 4.4 and 7.2 <= errors[2] <= 8.8
+    assert scheduler.record_error(retry_after=60) >= 60
+    assert scheduler.metrics()["decisions"] == {ACTIVE: 1, IDLE: 10, ERROR: 3, RETRY_AFTER: 1}
+
+
+def test_simulated_conversation_against_fake_endpoint():
+    """Drive the real fetcher against the fake webhook.site on a virtual clock."""
+    fake = FakeWebhookSite()
+    try:
+        fake.inject(1)
+        fetcher = make_fetcher(fake)
+        fetcher.fetch_new_requests()
+
+        # Segments every 0.5s for 10s, 120s of silence, then another 10s burst
+        arrivals = [i * 0.5 for i in range(20)] + [130 + i * 0.5 for i in range(20)]
+        clock = [0.0]
+        scheduler = PollScheduler(rng=random.Random(7), sleep=lambda delay: clock.__setitem__(0, clock[0] + delay))
+        pending = list(arrivals)
+        latencies = []
+        poll_times = []
+        rate_limited_at = None
+        retry_poll_at = None
+
+        while clock[0] < 150:
+            due = [t for t in pending if t <= clock[0]]
+            pending = pending[len(due):]
+            fake.inject(len(due))
+            if rate_limited_at is None and clock[0] > 60:
+                # The endpoint rate limits once during the silence
+                fake.failures.append((429, {"Retry-After": "7"}))
+            poll_times.append(clock[0])
+            if rate_limited_at is not None and retry_poll_at is None:
+                retry_poll_at = clock[0]
+            try:
+                batch = fetcher.fetch_new_requests()
+                latencies.extend(clock[0] - t for t in due[:len(batch)])
+                scheduler.record_poll(len(batch))
+            except requests.HTTPError as e:
+                rate_limited_at = clock[0]
+                scheduler.record_error(parse_retry_after(e.response.headers.get('Retry-After')))
+            scheduler.wait()
+        fetcher.close()
+
+        # Segments are picked up quickly while they are arriving
+        assert len(latencies) == len(arrivals) - len(pending)
+        assert max(latencies[:20]) <= 0.55
+        # The silence costs far fewer polls than a fixed one-second loop
+        silent_polls = [t for t in poll_times if 12 < t < 130]
+        assert len(silent_polls) < 20
+        # Retry-After is honored
+        assert retry_poll_at - rate_limited_at >= 7
+        # The second burst is noticed within one backed-off interval and then followed closely
+        assert max(latencies[20:]) <= scheduler.max_interval * 1.1
+        metrics = scheduler.metrics()
+        assert metrics["decisions"][RETRY_AFTER] == 1
+        assert metrics["requests_seen"] == len(latencies)
+    finally:
+        fake.close()
@@ -0,0 +1,63 @@
+from response_cache import ResponseCache, context_fingerprint
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        self.now += 1  # Every lookup is strictly later than the one before
+        return self.now
+
+
+def test_hits_and_misses_are_counted():
+    cache = ResponseCache(':memory:', clock=FakeClock())
+    assert cache.get("a") is None
+    cache.put("a", "Where did you get them?")
+    assert cache.get("a") == "Where did you get them?"
+    assert cache.get("a") == "Where did you get them?"
+    assert cache.get("b") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"], stats["entries"]) == (2, 2, 0.5, 1)
+    cache.close()
+
+
+def test_entries_expire_after_the_ttl():
+    clock = FakeClock()
+    cache = ResponseCache(':memory:', ttl_seconds=60, clock=clock)
+    cache.put("a", "old question")
+    clock.now += 30
+    assert cache.get("a") == "old question"
+    clock.now += 60  # Expires by age since it was stored, not since it was last used
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0 and cache.misses == 1
+
+    cache.put("b", "first")
+    clock.now += 120
+    cache.put("c", "second")  # Expired entries are removed when something new is stored
+    assert cache.stats()["entries"] == 1
+    cache.close()
+
+
+def test_least_recently_used_entry_is_evicted_at_capacity():
+    cache = ResponseCache(':memory:', max_entries=2, clock=FakeClock())
+    cache.put("a", "question a")
+    cache.put("b", "question b")
+    assert cache.get("a") == "question a"  # b is now the least recently used
+    cache.put("c", "question c")
+    assert cache.get("b") is None
+    assert cache.get("a") == "question a" and cache.get("c") == "question c"
+    assert cache.evictions == 1 and cache.stats()["entries"] == 2
+    cache.close()
+
+
+def test_fingerprint_changes_with_model_prompt_or_conversation():
+    conversation = "SPEAKER_0: I like your shoes."
+    key = context_fingerprint("gpt-4o-mini", "Ask a question:\n", conversation)
+    # Case, punctuation and spacing don't matter
+    assert context_fingerprint("gpt-4o-mini", "Ask a question:\n", "speaker_0   i like your SHOES") == key
+    assert context_fingerprint("gpt-4o", "Ask a question:\n", conversation) != key
+    assert context_fingerprint("gpt-4o-mini", "Ask two questions:\n", conversation) != key
+    assert context_fingerprint("gpt-4o-mini", "Ask a question:\n", conversation + " Thanks!") != key
+    # Only the most recent window_words words count
+    assert context_fingerprint("m", "t", "one two three", window_words=2) == context_fingerprint("m", "t", "two three")
@@ -0,0 +1,101 @@
+import os
+import tempfile
+
+import pytest
+
+from segment_log import SegmentLog, iter_log, log_path_for, index_path_for
+
+
+def make_segments(count, first=0):
+    return [{"id": f"seg-{i}", "text": f"segment {i}", "speaker": "SPEAKER_0", "start": float(i), "end": i + 0.5}
+            for i in range(first, first + count)]
+
+
+def line_count(log_file):
+    with open(log_file, 'rb') as f:
+        return f.read().count(b'\n')
+
+
+def test_keys_missing_from_the_index_are_recovered_from_the_log():
+    with tempfile.TemporaryDirectory() as tmp:
+        output_file = os.path.join(tmp, 'processed_transcription.json')
+        log = SegmentLog(output_file)
+        log.append(make_segments(10))
+        log.close()
+
+        # Crash after the last three lines were written but before their keys were
+        with open(index_path_for(output_file), 'rb+') as f:
+            f.truncate(7 * 8)
+        reopened = SegmentLog(output_file)
+        assert reopened.segment_count == 10
+        assert reopened.append(make_segments(10)) == []
+        reopened.close()
+        assert line_count(log_path_for(output_file)) == 10
+
+
+def test_index_ahead_of_the_log_is_rebuilt():
+    with tempfile.TemporaryDirectory() as tmp:
+        output_file = os.path.join(tmp, 'processed_transcription.json')
+        log = SegmentLog(output_file)
+        log.append(make_segments(10))
+        log.close()
+
+        # The last two lines were lost while their keys reached the sidecar
+        log_file = log_path_for(output_file)
+        with open(log_file, 'rb') as f:
+            lines = f.readlines()
+        with open(log_file, 'wb') as f:
+            f.writelines(lines[:8])
+        reopened = SegmentLog(output_file)
+        assert reopened.segment_count == 8
+        assert [s["id"] for s in reopened.append(make_segments(10))] == ["seg-8", "seg-9"]
+        reopened.close()
+        assert [s["id"] for s in iter_log(log_file)] == [f"seg-{i}" for i in range(10)]
+
+
+def test_torn_last_line_is_cut_before_appending():
+    with tempfile.TemporaryDirectory() as tmp:
+        output_file = os.path.join(tmp, 'processed_transcription.json')
+        log = SegmentLog(output_file)
+        log.append(make_segments(3))
+        log.close()
+        log_file = log_path_for(output_file)
+        with open(log_file, 'ab') as f:
+            f.write(b'{"id": "seg-3", "te')
+
+        reopened = SegmentLog(output_file)
+        assert [s["id"] for s in reopened.append(make_segments(5))] == ["seg-3", "seg-4"]
+        reopened.close()
+        assert [s["id"] for s in iter_log(log_file)] == [f"seg-{i}" for i in range(5)]
+
+
+class PartialWriteHandle:
+    """Log handle that writes half of the first write and then fails, like a full disk."""
+
+    def __init__(self, handle):
+        self.handle = handle
+
+    def write(self, text):
+        self.handle.write(text[:len(text) // 2])
+        self.handle.flush()
+        raise OSError("No space left on device")
+
+    def __getattr__(self, name):
+        return getattr(self.handle, name)
+
+
+def test_retry_after_a_partial_write_does_not_duplicate_lines():
+    with tempfile.TemporaryDirectory() as tmp:
+        output_file = os.path.join(tmp, 'processed_transcription.json')
+        log = SegmentLog(output_file)
+        log.append(make_segments(2))
+        log._handle = PartialWriteHandle(log._handle)
+        with pytest.raises(OSError):
+            log.append(make_segments(4, first=2))
+        assert log.segment_count == 2
+
+        assert len(log.append(make_segments(6))) == 4
+        log.close()
+        log_file = log_path_for(output_file)
+        assert line_count(log_file) == 6
+        assert [s["id"] for s in iter_log(log_file)] == [f"seg-{i}" for i in range(6)]
@@ -0,0 +1,140 @@
+import json
+import os
+import random
+import shutil
+import tempfile
+
+from segment_merge import SortedIndex, SegmentMerger, merge_segments, INSERTED, REPLACED, UNCHANGED
+from segment_model import Segment
+
+
+def segment(text, start, end=None, id=None, speaker="SPEAKER_0"):
+    return Segment(text, speaker, start, end, id)
+
+
+def test_sorted_index_matches_a_sorted_list():
+    index = SortedIndex()
+    expected = []
+    rng = random.Random(3)
+    for row in range(2000):
+        key = (rng.uniform(0, 100), row)
+        index.add(key)
+        expected.append(key)
+        if rng.random() < 0.3:
+            key = expected.pop(rng.randrange(len(expected)))
+            index.remove(key)
+    expected.sort()
+    assert list(index) == expected
+    assert len(index) == len(expected)
+    assert list(index.irange((50.0, -1))) == [key for key in expected if key >= (50.0, -1)]
+    index.clear()
+    assert list(index) == [] and len(index) == 0
+
+
+def test_revision_is_matched_by_id():
+    merger = SegmentMerger()
+    assert merger.upsert(segment("I like", 1.0, 2.0, id="a"))[:2] == (INSERTED, 0)
+    merger.upsert(segment("Something else", 1.5, 2.5, id="b"))
+    # Same id, even though the text was corrected rather than extended
+    action, row, previous = merger.upsert(segment("I liked your", 1.0, 3.0, id="a"))
+    assert (action, row, previous.text) == (REPLACED, 0, "I like")
+    assert [s.text for s in merger] == ["I liked your", "Something else"]
+
+
+def test_revision_is_matched_by_time_overlap():
+    merger = SegmentMerger()
+    merger.upsert(segment("I like", 10.0, 11.0))
+    merger.upsert(segment("I like", 10.2, 11.0, speaker="SPEAKER_1"))  # Other speaker
+    merger.upsert(segment("I like", 30.0, 31.0))  # Too far away
+    action, row, _previous = merger.upsert(segment("I like your shoes", 10.5, 12.0))
+    assert (action, row) == (REPLACED, 0)
+    # Without end times, start times within overlap_tolerance match
+    merger.upsert(segment("Hello", 50.0))
+    assert merger.upsert(segment("Hello there", 50.8))[:2] == (REPLACED, 3)
+    assert merger.upsert(segment("Hello there again", 52.0))[0] == INSERTED
+    assert len(merger) == 5
+
+
+def test_late_stale_copy_is_unchanged():
+    merger = SegmentMerger()
+    merger.upsert(segment("I like your shoes", 1.0, 3.0, id="a"))
+    action, row, previous = merger.upsert(segment("I like", 1.0, 2.0, id="a"))
+    assert (action, row, previous.text) == (UNCHANGED, 0, "I like your shoes")
+    assert merger.upsert(segment("I like your shoes", 1.0, 3.0))[0] == UNCHANGED
+    assert [s.text for s in merger] == ["I like your shoes"]
+
+
+def test_revision_that_moves_start_is_reindexed():
+    merger = SegmentMerger()
+    merger.upsert(segment("first", 10.0, 11.0))
+    merger.upsert(segment("I like", 20.0, 21.0, id="a"))
+    merger.upsert(segment("later", 30.0, 31.0))
+
+    action, row, previous = merger.upsert(segment("Well, I like your shoes", 5.0, 22.0, id="a"))
+    assert (action, row, previous.text) == (REPLACED, 1, "I like")
+    assert [s.text for s in merger.ordered()] == ["Well, I like your shoes", "first", "later"]
+    # Found again by time overlap at its new start, without the id
+    assert merger.find(segment("Well, I like your shoes, really", 5.0, 23.0)) == 1
+
+
+def test_cleanup_collapses_repeated_segments():
+    # convo_1 starts with the same 00:18:15 segment saved over and over
+    with open(os.path.join('previous_conversations', 'convo_1.json'), encoding='utf-8') as f:
+        segments = json.load(f)
+    repeated = [s for s in segments if s['timestamp'] == '00:18:15']
+    assert len(repeated) > 1
+
+    merged = merge_segments(segments)
+    assert [s for s in merged if s['timestamp'] == '00:18:15'] == repeated[:1]
+    assert merged == merge_segments(merged)
+
+    from cleanup_duplicates import cleanup_duplicates
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        shutil.copy(os.path.join('previous_conversations', 'convo_1.json'),
+                    os.path.join(tmp, 'processed_transcription.json'))
+        os.chdir(tmp)
+        try:
+            cleanup_duplicates()
+            with open('processed_transcription.json', encoding='utf-8') as f:
+                assert json.load(f) == merged
+        finally:
+            os.chdir(cwd)
+
+
+def fired_actions(triggers, texts, segment_id="s1"):
+    """Feed successive versions of one segment through a processor and return the actions it queued."""
+    from webhook import TranscriptionProcessor
+
+    queued = []
+    with tempfile.TemporaryDirectory() as tmp:
+        processor = TranscriptionProcessor(triggers=triggers, data_dir=tmp, write_behind=False)
+        processor.action_executor.submit = lambda action, **kwargs: queued.append(action)
+        for number, text in enumerate(texts):
+            content = {"segments": [{"id": segment_id, "text": text, "speaker": "SPEAKER_0",
+                                     "start": 0, "end": 1 + number}]}
+            processor.handle_payload({"uuid": str(number), "content": json.dumps(content)})
+        processor.close()
+    return queued
+
+
+def liked(context=None):
+    pass
+
+
+def thanked(context=None):
+    pass
+
+
+def test_revision_does_not_fire_a_phrase_again():
+    queued = fired_actions({"I like your": liked, "thank you": thanked},
+                           ["I like your", "I like your shoes", "I like your shoes, thank you"])
+    assert queued == [liked, thanked]
+
+
+def test_late_stale_copy_does_not_fire_again():
+    # The shorter copy differs in punctuation, so it has its own dedup key but is still older than what we have
+    for segment_id in ("s1", None):
+        assert fired_actions({"I like your": liked}, ["I like your", "I like your shoes", "I like your."],
+                             segment_id) == [liked]
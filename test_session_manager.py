@@ -0,0 +1,198 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+
+from ingest_server import IngestServer
+from replay_client import ReplayClient, load_payloads, session_payloads
+from session_manager import SessionManager, session_id_for
+
+
+class RecordingProcessor:
+    """Stand-in session processor that records payloads, optionally held back until a gate opens."""
+
+    def __init__(self, session_id: str, gate: threading.Event = None):
+        self.session_id = session_id
+        self.gate = gate
+        self.handled = []
+        self.changed = threading.Condition()
+        self.closed = False
+
+    def handle_payload(self, payload, segments=None):
+        if self.gate is not None:
+            assert self.gate.wait(10)
+        with self.changed:
+            self.handled.append(json.loads(payload['content'])['segments'][0]['id'])
+            self.changed.notify_all()
+
+    def wait_for(self, count, timeout=10):
+        with self.changed:
+            return self.changed.wait_for(lambda: len(self.handled) >= count, timeout)
+
+    def flush_writes(self, timeout=None):
+        return True
+
+    def close(self):
+        self.closed = True
+
+
+def make_payload(session_id: str, number: int):
+    content = {"session_id": session_id,
+               "segments": [{"id": f"{session_id}-{number}", "text": f"segment {number} of {session_id}",
+                             "speaker": "SPEAKER_1", "start": float(number), "end": number + 1.0}]}
+    return {"uuid": f"{session_id}-{number}", "content": json.dumps(content), "query": {"uid": session_id}}
+
+
+def test_session_id_routing():
+    assert session_id_for(make_payload("abc", 1), "abc") == "abc"
+    assert session_id_for({"content": "{}", "query": {"uid": "device/7"}}) == "device_7"
+    assert session_id_for({"content": "not json"}) == "default"
+
+
+def test_content_is_decoded_once_and_passed_on():
+    received = []
+
+    class SegmentsProcessor(RecordingProcessor):
+        def handle_payload(self, payload, segments=None):
+            received.append((self.session_id, segments))
+
+    manager = SessionManager(SegmentsProcessor)
+    assert manager.submit(make_payload("abc", 1)) == "abc"
+    assert manager.submit({"content": "not json", "query": {"uid": "device/7"}}) == "device_7"
+    manager.shutdown()
+
+    assert [segment.text for segment in received[0][1]] == ["segment 1 of abc"]
+    assert received[1] == ("device_7", None)  # Left for the processor to parse (and report)
+
+
+def test_slow_session_does_not_delay_others():
+    processors = {}
+    gate = threading.Event()
+
+    def factory(session_id):
+        processors[session_id] = RecordingProcessor(session_id, gate if session_id == 'slow' else None)
+        return processors[session_id]
+
+    manager = SessionManager(factory, workers=2, batch_size=2)
+    for number in range(10):
+        manager.submit(make_payload('slow', number))
+        for session_id in ('fast-a', 'fast-b', 'fast-c'):
+            manager.submit(make_payload(session_id, number))
+
+    # The fast sessions finish while the slow one is still stuck on its first payload
+    for session_id in ('fast-a', 'fast-b', 'fast-c'):
+        assert processors[session_id].wait_for(10)
+        assert processors[session_id].handled == [f"{session_id}-{n}" for n in range(10)]
+    assert processors['slow'].handled == []
+    assert manager.acknowledged == 0  # Held back by the slow session's first payload
+    assert not manager.wait_idle(0)
+
+    gate.set()
+    assert manager.wait_idle(10)
+    assert processors['slow'].handled == [f"slow-{n}" for n in range(10)]
+    assert manager.acknowledged == manager.submitted == 40
+
+    manager.shutdown()
+    assert all(processor.closed for processor in processors.values())
+    assert all(stats["processed"] == 10 for stats in manager.stats().values())
+
+
+def test_cursor_is_saved_up_to_the_acknowledged_batch():
+    from collections import deque
+    from webhook import save_acknowledged_cursor
+
+    class CursorFile:
+        saved = None
+
+        def save_cursor(self, cursor=None):
+            self.saved = cursor
+
+    gate = threading.Event()
+    manager = SessionManager(lambda session_id: RecordingProcessor(session_id, gate if session_id == 'slow' else None))
+    fetcher = CursorFile()
+    unsaved = deque()
+
+    manager.submit(make_payload('fast', 0))
+    unsaved.append((manager.submitted, {"sorting": 1}))
+    manager.submit(make_payload('slow', 0))
+    manager.submit(make_payload('fast', 1))
+    unsaved.append((manager.submitted, {"sorting": 3}))
+
+    # Poll until the first batch is acknowledged; the second waits for the slow session
+    deadline = time.monotonic() + 10
+    while fetcher.saved is None and time.monotonic() < deadline:
+        save_acknowledged_cursor(fetcher, manager, unsaved)
+        manager.wait_idle(0.01)
+    assert fetcher.saved == {"sorting": 1}
+    assert len(unsaved) == 1
+
+    gate.set()
+    assert manager.wait_idle(10)
+    save_acknowledged_cursor(fetcher, manager, unsaved)
+    assert fetcher.saved == {"sorting": 3} and not unsaved
+    manager.shutdown()
+
+
+def test_sessions_keep_separate_files():
+    from webhook import TranscriptionProcessor
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            def factory(session_id):
+                data_dir = os.path.join('sessions', session_id)
+                os.makedirs(data_dir)
+                return TranscriptionProcessor(triggers={}, data_dir=data_dir)
+
+            manager = SessionManager(factory)
+            for number in range(3):
+                manager.submit(make_payload('left', number))
+                manager.submit(make_payload('right', number))
+            manager.shutdown()
+
+            for session_id in ('left', 'right'):
+                with open(os.path.join('sessions', session_id, 'processed_transcription.json')) as f:
+                    segments = json.load(f)
+                assert [segment['id'] for segment in segments] == [f"{session_id}-{n}" for n in range(3)]
+        finally:
+            os.chdir(cwd)
+
+
+def test_multi_session_replay_load():
+    processors = {}
+    lock = threading.Lock()
+
+    def factory(session_id):
+        with lock:
+            processors[session_id] = RecordingProcessor(session_id)
+        return processors[session_id]
+
+    manager = SessionManager(factory, workers=4)
+    server = IngestServer(manager.submit, port=0)
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+
+    def serve():
+        loop.run_until_complete(server.start())
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=serve, daemon=True).start()
+    ready.wait()
+
+    recorded = load_payloads('live_transcript.json')
+    payloads = session_payloads(recorded * 5, 8)
+    summary = ReplayClient(f"http://127.0.0.1:{server.port}{server.path}", payloads, connections=4).run()
+    asyncio.run_coroutine_threadsafe(server.stop(), loop).result()
+    assert manager.wait_idle(30)
+    manager.shutdown()
+    print(f"   {summary['requests']} requests over 8 sessions: {summary['requests_per_second']:.0f} req/s, "
+          f"p99 {summary['p99_ms']:.2f} ms")
+
+    assert summary["errors"] == 0
+    assert len(processors) == 8
+    stats = manager.stats()
+    assert all(stats[session_id]["processed"] == len(recorded) * 5 for session_id in processors)
@@ -0,0 +1,67 @@
+import openai
+from context_builder import ConversationContext
+from stub_servers import SSEStubServer
+from tts_worker import TTSWorker
+
+
+class RecordingTTSWorker(TTSWorker):
+    """Headless TTS worker that keeps every utterance it was given."""
+
+    def __init__(self, **options):
+        super().__init__('null', **options)
+        self.utterances = []
+
+    def say(self, text, replace=False):
+        utterance = super().say(text, replace)
+        self.utterances.append(utterance)
+        return utterance
+
+
+def run_with_stub(chunks, **stub_options):
+    """Call hello_world against the stub, recording when each sentence reaches the speaker."""
+    stub = SSEStubServer(chunks, **stub_options)
+    worker = RecordingTTSWorker()
+    saved = (openai.OPENAI_API_URL, openai.tts_worker, openai.STREAM_RESPONSES, openai.USE_RESPONSE_CACHE)
+    openai.OPENAI_API_URL = stub.url
+    openai.tts_worker = worker
+    openai.STREAM_RESPONSES = True
+    openai.USE_RESPONSE_CACHE = False
+    try:
+        context = ConversationContext()
+        context.add("SPEAKER_1", "I like your shoes, where did you get them?")
+        question = openai.hello_world(context=context)
+    finally:
+        openai.OPENAI_API_URL, openai.tts_worker, openai.STREAM_RESPONSES, openai.USE_RESPONSE_CACHE = saved
+        stub.close()
+        worker.close()
+    spoken = [(utterance.text, utterance.started_at) for utterance in worker.utterances]
+    return question, spoken, stub
+
+
+def test_first_sentence_is_spoken_before_stream_ends():
+    chunks = ["Where", " did", " you", " find", " them?", " I", " love", " the", " color", ".",
+              " Were", " they", " a", " gift", "?"]
+    question, spoken, stub = run_with_stub(chunks, chunk_delay=0.05)
+
+    assert stub.requests[0]["stream"] is True
+    assert "SPEAKER_1: I like your shoes" in stub.requests[0]["messages"][0]["content"]
+    assert [text for text, _ in spoken] == ["Where did you find them?", "I love the color.", "Were they a gift?"]
+    assert question == "Where did you find them? I love the color. Were they a gift?"
+
+    # Speech of the first sentence started while the rest was still streaming
+    assert spoken[0][1] < stub.finished_at
+
+
+def test_latency_breakdown_is_recorded():
+    run_with_stub(["Is", " that", " new", "?"], first_token_delay=0.2, chunk_delay=0.01)
+    latency = openai.last_latency
+
+    assert latency["request_to_first_token"] >= 0.2
+    assert latency["first_token_to_first_audio"] >= 0
+    assert latency["request_to_first_audio"] >= latency["request_to_first_token"]
+    assert latency["total"] >= latency["request_to_first_audio"]
+
+
+def test_sentence_splitting():
+    chunks = ["Hi", " there", ". How", " are you?", ' She said "wow."', " Done"]
+    assert list(openai.iter_sentences(chunks)) == ["Hi there.", "How are you?", 'She said "wow."', "Done"]
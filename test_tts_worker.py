@@ -0,0 +1,67 @@
+import os
+import tempfile
+import wave
+
+import pytest
+
+from tts_worker import TTSWorker
+
+
+def test_utterances_are_spoken_in_order():
+    worker = TTSWorker('null', seconds_per_word=0.01)
+    try:
+        utterances = [worker.say(f"sentence number {n}") for n in range(5)]
+        assert utterances[-1].wait(5)
+        assert all(utterance.done.is_set() and not utterance.interrupted for utterance in utterances)
+        starts = [utterance.started_at for utterance in utterances]
+        assert starts == sorted(starts)
+        assert worker.pending() == 0
+    finally:
+        worker.close()
+
+
+def test_newer_question_replaces_speech_in_progress():
+    worker = TTSWorker('null', seconds_per_word=0.5)
+    try:
+        old = worker.say("an older question that would take a good while to read out")
+        queued = worker.say("and its second sentence")
+        assert old.started.wait(5)
+        new = worker.say("Where?", replace=True)
+        assert new.wait(5)
+        assert old.interrupted and queued.interrupted and not new.interrupted
+        assert old.finished_at - old.started_at < 1.0  # Cut off, not the ~6s it would have taken
+        assert not queued.started_at
+
+        worker.say("one two three four")  # Dropped or cut off by the interrupt
+        worker.interrupt()
+        assert worker.say("after").wait(5)
+    finally:
+        worker.close()
+
+
+def test_wav_cache_replays_repeated_phrases():
+    with tempfile.TemporaryDirectory() as cache_dir:
+        worker = TTSWorker('null', cache_dir=cache_dir, seconds_per_word=0.01)
+        try:
+            first = worker.say("Is that jacket new?")
+            repeat = worker.say("Is that jacket new?")
+            other = worker.say("Where is it from?")
+            assert other.wait(5)
+            assert (first.cached, repeat.cached, other.cached) == (False, True, False)
+        finally:
+            worker.close()
+
+        files = sorted(os.listdir(cache_dir))
+        assert len(files) == 2 and all(name.endswith('.wav') for name in files)
+        with wave.open(os.path.join(cache_dir, files[0]), 'rb') as f:
+            assert f.getnframes() > 0
+
+
+def test_unknown_backend_and_closed_worker():
+    with pytest.raises(ValueError):
+        TTSWorker('festival')
+    worker = TTSWorker('null')
+    worker.close()
+    assert worker.process.poll() is not None
+    with pytest.raises(RuntimeError):
+        worker.say("too late")
@@ -0,0 +1,68 @@
+import json
+import tempfile
+
+from segment_model import Segment
+from turn_aggregator import TurnAggregator
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def segment(speaker, start, end, text):
+    return Segment(text, speaker, float(start), float(end))
+
+
+def test_turns_close_on_speaker_change_and_long_pause():
+    turns = TurnAggregator(max_gap=1.0)
+    assert turns.add(segment("SPEAKER_0", 0, 1, "Hi there,")) == []
+    assert turns.add(segment("SPEAKER_0", 1.2, 2, "how are you?")) == []
+    [first] = turns.add(segment("SPEAKER_1", 2.1, 3, "Good."))
+    assert (first.speaker, first.text, first.start, first.end) == ("SPEAKER_0", "Hi there, how are you?", 0, 2)
+    assert first.segment_count == 2
+
+    [second] = turns.add(segment("SPEAKER_1", 6, 7, "Anyway..."))  # Same speaker, but after a long pause
+    assert second.text == "Good." and not turns.open_turn.continues
+    assert turns.revise("Anyway...", segment("SPEAKER_1", 6, 7.5, "Anyway, lunch?"))
+    assert [turn.text for turn in turns.flush()] == ["Anyway, lunch?"]
+    assert turns.flush() == []
+
+
+def test_idle_timeout_flushes_and_next_segment_continues():
+    clock = FakeClock()
+    turns = TurnAggregator(max_gap=1.0, timeout=3.0, clock=clock)
+    turns.add(segment("SPEAKER_0", 0, 1, "So I was"))
+    clock.now = 2.0
+    assert turns.poll() == []
+    clock.now = 5.5
+    [turn] = turns.poll()
+    assert turn.text == "So I was"
+
+    turns.add(segment("SPEAKER_0", 1.5, 2, "thinking"))
+    assert turns.open_turn.continues  # Closed early, so the context joins it to the previous turn
+
+
+def test_processor_feeds_turns_to_context():
+    from webhook import TranscriptionProcessor
+
+    fired = []
+
+    def action(context=None):
+        fired.append(context.render())
+
+    segments = [("SPEAKER_0", 0, 1, "Hey,"), ("SPEAKER_0", 1.1, 2, "nice jacket."),
+                ("SPEAKER_1", 2.5, 3, "Thanks!"), ("SPEAKER_0", 3.2, 4, "I like your"), ("SPEAKER_0", 4, 5, "shoes")]
+    with tempfile.TemporaryDirectory() as tmp:
+        processor = TranscriptionProcessor(triggers={"I like your shoes": action}, data_dir=tmp, write_behind=False)
+        for number, (speaker, start, end, text) in enumerate(segments):
+            content = {"segments": [{"id": f"s{number}", "text": text, "speaker": speaker,
+                                     "start": start, "end": end}]}
+            processor.handle_payload({"uuid": str(number), "content": json.dumps(content)})
+        processor.action_executor.shutdown(wait=True)
+        processor.close()
+
+    assert fired == ["SPEAKER_0: Hey, nice jacket.\nSPEAKER_1: Thanks!\nSPEAKER_0: I like your shoes"]
@@ -0,0 +1,125 @@
+import os
+import tempfile
+
+import pytest
+import requests
+
+from stub_servers import FakeWebhookSite, make_fetcher
+
+def test_first_fetch_returns_only_latest():
+    fake = FakeWebhookSite()
+    try:
+        fake.inject(5)
+        fetcher = make_fetcher(fake)
+        batch = fetcher.fetch_new_requests()
+        assert [r['uuid'] for r in batch] == ["req-00004"]
+        assert fetcher.fetch_new_requests() == []
+        fetcher.close()
+    finally:
+        fake.close()
+
+
+def test_burst_is_fetched_in_one_batch_without_gaps():
+    fake = FakeWebhookSite()
+    try:
+        fake.inject(1)
+        fetcher = make_fetcher(fake)
+        fetcher.fetch_new_requests()
+
+        # A burst bigger than several pages arrives between two polls
+        fake.inject(120)
+        batch = fetcher.fetch_new_requests()
+        assert [r['uuid'] for r in batch] == [f"req-{i:05d}" for i in range(1, 121)]
+
+        fake.inject(3)
+        assert [r['uuid'] for r in fetcher.fetch_new_requests()] == ["req-00121", "req-00122", "req-00123"]
+        assert fetcher.fetch_new_requests() == []
+        fetcher.close()
+    finally:
+        fake.close()
+
+
+def test_same_second_requests_without_sorting():
+    fake = FakeWebhookSite()
+    try:
+        fake.inject(1, with_sorting=False)
+        fetcher = make_fetcher(fake)
+        fetcher.fetch_new_requests()
+
+        fake.inject(40, same_second=True, with_sorting=False)
+        batch = fetcher.fetch_new_requests()
+        assert len(batch) == 40
+        assert len({r['uuid'] for r in batch}) == 40
+
+        fake.inject(2, same_second=True, with_sorting=False)
+        assert len(fetcher.fetch_new_requests()) == 2
+        fetcher.close()
+    finally:
+        fake.close()
+
+
+def test_connection_is_reused_across_polls():
+    fake = FakeWebhookSite()
+    try:
+        fake.inject(1)
+        fetcher = make_fetcher(fake)
+        for _ in range(10):
+            fake.inject(30)
+            fetcher.fetch_new_requests()
+        assert fake.calls > 10
+        assert len(fake.connections) == 1
+        fetcher.close()
+    finally:
+        fake.close()
+
+
+def test_failed_page_keeps_the_cursor():
+    fake = FakeWebhookSite()
+    try:
+        fake.inject(1)
+        fetcher = make_fetcher(fake)
+        fetcher.fetch_new_requests()
+        cursor = dict(fetcher.cursor)
+
+        # Page 1 of the burst is served, then the next GET (page 2) is rate limited
+        fake.inject(60)
+        serve_page = fake.page
+
+        def serve_then_fail(query):
+            fake.failures.append((429, {"Retry-After": "1"}))
+            return serve_page(query)
+
+        fake.page = serve_then_fail
+        with pytest.raises(requests.HTTPError) as raised:
+            fetcher.fetch_new_requests()
+        assert raised.value.response.status_code == 429
+        assert fetcher.cursor == cursor
+
+        # The next poll returns the whole burst, including page 1
+        fake.page = serve_page
+        assert [r['uuid'] for r in fetcher.fetch_new_requests()] == [f"req-{i:05d}" for i in range(1, 61)]
+        fetcher.close()
+    finally:
+        fake.close()
+
+
+def test_cursor_survives_restart():
+    fake = FakeWebhookSite()
+    with tempfile.TemporaryDirectory() as tmp:
+        cursor_file = os.path.join(tmp, 'webhook_cursor.json')
+        try:
+            fake.inject(1)
+            fetcher = make_fetcher(fake, cursor_file)
+            fetcher.fetch_new_requests()
+            fake.inject(10)
+            fetcher.fetch_new_requests()
+            fetcher.save_cursor()
+            fetcher.close()
+
+            # Requests that arrive while the listener is down are caught up on restart
+            fake.inject(7)
+            restarted = make_fetcher(fake, cursor_file)
+            assert [r['uuid'] for r in restarted.fetch_new_requests()] == [f"req-{i:05d}" for i in range(11, 18)]
+            restarted.close()
+        finally:
+            fake.close()
@@ -0,0 +1,240 @@
+import re
+from collections import deque, namedtuple
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Words are runs of letters/digits, optionally joined by apostrophes ("you're", "don't")
+TOKEN_PATTERN = re.compile(r"[^\W_]+(?:'[^\W_]+)*")
+
+TriggerMatch = namedtuple('TriggerMatch', ['phrase', 'action', 'start', 'end'])
+
+
+def normalize_tokens(text: str) -> List[str]:
+    """
+    Split text into normalized word tokens.
+
+    Lowercases the text, folds curly apostrophes to straight ones and drops
+    punctuation, so "I like YOUR..." and "i like your" produce the same tokens.
+
+    Args:
+        text: Raw segment text
+
+    Returns:
+        List of lowercase word tokens
+    """
+    return TOKEN_PATTERN.findall(text.lower().replace('’', "'"))
+
+
+class TriggerEngine:
+    """
+    Matches many trigger phrases against segment text in a single pass.
+
+    Phrases are compiled once into an Aho-Corasick automaton over word tokens
+    (not characters), so every match falls on word boundaries and the cost of
+    a match is linear in the length of the text, no matter how many phrases
+    are registered. Overlapping phrases ("i like" and "i like your") are all
+    reported.
+    """
+
+    def __init__(self, triggers: Dict[str, Callable] = None):
+        """
+        Args:
+            triggers: Mapping of trigger phrase -> action to run when it is heard
+        """
+        self.phrases = []  # Pattern index -> original phrase
+        self.actions = []  # Pattern index -> action
+        self.lengths = []  # Pattern index -> phrase length in tokens
+
+        self._goto = [{}]
+        self._fail = [0]
+        self._terminal = [[]]  # Phrases ending exactly at each state
+        self._output = [[]]  # Phrases ending at each state, including suffix matches
+        self._compiled = True
+
+        for phrase, action in (triggers or {}).items():
+            self.add(phrase, action)
+        self.compile()
+
+    def __len__(self) -> int:
+        return len(self.phrases)
+
+    def add(self, phrase: str, action: Optional[Callable] = None) -> None:
+        """
+        Register a trigger phrase. Call compile() once all phrases are added.
+
+        Args:
+            phrase: Phrase to listen for (case and punctuation are ignored)
+            action: Callable to run when the phrase is heard
+        """
+        tokens = normalize_tokens(phrase)
+        if not tokens:
+            raise ValueError(f"Trigger phrase has no words: {phrase!r}")
+
+        node = 0
+        for token in tokens:
+            next_node = self._goto[node].get(token)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][token] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._terminal.append([])
+                self._output.append([])
+            node = next_node
+
+        self._terminal[node].append(len(self.phrases))
+        self.phrases.append(phrase)
+        self.actions.append(action)
+        self.lengths.append(len(tokens))
+        self._compiled = False
+
+    def compile(self) -> None:
+        """Build the failure links (breadth-first over the phrase trie)."""
+        self._output[0] = self._terminal[0]
+        queue = deque()
+        for child in self._goto[0].values():
+            self._fail[child] = 0
+            self._output[child] = self._terminal[child]
+            queue.append(child)
+
+        while queue:
+            node = queue.popleft()
+            for token, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(token, 0)
+                # Inherit phrases that end at the fallback state (suffix matches)
+                self._output[child] = self._terminal[child] + self._output[self._fail[child]]
+
+        self._compiled = True
+
+    def step(self, state: int, token: str) -> Tuple[int, List[int]]:
+        """
+        Advance the automaton by one token.
+
+        The state is a plain int, so callers can carry it from one call to the next.
+
+        Args:
+            state: Current automaton state (0 is the start state)
+            token: Next normalized token
+
+        Returns:
+            (new state, indices of the phrases that end at this token)
+        """
+        goto = self._goto
+        while state and token not in goto[state]:
+            state = self._fail[state]
+        state = goto[state].get(token, 0)
+        return state, self._output[state]
+
+    def match(self, text: str) -> List[TriggerMatch]:
+        """
+        Find every trigger phrase in the text.
+
+        Args:
+            text: Segment text
+
+        Returns:
+            Matches in the order they end in the text; start/end are token offsets
+        """
+        if not self._compiled:
+            self.compile()
+
+        matches = []
+        state = 0
+        for position, token in enumerate(normalize_tokens(text)):
+            state, found = self.step(state, token)
+            for index in found:
+                matches.append(TriggerMatch(self.phrases[index], self.actions[index],
+                                            position + 1 - self.lengths[index], position + 1))
+        return matches
+
+
+class _SpeakerStream:
+    """Rolling match state for one speaker."""
+    __slots__ = ('state', 'tail', 'recent')
+
+    def __init__(self, tail_size: int, recent_size: int):
+        self.state = 0
+        self.tail = deque(maxlen=tail_size)
+        self.recent = deque(maxlen=recent_size)
+
+
+class StreamingMatcher:
+    """
+    Matches trigger phrases that Omi splits across consecutive segments.
+
+    Each speaker's words are treated as one continuous stream: the automaton
+    state of a TriggerEngine is carried from one segment to the next, so
+    "I like" followed by "your shoes" is matched without re-joining the
+    transcript. Only matches that start in an earlier segment are reported,
+    since matches inside a single segment are already caught per segment.
+    Memory per speaker is constant: the automaton state, a tail of at most
+    (longest phrase - 1) tokens kept for context, and the keys of the last
+    few segments (so re-sent segments aren't fed twice).
+    """
+
+    def __init__(self, engine: TriggerEngine, recent_size: int = 16):
+        """
+        Args:
+            engine: Compiled trigger engine to run
+            recent_size: Recent segment keys remembered per speaker to skip re-sent segments
+        """
+        self.engine = engine
+        self.recent_size = recent_size
+        self._streams = {}
+
+    def feed(self, speaker: str, text: str, key: Optional[object] = None) -> List[TriggerMatch]:
+        """
+        Append a segment to the speaker's stream and report phrases completed across a boundary.
+
+        Args:
+            speaker: Speaker label (e.g. SPEAKER_1)
+            text: Segment text
+            key: Optional identity of the segment (e.g. its dedup key); repeats are ignored
+
+        Returns:
+            Matches that began in an earlier segment; start is negative (tokens before this segment)
+        """
+        stream = self._streams.get(speaker)
+        if stream is None:
+            tail_size = max(self.engine.lengths, default=1)
+            stream = self._streams[speaker] = _SpeakerStream(tail_size, self.recent_size)
+
+        if key is not None:
+            if key in stream.recent:
+                return []
+            stream.recent.append(key)
+
+        engine = self.engine
+        matches = []
+        state = stream.state
+        tokens = normalize_tokens(text)
+        for position, token in enumerate(tokens):
+            state, found = engine.step(state, token)
+            for index in found:
+                start = position + 1 - engine.lengths[index]
+                if start < 0:
+                    matches.append(TriggerMatch(engine.phrases[index], engine.actions[index],
+                                                start, position + 1))
+        stream.state = state
+        stream.tail.extend(tokens)
+        return matches
+
+    def context(self, speaker: str) -> str:
+        """Return the last few normalized tokens heard from a speaker."""
+        stream = self._streams.get(speaker)
+        return " ".join(stream.tail) if stream else ""
+
+    def reset(self, speaker: str = None) -> None:
+        """
+        Forget the rolling state for one speaker, or for everyone.
+
+        Args:
+            speaker: Speaker to reset (all speakers when None)
+        """
+        if speaker is None:
+            self._streams.clear()
+        else:
+            self._streams.pop(speaker, None)
@@ -0,0 +1,488 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import wave
+from collections import deque
+from typing import Any, Dict, List, Optional, TextIO
+
+from metrics import metrics
+
+try:
+    import simpleaudio
+except ImportError:
+    simpleaudio = None
+
+# Command-line WAV players used when simpleaudio isn't installed (macOS, ALSA, PulseAudio)
+WAV_PLAYERS = ('afplay', 'aplay', 'paplay')
+
+
+def play_wav(path: str, interrupted: threading.Event) -> None:
+    """
+    Play a WAV file, stopping early if interrupted is set.
+
+    Args:
+        path: WAV file
+        interrupted: Set to cut playback off
+    """
+    if simpleaudio is not None:
+        playing = simpleaudio.WaveObject.from_wave_file(path).play()
+        while playing.is_playing():
+            if interrupted.wait(0.02):
+                playing.stop()
+        return
+
+    player = wav_player()
+    process = subprocess.Popen([player, path], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    while process.poll() is None:
+        if interrupted.wait(0.02):
+            process.terminate()
+    process.wait()
+
+
+def wav_player() -> Optional[str]:
+    """Find a way to play WAV files ('simpleaudio', a player command, or None)."""
+    if simpleaudio is not None:
+        return 'simpleaudio'
+    for player in WAV_PLAYERS:
+        if shutil.which(player):
+            return player
+    return None
+
+
+class Pyttsx3Backend:
+    """
+    Speaks through pyttsx3 (the platform's TTS engine).
+
+    The engine is created once by warm_up() and reused for every utterance.
+    A 'started-word' callback stops it mid-utterance when interrupted is
+    set. Rendered WAV files are played with simpleaudio or a player command,
+    so the WAV cache is only used when one of them is available.
+    """
+
+    def __init__(self, rate: Optional[int] = None, voice: Optional[str] = None):
+        """
+        Args:
+            rate: Speaking rate in words per minute (engine default if None)
+            voice: Voice id (engine default if None)
+        """
+        self.rate = rate
+        self.voice = voice
+        self.engine = None
+        self.interrupted = None
+        self.can_play = wav_player() is not None
+
+    @property
+    def cache_namespace(self) -> str:
+        """Settings that change the rendered audio, so they are part of the WAV cache key."""
+        return f"pyttsx3:{self.voice}:{self.rate}"
+
+    def warm_up(self) -> None:
+        import pyttsx3
+
+        self.engine = pyttsx3.init()
+        if self.rate is not None:
+            self.engine.setProperty('rate', self.rate)
+        if self.voice is not None:
+            self.engine.setProperty('voice', self.voice)
+        self.engine.connect('started-word', self._on_word)
+        self.engine.runAndWait()  # Start the driver's loop once so the first utterance doesn't pay for it
+
+    def _on_word(self, name, location, length) -> None:
+        if self.interrupted is not None and self.interrupted.is_set():
+            self.engine.stop()
+
+    def speak(self, text: str, interrupted: threading.Event) -> None:
+        self.interrupted = interrupted
+        try:
+            self.engine.say(text)
+            self.engine.runAndWait()
+        finally:
+            self.interrupted = None
+
+    def render(self, text: str, path: str) -> None:
+        self.engine.save_to_file(text, path)
+        self.engine.runAndWait()
+
+    def play(self, path: str, interrupted: threading.Event) -> None:
+        play_wav(path, interrupted)
+
+
+class NullBackend:
+    """
+    Speaks nothing, for running headless and in tests.
+
+    Each utterance takes seconds_per_utterance plus seconds_per_word per
+    word (both 0 by default), so interrupting and replacing speech can
+    still be exercised. Rendered files are valid WAVs of silence of the
+    same length.
+    """
+
+    SAMPLE_RATE = 8000
+
+    def __init__(self, seconds_per_word: float = 0.0, seconds_per_utterance: float = 0.0):
+        """
+        Args:
+            seconds_per_word: How long each word "takes to say"
+            seconds_per_utterance: Fixed time added to every utterance
+        """
+        self.seconds_per_word = seconds_per_word
+        self.seconds_per_utterance = seconds_per_utterance
+        self.can_play = True
+        self.cache_namespace = 'null'
+
+    def warm_up(self) -> None:
+        pass
+
+    def _duration(self, text: str) -> float:
+        return self.seconds_per_utterance + len(text.split()) * self.seconds_per_word
+
+    def speak(self, text: str, interrupted: threading.Event) -> None:
+        interrupted.wait(self._duration(text))
+
+    def render(self, text: str, path: str) -> None:
+        with wave.open(path, 'wb') as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(self.SAMPLE_RATE)
+            f.writeframes(b'\0\0' * int(self._duration(text) * self.SAMPLE_RATE))
+
+    def play(self, path: str, interrupted: threading.Event) -> None:
+        with wave.open(path, 'rb') as f:
+            duration = f.getnframes() / f.getframerate()
+        interrupted.wait(duration)
+
+
+BACKENDS = {
+    'pyttsx3': Pyttsx3Backend,
+    'null': NullBackend,
+}
+
+
+class WavCache:
+    """
+    Rendered utterances on disk, keyed by text and the backend's voice settings.
+
+    A cached utterance is replayed from its file instead of being
+    synthesized again. Files are rendered to a temporary name and moved into
+    place, so a crash never leaves a partial WAV behind.
+    """
+
+    def __init__(self, cache_dir: str, namespace: str = ''):
+        """
+        Args:
+            cache_dir: Directory the WAV files are kept in
+            namespace: Backend settings that change the audio (see cache_namespace)
+        """
+        self.cache_dir = cache_dir
+        self.namespace = namespace
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def path(self, text: str) -> str:
+        digest = hashlib.sha256(f"{self.namespace}\0{text}".encode('utf-8')).hexdigest()[:32]
+        return os.path.join(self.cache_dir, f"{digest}.wav")
+
+    def speak(self, backend, text: str, interrupted: threading.Event) -> bool:
+        """
+        Play text from the cache, rendering it first if it isn't there yet.
+
+        Returns:
+            True if it was already cached
+        """
+        path = self.path(text)
+        cached = os.path.exists(path)
+        if not cached:
+            tmp_file = f"{path}.tmp.wav"
+            backend.render(text, tmp_file)
+            os.replace(tmp_file, path)
+        if not interrupted.is_set():
+            backend.play(path, interrupted)
+        return cached
+
+
+def run_worker(backend_name: str, backend_options: Dict[str, Any], cache_dir: Optional[str],
+               commands: TextIO, events: TextIO) -> None:
+    """
+    Body of the TTS process: warm up the backend, then speak queued utterances one at a time.
+
+    Commands and events are JSON lists, one per line:
+    ["say", id, text, replace], ["interrupt"] and ["close"] come in;
+    ["ready"], ["error", message], ["started", id], ["done", id, interrupted, cached] and ["exit"] go out.
+    """
+    events_lock = threading.Lock()
+
+    def send(*event):
+        with events_lock:
+            events.write(json.dumps(event) + "\n")
+            events.flush()
+
+    try:
+        backend = BACKENDS[backend_name](**backend_options)
+        backend.warm_up()
+        cache = None
+        if cache_dir:
+            if backend.can_play:
+                cache = WavCache(cache_dir, backend.cache_namespace)
+            else:
+                print(f"No way to play WAV files (install simpleaudio or one of {', '.join(WAV_PLAYERS)}), "
+                      f"speaking without the TTS cache")
+    except Exception as e:
+        send('error', f"{type(e).__name__}: {e}")
+        return
+
+    pending = deque()  # (utterance id, text)
+    condition = threading.Condition()
+    interrupted = threading.Event()  # Cuts the current utterance off
+    closing = []
+
+    def drop_pending():
+        interrupted.set()
+        for dropped, _ in pending:
+            send('done', dropped, True, False)
+        pending.clear()
+
+    def receive():
+        for line in commands:
+            command = json.loads(line)
+            with condition:
+                if command[0] == 'interrupt' or (command[0] == 'say' and command[3]):
+                    drop_pending()
+                if command[0] == 'say':
+                    pending.append((command[1], command[2]))
+                elif command[0] == 'close':
+                    closing.append(True)
+                    condition.notify()
+                    return
+                condition.notify()
+        with condition:
+            drop_pending()  # The parent went away
+            closing.append(True)
+            condition.notify()
+
+    threading.Thread(target=receive, name='tts-receive', daemon=True).start()
+    send('ready')
+
+    while True:
+        with condition:
+            condition.wait_for(lambda: pending or closing)
+            if not pending:
+                send('exit')
+                return
+            utterance_id, text = pending.popleft()
+            interrupted.clear()
+        send('started', utterance_id)
+        cached = False
+        try:
+            if cache is not None:
+                cached = cache.speak(backend, text, interrupted)
+            else:
+                backend.speak(text, interrupted)
+        except Exception as e:
+            print(f"Error speaking text: {e}")
+        send('done', utterance_id, interrupted.is_set(), cached)
+
+
+class Utterance:
+    """One queued piece of speech, with events for when it starts and ends."""
+
+    def __init__(self, utterance_id: int, text: str):
+        self.id = utterance_id
+        self.text = text
+        self.started = threading.Event()
+        self.done = threading.Event()
+        self.started_at = None  # perf_counter() times, as seen by this process
+        self.finished_at = None
+        self.interrupted = False  # Cut off (or dropped before it started) by a newer utterance
+        self.cached = False  # Replayed from the WAV cache
+
+    def wait(self, timeout: float = None) -> bool:
+        """Wait until the utterance has finished (or was interrupted)."""
+        return self.done.wait(timeout)
+
+
+class TTSWorker:
+    """
+    Speech in a dedicated process that is started and warmed up once.
+
+    pyttsx3 isn't thread-safe and runAndWait() blocks, so the engine lives
+    in its own process (python tts_worker.py), created once, and every
+    utterance is sent to it over its stdin. say() returns immediately with
+    an Utterance to wait on. Utterances are spoken in order;
+    say(replace=True) (or interrupt()) drops everything still queued and
+    cuts off the one being spoken, so a newer question isn't stuck behind an
+    older one.
+
+    With cache_dir, utterances are rendered to WAV files keyed by their text
+    and repeated phrases are replayed without synthesizing them again.
+    """
+
+    def __init__(self, backend: str = 'pyttsx3', cache_dir: Optional[str] = None, start_timeout: float = 30.0,
+                 **backend_options):
+        """
+        Args:
+            backend: 'pyttsx3', or 'null' to speak nothing (headless, tests)
+            cache_dir: Directory for the WAV cache (no caching if None)
+            start_timeout: Seconds to wait for the process to warm up
+            backend_options: Passed to the backend (e.g. rate/voice, seconds_per_word)
+
+        Raises:
+            ValueError: If the backend is unknown
+            RuntimeError: If the backend can't be started
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown TTS backend {backend!r} (expected one of {', '.join(BACKENDS)})")
+        self.backend = backend
+        self.cache_dir = cache_dir
+
+        self._utterances = {}  # Not finished yet, by id
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._closed = False
+        self._ready = threading.Event()
+        self._error = None
+
+        # A fresh interpreter rather than a fork: speech engines hold platform handles that don't survive a fork,
+        # and multiprocessing's spawn would re-run the calling script
+        command = [sys.executable, os.path.abspath(__file__), backend, '--options', json.dumps(backend_options)]
+        if cache_dir:
+            command += ['--cache-dir', cache_dir]
+        started_at = time.perf_counter()
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        text=True, encoding='utf-8', bufsize=1)
+        self._listener = threading.Thread(target=self._listen, name='tts-events', daemon=True)
+        self._listener.start()
+        if not self._ready.wait(start_timeout) or self._error:
+            self.process.kill()
+            self.process.wait()
+            raise RuntimeError(f"TTS worker ({backend}) failed to start: "
+                               f"{self._error or f'not ready after {start_timeout:g}s'}")
+        metrics.observe('tts_warm_up', time.perf_counter() - started_at)
+
+    def _send(self, *command) -> None:
+        try:
+            self.process.stdin.write(json.dumps(command) + "\n")
+            self.process.stdin.flush()
+        except (BrokenPipeError, ValueError, OSError):
+            pass  # The worker exited; the listener finishes its utterances
+
+    def say(self, text: str, replace: bool = False) -> Utterance:
+        """
+        Queue text to be spoken.
+
+        Args:
+            text: Text to speak
+            replace: Cut off whatever is being spoken or still queued first
+
+        Returns:
+            The Utterance (its started/done events are set as the worker reports back)
+        """
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("TTS worker is closed")
+            utterance = Utterance(self._next_id, text)
+            self._next_id += 1
+            self._utterances[utterance.id] = utterance
+            self._send('say', utterance.id, text, replace)
+        return utterance
+
+    def interrupt(self) -> None:
+        """Stop the utterance being spoken and drop the queued ones."""
+        with self._lock:
+            if not self._closed:
+                self._send('interrupt')
+
+    def pending(self) -> int:
+        """Utterances queued or being spoken."""
+        with self._lock:
+            return len(self._utterances)
+
+    def _listen(self) -> None:
+        for line in self.process.stdout:
+            event = json.loads(line)
+            if event[0] == 'ready':
+                self._ready.set()
+            elif event[0] == 'error':
+                self._error = event[1]
+                self._ready.set()
+            elif event[0] == 'started':
+                utterance = self._utterances.get(event[1])
+                if utterance is not None:
+                    utterance.started_at = time.perf_counter()
+                    utterance.started.set()
+            elif event[0] == 'done':
+                with self._lock:
+                    utterance = self._utterances.pop(event[1], None)
+                if utterance is not None:
+                    self._finish(utterance, interrupted=event[2], cached=event[3])
+            elif event[0] == 'exit':
+                break
+
+        # Nothing more will be spoken; don't leave callers waiting
+        with self._lock:
+            unfinished = list(self._utterances.values())
+            self._utterances.clear()
+            unexpected = not self._closed and self._ready.is_set() and not self._error
+        for utterance in unfinished:
+            self._finish(utterance, interrupted=True, cached=False)
+        if unexpected:
+            print(f"TTS worker exited unexpectedly (exit code {self.process.wait()})")
+        self._ready.set()
+
+    def _finish(self, utterance: Utterance, interrupted: bool, cached: bool) -> None:
+        utterance.finished_at = time.perf_counter()
+        utterance.interrupted = interrupted
+        utterance.cached = cached
+        if utterance.started_at is not None:
+            metrics.observe('tts', utterance.finished_at - utterance.started_at)
+        if interrupted:
+            metrics.count('tts_interrupted')
+        if cached:
+            metrics.count('tts_cache_hits')
+        utterance.started.set()
+        utterance.done.set()
+
+    def close(self, wait: bool = True, timeout: float = 10.0) -> None:
+        """
+        Stop the worker process.
+
+        Args:
+            wait: Finish the queued utterances first (otherwise they are cut off)
+            timeout: Longest time to wait for the process to exit
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            if not wait:
+                self._send('interrupt')
+            self._send('close')
+        try:
+            self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self._listener.join(timeout)
+        self.process.stdin.close()
+        self.process.stdout.close()
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="TTS worker process (started by TTSWorker)")
+    parser.add_argument('backend', choices=sorted(BACKENDS))
+    parser.add_argument('--options', default='{}', help="Backend options as JSON")
+    parser.add_argument('--cache-dir', help="WAV cache directory")
+    args = parser.parse_args(argv)
+
+    # stdout carries the events; anything printed goes to stderr
+    events = sys.stdout
+    sys.stdout = sys.stderr
+    run_worker(args.backend, json.loads(args.options), args.cache_dir, sys.stdin, events)
+
+
+if __name__ == "__main__":
+    main()
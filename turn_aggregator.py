@@ -0,0 +1,146 @@
+import time
+from typing import Callable, List, Optional
+
+from segment_model import Segment, format_timestamp
+
+
+class Turn:
+    """
+    Consecutive segments from one speaker, joined into what they said in one go.
+
+    continues is set when the previous turn from the same speaker was only
+    closed early (by a flush or the idle timeout), so the two can still be
+    read as one turn.
+    """
+
+    __slots__ = ('speaker', 'start', 'end', 'texts', 'continues')
+
+    def __init__(self, segment: Segment, continues: bool = False):
+        self.speaker = segment.speaker
+        self.start = segment.start
+        self.end = segment.end if segment.end is not None else segment.start
+        self.texts = [segment.text]
+        self.continues = continues
+
+    @property
+    def text(self) -> str:
+        return " ".join(text for text in self.texts if text)
+
+    @property
+    def segment_count(self) -> int:
+        return len(self.texts)
+
+    def __str__(self) -> str:
+        return f"[{format_timestamp(self.start)}] {self.speaker}: {self.text}"
+
+    def __repr__(self) -> str:
+        return f"Turn({self.speaker!r}, {self.start:g}-{self.end:g}, {self.segment_count} segment(s))"
+
+
+class TurnAggregator:
+    """
+    Streams segments in and speaker turns out.
+
+    Omi sends short fragments, so a sentence usually arrives as several
+    segments. add() extends the open turn while the same speaker keeps
+    talking with no more than max_gap seconds between the end of one
+    segment and the start of the next, and closes it when the speaker
+    changes or pauses longer. A turn is also closed once no segment has
+    arrived for timeout seconds (checked by poll()), so the last thing said
+    doesn't wait for the next speaker. Closed turns are returned as soon as
+    they are complete.
+
+    Not thread-safe: it is fed from the processor's ingest thread.
+    """
+
+    def __init__(self, max_gap: float = 2.0, timeout: float = 5.0, clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            max_gap: Longest pause (seconds of recording) inside one turn
+            timeout: Seconds without a new segment after which the open turn is closed
+            clock: Time source for the timeout
+        """
+        self.max_gap = max_gap
+        self.timeout = timeout
+        self.clock = clock
+        self.open_turn: Optional[Turn] = None
+        self._last_added = 0.0
+        self._flushed: Optional[Turn] = None  # Turn closed early, which the next one may continue
+
+    def add(self, segment: Segment) -> List[Turn]:
+        """
+        Add the next segment.
+
+        Args:
+            segment: New segment (text, speaker, start/end)
+
+        Returns:
+            Turns this segment closed (the previous one on a speaker change or a long pause)
+        """
+        closed = []
+        turn = self.open_turn
+        if self._continues(turn, segment):
+            turn.texts.append(segment.text)
+            turn.end = max(turn.end, segment.end if segment.end is not None else segment.start)
+        else:
+            if turn is not None:
+                closed.append(turn)
+            self.open_turn = Turn(segment, turn is None and self._continues(self._flushed, segment))
+            self._flushed = None
+        self._last_added = self.clock()
+        return closed
+
+    def _continues(self, turn: Optional[Turn], segment: Segment) -> bool:
+        return turn is not None and turn.speaker == segment.speaker and segment.start - turn.end <= self.max_gap
+
+    def revise(self, old_text: str, segment: Segment) -> bool:
+        """
+        Replace the text of a segment in the open turn that Omi revised.
+
+        Args:
+            old_text: Text the segment was added with
+            segment: Revised segment
+
+        Returns:
+            True if the segment was still in the open turn
+        """
+        turn = self.open_turn
+        if turn is None or turn.speaker != segment.speaker:
+            return False
+        for i in range(len(turn.texts) - 1, -1, -1):
+            if turn.texts[i] == old_text:
+                turn.texts[i] = segment.text
+                if segment.end is not None:
+                    turn.end = max(turn.end, segment.end)
+                return True
+        return False
+
+    def poll(self) -> List[Turn]:
+        """
+        Close the open turn if no segment has arrived for timeout seconds.
+
+        Returns:
+            The closed turn, if any
+        """
+        if self.open_turn is not None and self.clock() - self._last_added >= self.timeout:
+            return self.flush()
+        return []
+
+    def flush(self) -> List[Turn]:
+        """
+        Close the open turn now, e.g. before the conversation is used in a prompt.
+
+        Returns:
+            The closed turn, if any
+        """
+        turn = self.open_turn
+        if turn is None:
+            return []
+        self.open_turn = None
+        self._flushed = turn
+        return [turn]
+
+    def reset(self) -> None:
+        """Drop the open turn, e.g. when a new conversation starts."""
+        self.open_turn = None
+        self._flushed = None
@@ -1,113 +1,358 @@
+import argparse
+import logging
 import requests
 import json
-import time
 import os
+import threading
 import openai
+from collections import deque
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
+from segment_log import SegmentLog
+from webhook_fetcher import WebhookSiteFetcher
+from trigger_engine import TriggerEngine, TriggerMatch, StreamingMatcher
+from dedup_index import segment_key
+from action_executor import ActionExecutor, accepts_keyword
+from context_builder import ConversationContext
+from scan_checkpoint import ScanCheckpoint, checkpoint_path_for
+from payload_archive import PayloadArchive
+from segment_model import Segment, format_timestamp
+from segment_merge import SegmentMerger, INSERTED, REPLACED, UNCHANGED
+from turn_aggregator import Turn, TurnAggregator
+from fast_json import decode_content, JSONDecodeError
+from session_manager import SessionManager
+from persistence import WriteBehind
+from conversation_index import ConversationIndex
+from archive_manager import ArchiveManager, MANIFEST_FILE
+from poll_scheduler import PollScheduler, parse_retry_after
+from metrics import metrics, logger, configure_logging, serve_metrics, SnapshotWriter
+
+# Trigger phrases and the action each one runs (matching ignores case and punctuation)
+TRIGGERS = {
+    "I like your": openai.hello_world,
+}
+
+# Write segments and raw payloads on background threads, batched, instead of on the ingest path
+WRITE_BEHIND = True
+
+# Segments from one speaker are joined into a turn across pauses of up to TURN_GAP seconds of recording;
+# the open turn is closed after TURN_TIMEOUT seconds without a new segment
+TURN_GAP = 2.0
+TURN_TIMEOUT = 5.0
+
+# Seconds the poll loop waits for the background writers before saving the webhook.site cursor
+WRITE_FLUSH_TIMEOUT = 10.0
 
 class TranscriptionProcessor:
-    def __init__(self):
+    def __init__(self, triggers: Dict[str, Any] = None, data_dir: str = '', write_behind: bool = None,
+                 turn_gap: float = None, turn_timeout: float = None):
+        """
+        Args:
+            triggers: Trigger phrase -> action mapping (defaults to TRIGGERS)
+            data_dir: Directory this processor keeps its transcripts in (e.g. one per session)
+            write_behind: Persist on background writers (defaults to WRITE_BEHIND)
+            turn_gap: Longest pause inside one speaker turn (defaults to TURN_GAP)
+            turn_timeout: Seconds before an open turn is closed without a new segment (defaults to TURN_TIMEOUT)
+        """
+        self.data_dir = data_dir
+        self.write_behind = WRITE_BEHIND if write_behind is None else write_behind
+        self.output_file = os.path.join(data_dir, 'processed_transcription.json')
+        self.raw_payload_dir = os.path.join(data_dir, 'live_transcript')
+        self.conversations_dir = os.path.join(data_dir, 'previous_conversations')
         self.last_processed_text = ""  # Track the last text that triggered the function
+        self.trigger_engine = TriggerEngine(TRIGGERS if triggers is None else triggers)  # Compiled once at startup
+        self.stream_matcher = StreamingMatcher(self.trigger_engine)  # Phrases split across segments, per speaker
+        self.segment_logs = {}  # Append-only segment logs, keyed by legacy output file
+        self.scan_checkpoints = {}  # How far each log has been checked for triggers, keyed the same way
+        self.payload_archive = None  # Compressed archive of raw webhook payloads, opened on first use
+        self.payload_writer = None  # Background writer feeding the payload archive (with write_behind)
+        self.conversation_index = None  # Full-text index of archived conversations, opened on first use
+        self._conversation_index_lock = threading.Lock()  # Actions open the index on the executor's thread
+        self.archive_manager = None  # Numbering and manifest of archived conversations, loaded on first use
+        self.action_executor = ActionExecutor()  # Runs LLM/speech actions off the ingest path
+        self.context = ConversationContext()  # Rolling, token-budgeted conversation for prompts
+        self.segments = SegmentMerger()  # Current conversation with Omi's revisions applied in place
+        self.turns = TurnAggregator(TURN_GAP if turn_gap is None else turn_gap,
+                                    TURN_TIMEOUT if turn_timeout is None else turn_timeout)  # Segments -> turns
+    
+    def get_segment_log(self, output_file: str = None) -> SegmentLog:
+        """
+        Get the append-only segment log backing a processed transcription file.
+        The log (and its dedup index) is opened once and kept for the life of the process.
+        
+        Args:
+            output_file: Path to the processed transcription file (defaults to this processor's)
+            
+        Returns:
+            The SegmentLog for that file
+        """
+        output_file = output_file or self.output_file
+        if output_file not in self.segment_logs:
+            if self.write_behind:
+                # The writer saves the scan checkpoint after each batch, off the ingest path too
+                self.segment_logs[output_file] = SegmentLog(
+                    output_file, write_behind=True, on_write=self.get_scan_checkpoint(output_file).save)
+            else:
+                self.segment_logs[output_file] = SegmentLog(output_file)
+            if output_file == self.output_file:
+                self.clear_archived_log(self.segment_logs[output_file])
+        return self.segment_logs[output_file]
+    
+    def clear_archived_log(self, segment_log: SegmentLog) -> None:
+        """
+        Drop the part of the segment log that was archived by a rotation interrupted before the log was reset,
+        so the next rotation doesn't archive the same conversation again.
+        
+        Args:
+            segment_log: This processor's segment log
+        """
+        if not os.path.exists(os.path.join(self.conversations_dir, MANIFEST_FILE)):
+            return  # Nothing was ever archived by this processor
+        archive_manager = self.get_archive_manager()
+        archived = archive_manager.archived_log
+        if archived is not None:
+            segment_log.drop_before(archived['size'])
+            archive_manager.log_cleared()
+            print(f"Dropped conversation #{archived['id']} from {segment_log.log_file}, it was already archived")
     
-    def check_for_phrase_and_trigger_openai(self, text: str) -> None:
+    def get_scan_checkpoint(self, output_file: str = None) -> ScanCheckpoint:
         """
-        Check if the text contains the phrase "I like your" and trigger openai function if found.
+        Get the checkpoint recording how much of a segment log has been checked for trigger phrases.
+        
+        Args:
+            output_file: Path to the processed transcription file (defaults to this processor's)
+            
+        Returns:
+            The ScanCheckpoint for that file
+        """
+        output_file = output_file or self.output_file
+        checkpoint = self.scan_checkpoints.get(output_file)
+        if checkpoint is None:
+            checkpoint = ScanCheckpoint(checkpoint_path_for(output_file))
+            self.scan_checkpoints[output_file] = checkpoint
+        return checkpoint
+    
+    def get_payload_archive(self) -> PayloadArchive:
+        """
+        Get the archive that raw webhook payloads are stored in.
+            
+        Returns:
+            The PayloadArchive (opened once and kept for the life of the process)
+        """
+        if self.payload_archive is None:
+            self.payload_archive = PayloadArchive(self.raw_payload_dir)
+        return self.payload_archive
+    
+    def get_archive_manager(self) -> ArchiveManager:
+        """
+        Get the manager of this processor's previous_conversations/ archive, loading its manifest on first use.
+        
+        Returns:
+            The ArchiveManager
+        """
+        if self.archive_manager is None:
+            self.archive_manager = ArchiveManager(self.conversations_dir)
+        return self.archive_manager
+    
+    def get_conversation_index(self) -> ConversationIndex:
+        """
+        Get the full-text index of this processor's archived conversations.
+        A new index is filled from the archives already in previous_conversations/.
+        
+        Returns:
+            The ConversationIndex
+        """
+        with self._conversation_index_lock:
+            if self.conversation_index is None:
+                index = ConversationIndex(os.path.join(self.data_dir, 'conversation_index.sqlite3'))
+                if len(index) == 0 and os.path.isdir(self.conversations_dir):
+                    counts = index.update(self.conversations_dir)
+                    print(f"📚 Indexed {counts['indexed']} archived conversation(s)")
+                self.conversation_index = index
+            return self.conversation_index
+    
+    def mark_segments_scanned(self, output_file: str = None) -> None:
+        """
+        Move the scan checkpoint to the end of the segment log once the new segments have been checked.
+        
+        Args:
+            output_file: Path to the processed transcription file (defaults to this processor's)
+        """
+        output_file = output_file or self.output_file
+        checkpoint = self.get_scan_checkpoint(output_file)
+        segment_log = self.get_segment_log(output_file)
+        # Only what is already in the log counts as scanned; queued segments are covered by the next call
+        checkpoint.advance(segment_log.written_size())
+        if not segment_log.write_behind:
+            checkpoint.save()
+    
+    def run_trigger_actions(self, matches: List[TriggerMatch], context: ConversationContext = None) -> None:
+        """
+        Queue the action of every matched trigger phrase (each action at most once).
+        Actions run on the action executor's worker, so this returns immediately;
+        an action that is still waiting to run absorbs repeat triggers.
+        
+        Args:
+            matches: Trigger matches found in a segment
+            context: Conversation the actions should use (defaults to the live conversation)
+        """
+        if context is None:
+            context = self.context
+            self.flush_turns()  # The prompt must include what is being said right now
+        fired = []
+        for match in matches:
+            if match.action is None or match.action in fired:
+                continue
+            fired.append(match.action)
+            print(f"Queueing action for '{match.phrase}'...")
+            try:
+                kwargs = {}
+                if accepts_keyword(match.action, 'context'):
+                    kwargs['context'] = context  # Prompt comes from memory, not the file
+                else:
+                    self.get_segment_log().compact()  # Action reads the legacy JSON file
+                if accepts_keyword(match.action, 'get_conversation_index'):
+                    # Opened (and filled) by the action on the executor's thread, only if it needs it
+                    kwargs['get_conversation_index'] = self.get_conversation_index
+                self.action_executor.submit(match.action, cancellable=accepts_keyword(match.action, 'cancel_event'),
+                                            **kwargs)
+            except Exception as e:
+                print(f"Error queueing action for '{match.phrase}': {e}")
+    
+    def check_for_phrase_and_trigger_openai(self, text: str, key: int = None, previous_text: str = None) -> None:
+        """
+        Check the text against every trigger phrase and run the matching actions.
         Only triggers once per unique text to avoid multiple calls.
         
         Args:
-            text: The text to check for the phrase
+            text: The text to check for trigger phrases
+            key: Dedup key of the segment the text came from; a segment that already fired is skipped
+            previous_text: Text of the version this segment revises; phrases it already matched don't fire again
         """
-        # Debug: print what we're checking
-        print(f"🔍 Checking text: '{text}'")
+        logger.debug("🔍 Checking text: '%s'", text)
         
-        # Convert both to lowercase for case-insensitive comparison
-        text_lower = text.lower()
-        phrase_lower = "i like your"
+        # One pass over the text matches every registered phrase (case and punctuation insensitive)
+        with metrics.timer('trigger_match'):
+            matches = self.trigger_engine.match(text)
+            if matches and previous_text:
+                # A revision gets a new key, so "I like your" -> "I like your shoes" must not fire twice
+                already_matched = {match.phrase for match in self.trigger_engine.match(previous_text)}
+                matches = [match for match in matches if match.phrase not in already_matched]
         
-        if phrase_lower in text_lower:
+        if matches:
+            checkpoint = self.get_scan_checkpoint()
             # Only trigger if this is a new text (not the same as last processed)
-            if text != self.last_processed_text:
-                print(f"\n🎯 Phrase 'I like your' detected in: '{text}'")
-                print("Calling openai function...")
-                try:
-                    openai.hello_world()  # Assuming this is the function in openai.py
-                    self.last_processed_text = text  # Mark this text as processed
-                except Exception as e:
-                    print(f"Error calling openai function: {e}")
+            if key is not None and checkpoint.has_fired(key):
+                logger.info("   ⏭️  Skipping segment that already fired: '%s'", text)
+            elif text != self.last_processed_text:
+                phrases = ", ".join(f"'{match.phrase}'" for match in matches)
+                logger.info("\n🎯 Phrase %s detected in: '%s'", phrases, text)
+                metrics.count('triggers')
+                self.run_trigger_actions(matches)
+                self.last_processed_text = text  # Mark this text as processed
+                if key is not None:
+                    checkpoint.mark_fired(key)
             else:
-                print(f"   ⏭️  Skipping duplicate text: '{text}'")
+                logger.info("   ⏭️  Skipping duplicate text: '%s'", text)
         else:
-            print(f"   ❌ Phrase not found in: '{text}'")
+            logger.debug("   ❌ No trigger phrase in: '%s'", text)
     
-    def scan_all_segments_for_phrase(self, output_file: str = 'processed_transcription.json') -> None:
+    def check_for_phrase_across_segments(self, segment: Dict[str, Any]) -> None:
         """
-        Scan all existing segments in the processed file for the phrase "I like your".
+        Check for trigger phrases that continue from the speaker's previous segment,
+        e.g. "I like" at the end of one segment and "your shoes" at the start of the next.
         
         Args:
-            output_file: Path to the processed transcription file
+            segment: Processed segment with speaker and text fields
         """
+        key = segment_key(segment)
+        with metrics.timer('trigger_match'):
+            matches = self.stream_matcher.feed(segment['speaker'], segment['text'], key=key)
+        
+        if matches:
+            phrases = ", ".join(f"'{match.phrase}'" for match in matches)
+            context = self.stream_matcher.context(segment['speaker'])
+            logger.info("\n🎯 Phrase %s detected across segments from %s: '... %s'",
+                        phrases, segment['speaker'], context)
+            metrics.count('triggers')
+            self.run_trigger_actions(matches)
+            self.get_scan_checkpoint().mark_fired(key)
+    
+    def scan_all_segments_for_phrase(self, output_file: str = None,
+                                     context_bytes: int = 64 * 1024) -> None:
+        """
+        Scan the segments that have not been checked yet for trigger phrases.
+        
+        Resumes from the scan checkpoint, so only segments appended since the
+        last check are read, and segments that already fired are skipped.
+        
+        Args:
+            output_file: Path to the processed transcription file (defaults to this processor's)
+            context_bytes: How much of the log before the checkpoint is read to give actions some conversation
+        """
+        output_file = output_file or self.output_file
         try:
-            with open(output_file, 'r', encoding='utf-8') as f:
-                content = f.read().strip()
-                if content:
-                    segments = json.loads(content)
-                    print(f"\n🔍 Scanning {len(segments)} existing segments for 'I like your'...")
-                    
-                    for segment in segments:
-                        text = segment.get('text', '')
-                        if "i like your" in text.lower():
-                            print(f"🎯 Found phrase in existing segment: '{text}'")
-                            print("Calling openai function...")
-                            try:
-                                openai.hello_world()
-                            except Exception as e:
-                                print(f"Error calling openai function: {e}")
-                else:
-                    print("No existing segments to scan")
-        except FileNotFoundError:
-            print("No processed file found to scan")
+            segment_log = self.get_segment_log(output_file)
+            checkpoint = self.get_scan_checkpoint(output_file)
+            end = segment_log.size()
+            offset = checkpoint.offset
+            if offset > end:
+                print("Scan checkpoint is past the end of the segment log, rescanning it")
+                offset = 0
+            
+            if offset == end:
+                print("No new segments to scan")
+                return
+            
+            print(f"\n🔍 Scanning segments after byte {offset} of {segment_log.log_file} "
+                  f"for {len(self.trigger_engine)} trigger phrase(s)...")
+            
+            # The live context is reset for the new conversation, so give these actions their own
+            history = ConversationContext()
+            scanned = 0
+            for segment, position in segment_log.iter_from(max(0, offset - context_bytes)):
+                history.add(segment.get('speaker', 'UNKNOWN'), segment.get('text', ''))
+                if position <= offset:
+                    continue  # Checked on a previous run, only here for context
+                
+                scanned += 1
+                key = segment_key(segment)
+                if checkpoint.has_fired(key):
+                    continue
+                text = segment.get('text', '')
+                matches = self.trigger_engine.match(text)
+                if matches:
+                    print(f"🎯 Found phrase in existing segment: '{text}'")
+                    self.run_trigger_actions(matches, history)
+                    checkpoint.mark_fired(key)
+            
+            print(f"Scanned {scanned} new segment(s)")
+            checkpoint.advance(end)
+            checkpoint.save()
         except Exception as e:
             print(f"Error scanning segments: {e}")
     
-    def parse_webhook_data(self, webhook_data: Dict[str, Any]) -> List[Dict[str, str]]:
+    def parse_webhook_data(self, webhook_data: Dict[str, Any]) -> List[Segment]:
         """
-        Parse webhook data from OMI transcription and convert to simplified format.
+        Parse webhook data from OMI transcription into Segment objects.
         
         Args:
             webhook_data: The raw webhook data containing transcription segments
             
         Returns:
-            List of dictionaries with speaker, text, and timestamp fields
+            List of Segments (speaker, text, start/end, and id/speaker_id/is_user when provided)
         """
-        processed_segments = []
-        
-        # Extract the content from the webhook data
-        content = webhook_data.get('content')
-        
-        if isinstance(content, str):
-            try:
-                # Parse the JSON string in the content field
-                content_data = json.loads(content)
-            except json.JSONDecodeError as e:
-                print(f"Failed to parse content as JSON: {e}")
-                return processed_segments
-        else:
-            # If content is already a dict
-            content_data = content or {}
-        
-        # Get segments from the content
-        segments = content_data.get('segments', [])
-        
-        for segment in segments:
-            processed_segment = {
-                "speaker": segment.get('speaker', 'UNKNOWN'),
-                "text": segment.get('text', '').strip(),
-                "timestamp": self._format_timestamp(segment.get('start', 0))
-            }
-            processed_segments.append(processed_segment)
+        try:
+            # The content field is itself a JSON string; decode it straight into Segments (orjson when installed)
+            with metrics.timer('parse'):
+                _session_id, segments = decode_content(webhook_data.get('content'))
+        except JSONDecodeError as e:
+            print(f"Failed to parse content as JSON: {e}")
+            metrics.count('parse_errors')
+            return []
         
-        return processed_segments
+        metrics.count('segments_parsed', len(segments))
+        return segments
     
     def _format_timestamp(self, start_time: float) -> str:
         """
@@ -119,70 +364,232 @@ class TranscriptionProcessor:
         Returns:
             Formatted timestamp string (HH:MM:SS)
         """
-        # Convert seconds to hours, minutes, seconds
-        total_seconds = int(start_time)
-        hours = total_seconds // 3600
-        minutes = (total_seconds % 3600) // 60
-        seconds = total_seconds % 60
-        
-        return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+        return format_timestamp(start_time)
     
-    def append_to_processed_file(self, webhook_data: Dict[str, Any], output_file: str = 'processed_transcription.json') -> None:
+    def append_to_processed_file(self, webhook_data: Dict[str, Any], output_file: str = None,
+                                 segments: List[Segment] = None) -> Dict[int, Tuple[str, Optional[str]]]:
         """
         Process new webhook data and append to existing processed file.
         
         Args:
             webhook_data: New webhook payload to process
-            output_file: Path to the processed transcription file
+            output_file: Path to the processed transcription file (defaults to this processor's)
+            segments: The payload's segments if the caller already parsed them
+            
+        Returns:
+            Dedup key -> (INSERTED, REPLACED or UNCHANGED, text of the version it replaced or None)
+            for each segment new to the log
         """
+        output_file = output_file or self.output_file
+        merged = {}
         try:
-            # Try to read existing data
-            existing_data = []
-            try:
-                with open(output_file, 'r', encoding='utf-8') as f:
-                    content = f.read().strip()
-                    if content:  # Only try to parse if file is not empty
-                        existing_data = json.loads(content)
-                    else:
-                        existing_data = []
-            except FileNotFoundError:
-                existing_data = []
-            except json.JSONDecodeError as e:
-                print(f"Error reading existing file, starting fresh: {e}")
-                existing_data = []
-            
             # Process new webhook data
-            new_segments = self.parse_webhook_data(webhook_data)
+            new_segments = self.parse_webhook_data(webhook_data) if segments is None else segments
             
-            # Create a set of existing segment identifiers for deduplication
-            existing_segment_ids = set()
-            for segment in existing_data:
-                # Create a unique identifier for each segment
-                segment_id = f"{segment['speaker']}_{segment['text']}_{segment['timestamp']}"
-                existing_segment_ids.add(segment_id)
+            # Append only the unseen segments to the log; dedup uses the log's persisted 64-bit key index
+            unique_new_segments = self.get_segment_log(output_file).append(new_segments)
             
-            # Filter out duplicates from new segments
-            unique_new_segments = []
-            for segment in new_segments:
-                segment_id = f"{segment['speaker']}_{segment['text']}_{segment['timestamp']}"
-                if segment_id not in existing_segment_ids:
-                    unique_new_segments.append(segment)
-                    existing_segment_ids.add(segment_id)
+            # Segments are joined into speaker turns before they reach the prompt context; a revision of a
+            # segment we already have replaces it instead of repeating it
+            for segment in unique_new_segments:
+                action, _row, previous = self.segments.upsert(segment)
+                merged[segment_key(segment)] = (action, previous.text if action == REPLACED else None)
+                if action == INSERTED:
+                    self.emit_turns(self.turns.add(segment))
+                elif action == REPLACED:
+                    if not (self.turns.revise(previous.text, segment) or
+                            self.context.revise(previous.speaker, previous.text, segment.text)):
+                        self.emit_turns(self.turns.add(segment))
             
-            # Append unique new segments (only if there are any)
+            metrics.count('segments_new', len(unique_new_segments))
             if unique_new_segments:
-                existing_data.extend(unique_new_segments)
-                
-                # Write back to file
-                with open(output_file, 'w', encoding='utf-8') as f:
-                    json.dump(existing_data, f, indent=2, ensure_ascii=False)
-                
-                print(f"Added {len(unique_new_segments)} new unique segments to {output_file}")
+                logger.info("Added %d new unique segments to %s", len(unique_new_segments), output_file)
             else:
-                print("No new unique segments to add")
+                logger.debug("No new unique segments to add")
             
         except Exception as e:
             print(f"Error appending to processed file: {e}")
+        return merged
+    
+    def emit_turns(self, turns: List[Turn]) -> None:
+        """
+        Hand completed speaker turns to the prompt context and the console.
+        
+        Args:
+            turns: Turns closed by the turn aggregator
+        """
+        for turn in turns:
+            self.context.add(turn.speaker, turn.text, new_turn=not turn.continues)
+            logger.info("%s", turn)
+        metrics.count('turns', len(turns))
+    
+    def flush_turns(self, idle_only: bool = False) -> None:
+        """
+        Close the open speaker turn and emit it.
+        
+        Args:
+            idle_only: Only close it if no segment has arrived for the turn timeout
+        """
+        self.emit_turns(self.turns.poll() if idle_only else self.turns.flush())
+    
+    def flush_writes(self, timeout: float = None) -> bool:
+        """
+        Wait until the segments and raw payloads queued on the background writers are on disk.
+        
+        Args:
+            timeout: Seconds to wait for each writer
+            
+        Returns:
+            True if everything was written, False on timeout or if a writer has died
+        """
+        for segment_log in list(self.segment_logs.values()):
+            if not segment_log.drain(timeout):
+                return False
+        return self.payload_writer is None or self.payload_writer.flush(timeout)
+    
+    def start_new_conversation(self) -> int:
+        """
+        Archive the processed transcription to previous_conversations/, clear the raw payloads,
+        and start a fresh processed transcription file.
+        
+        Returns:
+            Number of the new conversation
+        """
+        archive_manager = self.get_archive_manager()
+        
+        # Make sure processed_transcription.json holds everything from the segment log
+        segment_log = self.get_segment_log()
+        segment_log.compact()
+        
+        # Archive existing processed_transcription.json if it exists (before the raw payloads are cleared,
+        # so a crash in between never loses the conversation)
+        if os.path.exists(self.output_file):
+            # Check if the file has content (not empty)
+            if os.path.getsize(self.output_file) > 0:
+                # The manifest remembers how much of the log went into the archive until the log is reset,
+                # so a crash in between never archives the same conversation twice
+                archived_number = archive_manager.archive(self.output_file, log_size=segment_log.size())
+                segment_log.reset()
+                archive_manager.log_cleared()
+                archive_path = archive_manager.path(archived_number)
+                print(f"Archived previous conversation to {archive_path}")
+                try:
+                    count = self.get_conversation_index().index_conversation(archive_path)
+                    print(f"📚 Indexed {count} segments from {archive_path}")
+                except Exception as e:
+                    print(f"Error indexing {archive_path}: {e}")
+            else:
+                # If file is empty, just remove it
+                os.remove(self.output_file)
+                print(f"Removed empty {self.output_file}")
+        # The archived segments must not come back from the log if we crash before the new file exists
+        segment_log.reset()
+        
+        # Clear the raw payloads (and the live_transcript.json they used to be kept in)
+        if self.payload_writer is not None:
+            self.payload_writer.flush()
+        self.get_payload_archive().clear()
+        legacy_raw_file = os.path.join(self.data_dir, 'live_transcript.json')
+        if os.path.exists(legacy_raw_file):
+            os.remove(legacy_raw_file)
+        print(f"Cleared {self.raw_payload_dir} payloads")
+        
+        # The new conversation will be archived under the next number
+        conversation_number = archive_manager.next_id
+        
+        # Create new empty processed_transcription.json and start a fresh segment log
+        tmp_file = f"{self.output_file}.tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump([], f)
+        os.replace(tmp_file, self.output_file)
+        self.segments.clear()
+        self.turns.reset()
+        self.get_scan_checkpoint().reset()
+        self.stream_matcher.reset()
+        self.context.reset()
+        
+        print(f"Created new {self.output_file} for conversation #{conversation_number}")
+        return conversation_number
+    
+    def save_raw_payload(self, data: Dict[str, Any]) -> None:
+        """
+        Append a raw webhook payload to the payload archive if it isn't already there.
+        
+        Args:
+            data: Raw webhook payload
+        """
+        if self.write_behind:
+            if self.payload_writer is None:
+                self.payload_writer = WriteBehind(self._archive_payloads, name='payload_archive_write')
+            self.payload_writer.submit(data)
+        else:
+            self._archive_payloads([data])
+    
+    def _archive_payloads(self, payloads: List[Dict[str, Any]]) -> None:
+        archive = self.get_payload_archive()
+        for data in payloads:
+            self._archive_payload(archive, data)
+    
+    def _archive_payload(self, archive: PayloadArchive, data: Dict[str, Any]) -> None:
+        if archive.append(data):
+            logger.debug("New data appended to %s/", archive.archive_dir)
+        else:
+            logger.debug("Data already exists in %s/ - not appending", archive.archive_dir)
+    
+    def handle_payload(self, data: Dict[str, Any], segments: List[Segment] = None) -> None:
+        """
+        Run one webhook payload through the pipeline: parse -> persist -> phrase check.
+        
+        Args:
+            data: Raw webhook payload (webhook.site request format)
+            segments: The payload's segments if the caller already decoded them (e.g. the session manager)
+        """
+        with metrics.timer('payload'):
+            self._handle_payload(data, segments)
+        metrics.count('payloads')
+    
+    def _handle_payload(self, data: Dict[str, Any], segments: List[Segment] = None) -> None:
+        # Close the previous turn if the speaker went quiet since the last payload
+        self.flush_turns(idle_only=True)
+        
+        # Process the new data first (always process new webhook data)
+        new_segments = self.parse_webhook_data(data) if segments is None else segments
+        
+        # Persist first so triggered actions see these segments in the conversation context
+        merged = self.append_to_processed_file(data, segments=new_segments)
+        
+        # Check for phrase in ALL segments (not just unique ones), then for phrases split across segments
+        for segment in new_segments:
+            key = segment_key(segment)
+            action, previous_text = merged.get(key, (None, None))
+            if action == UNCHANGED:
+                continue  # A repeat or an older, shorter copy of a segment that was already checked
+            self.check_for_phrase_and_trigger_openai(segment.text, key=key, previous_text=previous_text)
+            self.check_for_phrase_across_segments(segment)
+        self.mark_segments_scanned()
+        
+        # Completed speaker turns are logged as they close (see emit_turns), not every fragment of every payload
+        if new_segments and logger.isEnabledFor(logging.DEBUG):
+            logger.debug("\n=== New Transcription Segments ===\n%s\n%s",
+                         "\n".join(f"[{segment.timestamp}] {segment.speaker}: {segment.text}"
+                                   for segment in new_segments),
+                         "=" * 40)
+        
+        self.save_raw_payload(data)
+    
+    def close(self) -> None:
+        """Stop queued actions, write out the legacy JSON files and close all storage."""
+        self.flush_turns()
+        self.action_executor.shutdown(wait=False, cancel_pending=True)
+        if self.payload_writer is not None:
+            self.payload_writer.close()
+        for segment_log in self.segment_logs.values():
+            segment_log.compact()
+            segment_log.close()
+        if self.payload_archive is not None:
+            self.payload_archive.close()
+        if self.conversation_index is not None:
+            self.conversation_index.close()
 
 # Initialize the transcription processor
 processor = TranscriptionProcessor()
@@ -190,114 +597,247 @@ processor = TranscriptionProcessor()
 uuid = "e00c4adb-0534-4647-b85f-10d3f936fd38"  # Replace with your actual inbox UUID
 api_key = "8a26d082-f54b-4cce-88a2-ddd3e6dd68c7"  # Replace with your actual API key
 
-url = f"https://webhook.site/token/{uuid}/request/latest"
-
-headers = {
-    "Api-Key": api_key
-}
 
 def initialize_new_conversation():
-    """Initialize a new conversation by clearing live_transcript.json and archiving processed_transcription.json"""
-    
-    # Create previous_conversations directory if it doesn't exist
-    os.makedirs('previous_conversations', exist_ok=True)
-    
-    # Find the next conversation number
-    conversation_number = 1
-    while os.path.exists(f'previous_conversations/convo_{conversation_number}.json'):
-        conversation_number += 1
-    
-    # Clear live_transcript.json
-    if os.path.exists('live_transcript.json'):
-        os.remove('live_transcript.json')
-        print(f"Cleared live_transcript.json")
-    
-    # Archive existing processed_transcription.json if it exists
-    if os.path.exists('processed_transcription.json'):
-        # Check if the file has content (not empty)
-        if os.path.getsize('processed_transcription.json') > 0:
-            archive_path = f'previous_conversations/convo_{conversation_number}.json'
-            os.rename('processed_transcription.json', archive_path)
-            print(f"Archived previous conversation to {archive_path}")
-        else:
-            # If file is empty, just remove it
-            os.remove('processed_transcription.json')
-            print("Removed empty processed_transcription.json")
+    """Initialize a new conversation by clearing the raw payload archive and archiving processed_transcription.json"""
+    return processor.start_new_conversation()
+
+
+def save_raw_payload(data: Dict[str, Any]) -> None:
+    """
+    Append a raw webhook payload to the payload archive if it isn't already there.
     
-    # Create new empty processed_transcription.json
-    with open('processed_transcription.json', 'w') as f:
-        json.dump([], f)
+    Args:
+        data: Raw webhook payload
+    """
+    processor.save_raw_payload(data)
+
+
+def handle_webhook_data(data: Dict[str, Any]) -> None:
+    """
+    Run one webhook payload through the pipeline: parse -> persist -> phrase check.
+    Used by both the webhook.site poll loop and the push ingestion server.
     
-    print(f"Created new processed_transcription.json for conversation #{conversation_number}")
-    return conversation_number
+    Args:
+        data: Raw webhook payload (webhook.site request format)
+    """
+    processor.handle_payload(data)
 
 
+def create_session_processor(session_id: str) -> TranscriptionProcessor:
+    """
+    Set up an isolated processor for one Omi session, with its files under sessions/<session_id>/.
+    Resumes the session's trigger scan and starts a new conversation, like startup does for the default one.
+    
+    Args:
+        session_id: Session id from the payload (already safe to use as a directory name)
+        
+    Returns:
+        The session's TranscriptionProcessor
+    """
+    data_dir = os.path.join('sessions', session_id)
+    os.makedirs(data_dir, exist_ok=True)
+    session_processor = TranscriptionProcessor(data_dir=data_dir)
+    session_processor.scan_all_segments_for_phrase()
+    session_processor.start_new_conversation()
+    return session_processor
 
-# Scan existing segments for the phrase "I like your"
-processor.scan_all_segments_for_phrase()
 
-# Initialize new conversation
-conversation_number = initialize_new_conversation()
+def save_written_cursor(fetcher: WebhookSiteFetcher, processors: List[TranscriptionProcessor],
+                        cursor: Dict[str, Any] = None) -> bool:
+    """
+    Save the cursor once the processors' background writers have written everything queued so far,
+    so a crash never leaves the saved cursor past payloads that are not on disk.
+    
+    Args:
+        fetcher: Fetcher whose cursor file is written
+        processors: Processors that handled the payloads before the cursor
+        cursor: Cursor to save (defaults to the fetcher's current one)
+        
+    Returns:
+        True if the cursor was saved
+    """
+    for session_processor in processors:
+        if not session_processor.flush_writes(WRITE_FLUSH_TIMEOUT):
+            print("⚠️ Background writes are not finished, keeping the saved cursor where it is")
+            return False
+    fetcher.save_cursor(cursor)
+    return True
 
-print("Starting webhook listener... (Press Ctrl+C to stop)")
-print("Checking for new requests every second...")
 
-try:
-    while True:
-        try:
-            response = requests.get(url, headers=headers)
-            data = response.json()
+def save_acknowledged_cursor(fetcher: WebhookSiteFetcher, sessions: SessionManager, unsaved: deque) -> None:
+    """
+    Save the cursor after the newest fetched batch whose payloads every session has handled and written.
+    
+    Args:
+        fetcher: Fetcher whose cursor file is written
+        sessions: Session manager the batches were submitted to
+        unsaved: (number of a batch's last payload, cursor after that batch), oldest first; saved ones are removed
+    """
+    acknowledged = sessions.acknowledged
+    batches = 0
+    while batches < len(unsaved) and unsaved[batches][0] <= acknowledged:
+        batches += 1
+    if batches and save_written_cursor(fetcher, sessions.processors(), unsaved[batches - 1][1]):
+        for _ in range(batches):
+            unsaved.popleft()
 
-            if response.status_code == 200:
-                # Process the new data first (always process new webhook data)
-                new_segments = processor.parse_webhook_data(data)
-                
-                # Check for phrase in ALL segments (not just unique ones)
-                for segment in new_segments:
-                    processor.check_for_phrase_and_trigger_openai(segment['text'])
-                
-                # Print the processed transcription segments
-                if new_segments:
-                    print(f"\n=== New Transcription Segments ===")
-                    for segment in new_segments:
-                        print(f"[{segment['timestamp']}] {segment['speaker']}: {segment['text']}")
-                    print("=" * 40)
-                
-                processor.append_to_processed_file(data)
-                
-                # Load existing data or create empty list
-                try:
-                    with open('live_transcript.json', 'r') as f:
-                        existing_data = json.load(f)
-                        # Ensure existing_data is a list
-                        if not isinstance(existing_data, list):
-                            existing_data = [existing_data]
-                except FileNotFoundError:
-                    existing_data = []
-                except json.JSONDecodeError:
-                    existing_data = []
+
+def poll_webhook_site(sessions: SessionManager = None, scheduler: PollScheduler = None) -> None:
+    """
+    Poll webhook.site, processing every request received since the last poll.
+    The scheduler polls faster while requests are arriving and backs off when idle or failing.
+    
+    Args:
+        sessions: Route payloads to per-session processors (processed concurrently) instead of the default one
+        scheduler: Decides the delay between polls (a default PollScheduler if not given)
+    """
+    scheduler = scheduler or PollScheduler()
+    metrics.gauge('poll_delay_seconds', lambda: scheduler.last_delay)
+    metrics.gauge('poll_idle_streak', lambda: scheduler.idle_streak)
+    print("Starting webhook listener... (Press Ctrl+C to stop)")
+    print(f"Checking for new requests every {scheduler.min_interval:g}-{scheduler.max_interval:g} seconds "
+          f"depending on activity...")
+    
+    # One pooled session for every poll, paging from the persisted cursor
+    fetcher = WebhookSiteFetcher(uuid, api_key)
+    # With sessions: (number of a batch's last payload, cursor after that batch) for batches not saved yet
+    unsaved = deque()
+    cursor_saved = True  # Without sessions: the saved cursor is the fetcher's current one
+    
+    try:
+        while True:
+            last_reason = scheduler.last_reason
+            try:
+                new_requests = fetcher.fetch_new_requests()
                 
-                # Check if current data already exists
-                if data not in existing_data:
-                    existing_data.append(data)
-                    
-                    # Save updated data back to file
-                    with open('live_transcript.json', 'w') as f:
-                        json.dump(existing_data, f, indent=4)
-                    
-                    print("\nNew data appended to live_transcript.json")
+                for data in new_requests:
+                    if sessions is not None:
+                        sessions.submit(data)
+                    else:
+                        handle_webhook_data(data)
+                if sessions is not None:
+                    # Only move the saved cursor past batches every session has handled, without waiting
+                    # for a slow session before the next poll
+                    if new_requests:
+                        unsaved.append((sessions.submitted, dict(fetcher.cursor)))
+                    save_acknowledged_cursor(fetcher, sessions, unsaved)
                 else:
-                    print("\nData already exists in live_transcript.json - not appending")
-            else:
-                print("Failed to fetch requests:", response.status_code)
-                print("Details:", response.text)
-                
-        except requests.RequestException as e:
-            print(f"Request error: {e}")
-        except json.JSONDecodeError as e:
-            print(f"JSON decode error: {e}")
-        
-        time.sleep(1)  # Wait 1 second before next request
+                    processor.flush_turns(idle_only=True)
+                    if new_requests or not cursor_saved:
+                        cursor_saved = save_written_cursor(fetcher, [processor])
+                delay = scheduler.record_poll(len(new_requests))
+                    
+            except requests.HTTPError as e:
+                metrics.count('fetch_errors')
+                print("Failed to fetch requests:", e.response.status_code)
+                print("Details:", e.response.text)
+                delay = scheduler.record_error(parse_retry_after(e.response.headers.get('Retry-After')))
+            except requests.RequestException as e:
+                metrics.count('fetch_errors')
+                print(f"Request error: {e}")
+                delay = scheduler.record_error()
+            except json.JSONDecodeError as e:
+                print(f"JSON decode error: {e}")
+                delay = scheduler.record_error()
+            
+            if scheduler.last_reason != last_reason:
+                print(f"⏱️ Polling: {scheduler.last_reason}, next poll in {delay:.1f}s")
+            scheduler.wait(delay)
+    finally:
+        if sessions is not None:
+            save_acknowledged_cursor(fetcher, sessions, unsaved)
+        elif not cursor_saved:
+            save_written_cursor(fetcher, [processor])
+        fetcher.close()
+        print(f"Poll scheduler: {scheduler.metrics()}")
+
+
+def serve_ingest(host: str, port: int, sessions: SessionManager = None) -> None:
+    """
+    Receive payloads pushed directly by the Omi app instead of polling webhook.site.
+    
+    Args:
+        host: Interface to listen on
+        port: Port to listen on
+        sessions: Route payloads to per-session processors (processed concurrently) instead of the default one
+    """
+    from ingest_server import IngestServer
+    
+    handler = handle_webhook_data if sessions is None else sessions.submit
+    server = IngestServer(handler, host=host, port=port)
+    print(f"Starting ingestion server on http://{host}:{port}{server.path} (Press Ctrl+C to stop)")
+    server.run()
+
+
+def main():
+    global TURN_GAP, TURN_TIMEOUT
+    parser = argparse.ArgumentParser(description="Process live OMI transcriptions")
+    parser.add_argument('--serve', action='store_true',
+                        help="Listen for payloads POSTed by the Omi app instead of polling webhook.site")
+    parser.add_argument('--host', default='127.0.0.1', help="Interface for --serve (default: 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=8000, help="Port for --serve (default: 8000)")
+    parser.add_argument('--sessions', action='store_true',
+                        help="Keep each Omi session (device) separate under sessions/ and process them concurrently")
+    parser.add_argument('--session-workers', type=int, default=4,
+                        help="Sessions processed at the same time with --sessions (default: 4)")
+    parser.add_argument('--max-poll-interval', type=float, default=30.0,
+                        help="Longest wait between webhook.site polls when idle or failing (default: 30)")
+    parser.add_argument('--turn-gap', type=float, default=TURN_GAP,
+                        help=f"Longest pause in seconds inside one speaker turn (default: {TURN_GAP:g})")
+    parser.add_argument('--turn-timeout', type=float, default=TURN_TIMEOUT,
+                        help=f"Seconds without a new segment before a turn is closed (default: {TURN_TIMEOUT:g})")
+    parser.add_argument('--log-level', default='INFO',
+                        help="Pipeline log level; DEBUG shows every checked segment (default: INFO)")
+    parser.add_argument('--log-sample', type=int, default=1,
+                        help="Show one in this many DEBUG lines (default: 1, all of them)")
+    parser.add_argument('--metrics-port', type=int, default=0,
+                        help="Serve Prometheus metrics on http://127.0.0.1:PORT/metrics (default: off)")
+    parser.add_argument('--metrics-file', help="Write a JSON metrics snapshot to this file periodically")
+    parser.add_argument('--metrics-interval', type=float, default=10.0,
+                        help="Seconds between metrics snapshots (default: 10)")
+    args = parser.parse_args()
+    
+    TURN_GAP, TURN_TIMEOUT = args.turn_gap, args.turn_timeout  # For session processors created later
+    processor.turns.max_gap, processor.turns.timeout = TURN_GAP, TURN_TIMEOUT
+    
+    configure_logging(args.log_level, args.log_sample)
+    metrics_server = serve_metrics(metrics, port=args.metrics_port) if args.metrics_port else None
+    if metrics_server is not None:
+        print(f"Serving metrics on http://127.0.0.1:{args.metrics_port}/metrics")
+    snapshot_writer = SnapshotWriter(metrics, args.metrics_file, args.metrics_interval) if args.metrics_file else None
+    
+    # Load the speech engine in its own process now, so the first question is spoken without waiting for it
+    openai.warm_up_speech()
+    
+    sessions = None
+    if args.sessions:
+        # Each session scans and starts its conversation when its first payload arrives
+        sessions = SessionManager(create_session_processor, workers=args.session_workers)
+    else:
+        # Scan existing segments for trigger phrases
+        processor.scan_all_segments_for_phrase()
         
-except KeyboardInterrupt:
-    print("\nWebhook listener stopped by user")
\ No newline at end of file
+        # Initialize new conversation
+        initialize_new_conversation()
+    
+    try:
+        if args.serve:
+            serve_ingest(args.host, args.port, sessions)
+        else:
+            poll_webhook_site(sessions, PollScheduler(max_interval=args.max_poll_interval))
+    except KeyboardInterrupt:
+        print("\nWebhook listener stopped by user")
+    finally:
+        if sessions is not None:
+            sessions.shutdown(wait=False)
+        processor.close()
+        openai.close_speech()
+        if snapshot_writer is not None:
+            snapshot_writer.stop()
+        if metrics_server is not None:
+            metrics_server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
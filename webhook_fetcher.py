@@ -0,0 +1,170 @@
+import json
+import os
+import requests
+from typing import List, Dict, Any, Optional
+
+from fast_json import loads
+from metrics import metrics
+
+
+class WebhookSiteFetcher:
+    """
+    Fetches every webhook.site request received since the last one processed.
+
+    Instead of asking for /request/latest (which drops anything that arrived
+    between polls), this pages through /token/{uuid}/requests oldest-first,
+    starting at a persisted cursor (created_at + sorting + uuid of the last
+    request handled). A single requests.Session is kept for the lifetime of
+    the fetcher so the TCP/TLS connection is reused across polls.
+    """
+
+    def __init__(self, token: str, api_key: str = None, base_url: str = "https://webhook.site",
+                 per_page: int = 50, cursor_file: str = 'webhook_cursor.json',
+                 session: requests.Session = None, timeout: float = 10):
+        """
+        Args:
+            token: webhook.site inbox UUID
+            api_key: webhook.site API key (sent as the Api-Key header)
+            base_url: webhook.site base URL (overridable for testing)
+            per_page: Requests fetched per page
+            cursor_file: Where the cursor is persisted between runs (None to keep it in memory)
+            session: Session to reuse (a new one is created by default)
+            timeout: Per-request timeout in seconds
+        """
+        self.token = token
+        self.base_url = base_url.rstrip('/')
+        self.per_page = per_page
+        self.cursor_file = cursor_file
+        self.timeout = timeout
+
+        self.session = session or requests.Session()
+        if api_key:
+            self.session.headers.update({"Api-Key": api_key})
+        self.session.headers.update({"Accept": "application/json"})
+
+        self.cursor = self._load_cursor()
+
+    @property
+    def requests_url(self) -> str:
+        return f"{self.base_url}/token/{self.token}/requests"
+
+    def _load_cursor(self) -> Dict[str, Any]:
+        """Load the persisted cursor, if any."""
+        if not self.cursor_file:
+            return {}
+        try:
+            with open(self.cursor_file, 'r', encoding='utf-8') as f:
+                cursor = json.load(f)
+                return cursor if isinstance(cursor, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except json.JSONDecodeError as e:
+            print(f"Error reading {self.cursor_file}, starting from the latest request: {e}")
+            return {}
+
+    def save_cursor(self, cursor: Dict[str, Any] = None) -> None:
+        """
+        Persist the cursor atomically. Call once a fetched batch has been processed.
+
+        Args:
+            cursor: Cursor to persist, e.g. one copied after an earlier batch (defaults to the current one)
+        """
+        if not self.cursor_file:
+            return
+        tmp_file = f"{self.cursor_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.cursor if cursor is None else cursor, f)
+        os.replace(tmp_file, self.cursor_file)
+
+    def _get_page(self, page: int, sorting: str, date_from: Optional[str] = None,
+                  per_page: int = None) -> Dict[str, Any]:
+        """Fetch one page of requests from the webhook.site API."""
+        params = {
+            "sorting": sorting,
+            "per_page": per_page or self.per_page,
+            "page": page,
+        }
+        if date_from:
+            params["date_from"] = date_from
+        response = self.session.get(self.requests_url, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        with metrics.timer('decode'):
+            return loads(response.content)
+
+    @staticmethod
+    def _is_new(cursor: Dict[str, Any], request: Dict[str, Any]) -> bool:
+        """Check whether a request comes after the cursor."""
+        if not cursor:
+            return True
+        sorting = request.get('sorting')
+        if sorting is not None and cursor.get('sorting') is not None:
+            return sorting > cursor['sorting']
+        # created_at only has second resolution, so compare uuids within the cursor's second
+        created_at = request.get('created_at', '')
+        if created_at != cursor.get('created_at'):
+            return created_at > cursor.get('created_at', '')
+        return request.get('uuid') not in cursor.get('uuids', [])
+
+    @staticmethod
+    def _advance(cursor: Dict[str, Any], request: Dict[str, Any]) -> Dict[str, Any]:
+        """Get the cursor moved to a request that has been handed out."""
+        created_at = request.get('created_at', '')
+        uuids = cursor.get('uuids', []) if created_at == cursor.get('created_at') else []
+        return {
+            "uuid": request.get('uuid'),
+            "created_at": created_at,
+            "sorting": request.get('sorting'),
+            "uuids": uuids + [request.get('uuid')],
+        }
+
+    def fetch_new_requests(self) -> List[Dict[str, Any]]:
+        """
+        Fetch all requests received since the cursor, oldest first.
+
+        The in-memory cursor moves past the returned requests; call save_cursor()
+        after processing them so a crash mid-batch re-fetches the batch on restart.
+        If any page fails, the cursor doesn't move and the error is raised, so the
+        next poll fetches the pages that did succeed again.
+
+        On the very first run (no cursor) only the latest request is returned,
+        matching the old /request/latest behaviour instead of replaying the
+        whole inbox history.
+
+        Returns:
+            List of raw webhook payloads, in the order they were received
+        """
+        with metrics.timer('fetch'):
+            new_requests = self._fetch_new_requests()
+        metrics.count('requests_fetched', len(new_requests))
+        return new_requests
+
+    def _fetch_new_requests(self) -> List[Dict[str, Any]]:
+        # Page into a copy of the cursor; it only replaces self.cursor once every page was fetched
+        cursor = self.cursor
+        if not cursor:
+            latest = self._get_page(1, "newest", per_page=1).get('data', [])
+            for request in latest:
+                cursor = self._advance(cursor, request)
+            self.cursor = cursor
+            return latest
+
+        new_requests = []
+        date_from = cursor.get('created_at')
+        page = 1
+        while True:
+            body = self._get_page(page, "oldest", date_from=date_from)
+            data = body.get('data', [])
+            for request in data:
+                if self._is_new(cursor, request):
+                    new_requests.append(request)
+                    cursor = self._advance(cursor, request)
+            if not data or body.get('is_last_page', True):
+                break
+            page += 1
+
+        self.cursor = cursor
+        return new_requests
+
+    def close(self) -> None:
+        """Close the pooled connection."""
+        self.session.close()